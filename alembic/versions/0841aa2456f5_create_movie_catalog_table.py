@@ -0,0 +1,66 @@
+"""create_movie_catalog_table
+
+Revision ID: 0841aa2456f5
+Revises: 6ef744550bb9
+Create Date: 2026-10-19 11:02:17.504918
+
+"""
+from typing import Tuple
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0841aa2456f5'
+down_revision = '6ef744550bb9'
+branch_labels = None
+depends_on = None
+
+
+def timestamps(indexed: bool = False) -> Tuple[sa.Column, sa.Column]:
+    return (
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+            index=indexed,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+            index=indexed,
+        ),
+    )
+
+
+def create_movies_table() -> None:
+    # Local catalog of the TMDB movie summaries, keyed by the TMDB id
+    op.create_table(
+        "movies",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("title", sa.Text, nullable=False),
+        sa.Column("original_title", sa.Text, nullable=False),
+        sa.Column("poster_path", sa.Text, nullable=True),
+        sa.Column("release_date", sa.Date, nullable=True),
+        *timestamps()
+    )
+    op.execute(
+        """
+        CREATE TRIGGER update_movie_modtime
+            BEFORE UPDATE
+            ON movies
+            FOR EACH ROW
+        EXECUTE PROCEDURE update_updated_at_column();
+        """
+    )
+
+
+def upgrade() -> None:
+    create_movies_table()
+
+
+def downgrade() -> None:
+    op.drop_table("movies")
@@ -0,0 +1,39 @@
+"""add_rating_timeline_indexes
+
+Revision ID: 9c4d2be71a03
+Revises: 0841aa2456f5
+Create Date: 2026-10-19 14:03:27.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2be71a03'
+down_revision = '0841aa2456f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Both timelines are read newest first, so the indexes serve the
+    # filter, the ORDER BY and the COUNT without sorting
+    op.create_index(
+        "ix_ratings_user_id_created_at_id",
+        "ratings",
+        ["user_id", sa.text("created_at DESC"), "id"],
+    )
+    op.create_index(
+        "ix_ratings_movie_id_created_at_id",
+        "ratings",
+        ["movie_id", sa.text("created_at DESC"), "id"],
+    )
+    # Now covered by the leading column of the index above
+    op.drop_index("ix_ratings_movie_id", table_name="ratings")
+
+
+def downgrade() -> None:
+    op.create_index("ix_ratings_movie_id", "ratings", ["movie_id"])
+    op.drop_index("ix_ratings_movie_id_created_at_id", table_name="ratings")
+    op.drop_index("ix_ratings_user_id_created_at_id", table_name="ratings")
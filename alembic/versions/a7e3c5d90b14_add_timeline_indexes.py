@@ -0,0 +1,31 @@
+"""add_timeline_indexes
+
+Revision ID: a7e3c5d90b14
+Revises: f4c81d9e2b36
+Create Date: 2026-10-19 21:12:44.104583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3c5d90b14'
+down_revision = 'f4c81d9e2b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The unfiltered timelines were sorting the whole tables for each page
+    op.create_index(
+        "ix_ratings_created_at_id",
+        "ratings",
+        [sa.text("created_at DESC"), "id"],
+    )
+    op.create_index("ix_users_created_at", "users", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_created_at", table_name="users")
+    op.drop_index("ix_ratings_created_at_id", table_name="ratings")
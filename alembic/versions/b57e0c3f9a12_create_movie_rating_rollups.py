@@ -0,0 +1,126 @@
+"""create_movie_rating_rollups
+
+Revision ID: b57e0c3f9a12
+Revises: 9c4d2be71a03
+Create Date: 2026-10-19 15:21:48.112730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b57e0c3f9a12'
+down_revision = '9c4d2be71a03'
+branch_labels = None
+depends_on = None
+
+
+def create_rollup_tables() -> None:
+    # Rating count and grade sum per movie, overall and per day the rating was created
+    op.create_table(
+        "movie_rating_stats",
+        sa.Column("movie_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("rating_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("grade_sum", sa.BigInteger, nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "movie_rating_daily",
+        sa.Column("movie_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("rating_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("grade_sum", sa.BigInteger, nullable=False, server_default="0"),
+    )
+    op.create_index("ix_movie_rating_daily_day", "movie_rating_daily", ["day"])
+
+
+def create_rollup_triggers() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_movie_rating_delta(
+            delta_movie_id INTEGER,
+            delta_day DATE,
+            delta_count INTEGER,
+            delta_grade INTEGER
+        )
+            RETURNS VOID
+        AS $$
+        BEGIN
+            INSERT INTO movie_rating_stats (movie_id, rating_count, grade_sum)
+            VALUES (delta_movie_id, delta_count, delta_grade)
+            ON CONFLICT (movie_id) DO UPDATE
+            SET rating_count = movie_rating_stats.rating_count + EXCLUDED.rating_count,
+                grade_sum = movie_rating_stats.grade_sum + EXCLUDED.grade_sum;
+
+            INSERT INTO movie_rating_daily (movie_id, day, rating_count, grade_sum)
+            VALUES (delta_movie_id, delta_day, delta_count, delta_grade)
+            ON CONFLICT (movie_id, day) DO UPDATE
+            SET rating_count = movie_rating_daily.rating_count + EXCLUDED.rating_count,
+                grade_sum = movie_rating_daily.grade_sum + EXCLUDED.grade_sum;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_movie_rating_rollups()
+            RETURNS TRIGGER
+        AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM apply_movie_rating_delta(
+                    OLD.movie_id, OLD.created_at::DATE, -1, -OLD.grade
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM apply_movie_rating_delta(
+                    NEW.movie_id, NEW.created_at::DATE, 1, NEW.grade
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER update_rating_rollups
+            AFTER INSERT OR DELETE OR UPDATE OF movie_id, grade
+            ON ratings
+            FOR EACH ROW
+        EXECUTE PROCEDURE update_movie_rating_rollups();
+        """
+    )
+
+
+def backfill_rollups() -> None:
+    op.execute(
+        """
+        INSERT INTO movie_rating_stats (movie_id, rating_count, grade_sum)
+        SELECT movie_id, COUNT(*), SUM(grade)
+        FROM ratings
+        GROUP BY movie_id;
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO movie_rating_daily (movie_id, day, rating_count, grade_sum)
+        SELECT movie_id, created_at::DATE, COUNT(*), SUM(grade)
+        FROM ratings
+        GROUP BY movie_id, created_at::DATE;
+        """
+    )
+
+
+def upgrade() -> None:
+    create_rollup_tables()
+    create_rollup_triggers()
+    backfill_rollups()
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER update_rating_rollups ON ratings")
+    op.execute("DROP FUNCTION update_movie_rating_rollups")
+    op.execute("DROP FUNCTION apply_movie_rating_delta")
+    op.drop_table("movie_rating_daily")
+    op.drop_table("movie_rating_stats")
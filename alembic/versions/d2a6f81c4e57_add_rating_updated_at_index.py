@@ -0,0 +1,24 @@
+"""add_rating_updated_at_index
+
+Revision ID: d2a6f81c4e57
+Revises: b57e0c3f9a12
+Create Date: 2026-10-19 16:40:09.538216
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a6f81c4e57'
+down_revision = 'b57e0c3f9a12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Incremental exports read the ratings updated since the previous one, in order
+    op.create_index("ix_ratings_updated_at_id", "ratings", ["updated_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ratings_updated_at_id", table_name="ratings")
@@ -0,0 +1,45 @@
+"""create_movie_similarities_table
+
+Revision ID: e93b07d15c28
+Revises: d2a6f81c4e57
+Create Date: 2026-10-19 17:58:41.260473
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e93b07d15c28'
+down_revision = 'd2a6f81c4e57'
+branch_labels = None
+depends_on = None
+
+
+def create_movie_similarities_table() -> None:
+    # Top neighbors of each movie, precomputed offline by `build_similar_movies`
+    op.create_table(
+        "movie_similarities",
+        sa.Column("movie_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("similar_movie_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("similarity", sa.REAL, nullable=False),
+    )
+
+
+def create_model_builds_table() -> None:
+    # Last build of each offline model, the starting point of incremental builds
+    op.create_table(
+        "model_builds",
+        sa.Column("name", sa.Text, primary_key=True),
+        sa.Column("built_at", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+
+
+def upgrade() -> None:
+    create_movie_similarities_table()
+    create_model_builds_table()
+
+
+def downgrade() -> None:
+    op.drop_table("model_builds")
+    op.drop_table("movie_similarities")
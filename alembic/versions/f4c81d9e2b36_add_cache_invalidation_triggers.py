@@ -0,0 +1,76 @@
+"""add_cache_invalidation_triggers
+
+Revision ID: f4c81d9e2b36
+Revises: e93b07d15c28
+Create Date: 2026-10-19 19:12:55.640381
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c81d9e2b36'
+down_revision = 'e93b07d15c28'
+branch_labels = None
+depends_on = None
+
+# Listened to on `app.db.invalidation.INVALIDATION_CHANNEL`
+CHANNEL = 'cache_invalidation'
+
+
+def create_notify_function() -> None:
+    # Notifies `<TG_ARGV[0]>:<value of the TG_ARGV[1] column>` for the old and new rows,
+    # delivered on commit and deduplicated within a transaction by Postgres
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION notify_cache_invalidation()
+            RETURNS TRIGGER
+        AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify(
+                    '{CHANNEL}', TG_ARGV[0] || ':' || (to_jsonb(OLD) ->> TG_ARGV[1])
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM pg_notify(
+                    '{CHANNEL}', TG_ARGV[0] || ':' || (to_jsonb(NEW) ->> TG_ARGV[1])
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+
+
+def create_notify_triggers() -> None:
+    op.execute(
+        """
+        CREATE TRIGGER notify_user_invalidation
+            AFTER UPDATE OR DELETE
+            ON users
+            FOR EACH ROW
+        EXECUTE PROCEDURE notify_cache_invalidation('user', 'id');
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER notify_movie_ratings_invalidation
+            AFTER INSERT OR UPDATE OR DELETE
+            ON ratings
+            FOR EACH ROW
+        EXECUTE PROCEDURE notify_cache_invalidation('movie_ratings', 'movie_id');
+        """
+    )
+
+
+def upgrade() -> None:
+    create_notify_function()
+    create_notify_triggers()
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER notify_movie_ratings_invalidation ON ratings")
+    op.execute("DROP TRIGGER notify_user_invalidation ON users")
+    op.execute("DROP FUNCTION notify_cache_invalidation")
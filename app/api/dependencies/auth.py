@@ -1,37 +1,86 @@
 from typing import Optional
-from databases import Database
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.core.config import settings
-from app.schemas.user import UserInDB
+from app.core.tracing import tracer
+from app.schemas.user import UserIdentity, UserInDB
 from app.services import auth_service
-from app.db.deps import db_session
+from app.db.deps import RequestConnection, db_connection
 from app.crud.users import UserCrud
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/users/login/token/")
+optional_oauth2_scheme = OAuth2PasswordBearer(
+    tokenUrl=f"{settings.API_V1_STR}/users/login/token/",
+    auto_error=False
+)
 
 
 async def get_user_from_token(
     *,
     token: str = Depends(oauth2_scheme),
-    db_session: Database = Depends(db_session),
+    db_connection: RequestConnection = Depends(db_connection),
 ) -> Optional[UserInDB]:
     try:
-        user_crud = UserCrud(db_session)
-        username = auth_service.get_username_from_token(
-            token=token,
-            secret_key=str(settings.SECRET_KEY)
-        )
-        user = await user_crud.get_user_by_username(username=username)
+        with tracer.start_span('auth'):
+            user_crud = UserCrud(db_connection)
+            username = auth_service.get_username_from_token(
+                token=token,
+                secret_key=str(settings.SECRET_KEY)
+            )
+            user = await user_crud.get_user_by_username(username=username)
     except Exception as e:
         raise e
 
     return user
 
 
+async def get_identity_from_token(
+    *,
+    token: str = Depends(oauth2_scheme),
+    db_connection: RequestConnection = Depends(db_connection),
+) -> UserIdentity:
+    with tracer.start_span('auth'):
+        identity = auth_service.get_identity_from_token(
+            token=token,
+            secret_key=str(settings.SECRET_KEY)
+        )
+        user_crud = UserCrud(db_connection)
+        token_version = await user_crud.get_token_version(user_id=identity.id)
+    if token_version != identity.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return identity
+
+
+async def get_optional_identity_from_token(
+    *,
+    token: str | None = Depends(optional_oauth2_scheme),
+    db_connection: RequestConnection = Depends(db_connection),
+) -> UserIdentity | None:
+    '''
+    Anonymous calls get None without any DB access. So do expired, malformed or
+    revoked tokens: they must not make public endpoints fail.
+    '''
+    if token is None:
+        return None
+
+    try:
+        identity = await get_identity_from_token(token=token, db_connection=db_connection)
+    except HTTPException:
+        return None
+    if not identity.is_active:
+        return None
+
+    return identity
+
+
 def get_current_active_user(
     current_user: UserInDB = Depends(get_user_from_token)
 ) -> Optional[UserInDB]:
@@ -62,3 +111,16 @@ def get_current_active_admin_user(
         )
 
     return current_user
+
+
+def get_current_active_identity(
+    current_user: UserIdentity = Depends(get_identity_from_token)
+) -> UserIdentity:
+    if not current_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not an active user.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return current_user
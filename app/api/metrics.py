@@ -0,0 +1,27 @@
+import secrets
+from fastapi import APIRouter, Header, HTTPException, status
+from prometheus_client import CONTENT_TYPE_LATEST
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.core.metrics import generate_metrics
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    name="metrics:get-metrics",
+    include_in_schema=False,
+)
+def get_metrics(authorization: str | None = Header(None)) -> Response:
+    if settings.METRICS_TOKEN is not None and not secrets.compare_digest(
+        authorization or '', f'Bearer {settings.METRICS_TOKEN}'
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return Response(generate_metrics(), headers={'Content-Type': CONTENT_TYPE_LATEST})
@@ -0,0 +1,145 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Mapping
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import csv
+import io
+import json
+import zlib
+
+from app.schemas.core import CoreModel, ExportFormat
+
+LIST_RESULT_META_FIELDS = ('page', 'total_results', 'total_pages')
+# Rows are encoded in chunks of about this many bytes before being sent
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: 'application/x-ndjson',
+    ExportFormat.CSV: 'text/csv',
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def list_result_response(result: dict, *, PublicClass: type[CoreModel]) -> Response:
+    '''
+    Encode a list result straight to JSON, trusting the rows typed by the DB
+    instead of validating them again against the response model.
+    Only the fields of `PublicClass` are emitted (e.g. never `password`/`salt`).
+    '''
+    fields = tuple(PublicClass.__fields__)
+    content = {
+        **{field: result[field] for field in LIST_RESULT_META_FIELDS},
+        'results': [
+            {field: getattr(item, field) for field in fields}
+            for item in result['results']
+        ]
+    }
+
+    return Response(
+        content=json.dumps(content, default=_json_default, separators=(',', ':')),
+        media_type='application/json'
+    )
+
+
+async def _encode_rows(
+    records: AsyncIterator[Mapping],
+    *,
+    fields: tuple[str, ...],
+    format: ExportFormat
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == ExportFormat.CSV:
+        writer.writerow(fields)
+
+    async for record in records:
+        if format == ExportFormat.CSV:
+            writer.writerow([_csv_value(record[field]) for field in fields])
+        else:
+            buffer.write(json.dumps(
+                {field: record[field] for field in fields},
+                default=_json_default,
+                separators=(',', ':')
+            ))
+            buffer.write('\n')
+
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+async def _gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 16 + 15: gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    '''
+    Whether an `Accept-Encoding` header allows a content coding: listed, or
+    matched by `*`, with a non-zero q-value (`gzip;q=0` refuses gzip)
+    '''
+    qualities = {}
+    for item in accept_encoding.split(','):
+        (coding, *params) = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            (key, _, value) = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    return qualities.get(encoding, qualities.get('*', 0.0)) > 0
+
+
+def streaming_export_response(
+    records: AsyncIterator[Mapping],
+    *,
+    PublicClass: type[CoreModel],
+    format: ExportFormat,
+    filename: str,
+    gzip: bool = False
+) -> StreamingResponse:
+    '''
+    Stream DB rows as NDJSON or CSV while they are read, so that memory stays
+    constant whatever the size of the export.
+    Only the fields of `PublicClass` are emitted.
+    '''
+    content = _encode_rows(records, fields=tuple(PublicClass.__fields__), format=format)
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}.{format.value}"',
+        'Vary': 'Accept-Encoding',
+    }
+    if gzip:
+        content = _gzip_chunks(content)
+        headers['Content-Encoding'] = 'gzip'
+
+    return StreamingResponse(content, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
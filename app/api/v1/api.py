@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from app.api.v1.endpoints import (
+    admin,
     movies,
     weekly_movies,
     users,
@@ -14,3 +15,4 @@ api_router.include_router(weekly_movies.router, prefix="/weekly_movies", tags=["
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(tokens.router, prefix="/tokens", tags=["tokens"])
 api_router.include_router(ratings.router, prefix="/ratings", tags=["ratings"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
@@ -0,0 +1,85 @@
+from uuid import UUID
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status
+from starlette.responses import FileResponse
+
+from app.api.dependencies import auth
+from app.core.loop_monitor import loop_monitor
+from app.core.profiling import profile_store
+from app.db.deps import db_session
+from app.db.slow_queries import slow_query_log
+from app.schemas.db import PoolStats, SlowQueryStats
+from app.schemas.loop_monitor import LoopBlock
+from app.schemas.profile import ProfileInfo
+from app.schemas.user import UserInDB
+
+router = APIRouter()
+
+
+@router.get(
+    "/db/pool",
+    name="admin:get-db-pool",
+    include_in_schema=True,
+    response_model=PoolStats,
+)
+async def get_db_pool(
+    admin: UserInDB = Depends(auth.get_current_active_admin_user)
+) -> PoolStats:
+    return db_session.get_pool_stats()
+
+
+@router.get(
+    "/slow-queries",
+    name="admin:get-slow-queries",
+    include_in_schema=True,
+    response_model=list[SlowQueryStats],
+)
+async def get_slow_queries(
+    admin: UserInDB = Depends(auth.get_current_active_admin_user)
+) -> list[SlowQueryStats]:
+    return slow_query_log.get_stats()
+
+
+@router.get(
+    "/loop-blocks",
+    name="admin:get-loop-blocks",
+    include_in_schema=True,
+    response_model=list[LoopBlock],
+)
+async def get_loop_blocks(
+    admin: UserInDB = Depends(auth.get_current_active_admin_user)
+) -> list[LoopBlock]:
+    return loop_monitor.get_blocks()
+
+
+@router.get(
+    "/profiles",
+    name="admin:get-profiles",
+    include_in_schema=True,
+    response_model=list[ProfileInfo],
+)
+async def get_profiles(
+    admin: UserInDB = Depends(auth.get_current_active_admin_user)
+) -> list[ProfileInfo]:
+    return await asyncio.to_thread(profile_store.list)
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    name="admin:get-profile-id",
+    include_in_schema=True,
+    response_class=FileResponse,
+)
+async def get_profile(
+    profile_id: UUID,
+    admin: UserInDB = Depends(auth.get_current_active_admin_user)
+) -> FileResponse:
+    profile = await asyncio.to_thread(profile_store.get, profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Profile with id={profile_id} does not exist'
+        )
+
+    (info, path) = profile
+    return FileResponse(path, filename=path.name, media_type='application/octet-stream')
@@ -1,16 +1,87 @@
-from fastapi import APIRouter, Depends, status as http_status, HTTPException
-from databases import Database
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, status as http_status, HTTPException
 import aiohttp
 
+from app.api.dependencies import auth
+from app.core.config import settings
 from app.proxy import tmdb_api
 from app.proxy.deps import client_session
 from app.schemas import movie
+from app.crud.movies import MovieCrud
 from app.crud.ratings import RatingCrud
-from app.db.deps import db_session
+from app.crud.similarities import MovieSimilarityCrud
+from app.db.deps import RequestConnection, db_connection
+from app.schemas.leaderboard import LeaderboardResult, LeaderboardSort, LeaderboardWindow
+from app.schemas.similarity import SimilarMovieResult
+from app.services import leaderboard
+from app.services.composition import (
+    Source,
+    attach_movie_summaries,
+    attach_rating_summaries,
+    gather_with_deadlines
+)
 
 router = APIRouter()
 
 
+@router.get(
+    '/top',
+    name="movies:get-movies-top",
+    include_in_schema=True,
+    response_model=LeaderboardResult
+)
+async def get_movies_top(
+    *,
+    window: LeaderboardWindow = LeaderboardWindow.ALL,
+    sort: LeaderboardSort = LeaderboardSort.RATING,
+    min_votes: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    client_session: aiohttp.ClientSession = Depends(client_session),
+    db_connection: RequestConnection = Depends(db_connection)
+) -> LeaderboardResult:
+    top = leaderboard.get_top(window=window, sort=sort, min_votes=min_votes, limit=limit)
+    await attach_movie_summaries(
+        top,
+        movie_crud=MovieCrud(db_connection),
+        client_session=client_session
+    )
+
+    return {
+        'window': window,
+        'sort': sort,
+        'min_votes': min_votes,
+        'refreshed_at': leaderboard.refreshed_at,
+        'results': top
+    }
+
+
+@router.get(
+    '/{movie_id}/similar',
+    name="movies:get-movie-id-similar",
+    include_in_schema=True,
+    response_model=SimilarMovieResult
+)
+async def get_movie_similar(
+    *,
+    movie_id: int,
+    limit: int = Query(20, ge=1, le=settings.SIMILAR_MOVIES_TOP_K),
+    client_session: aiohttp.ClientSession = Depends(client_session),
+    db_connection: RequestConnection = Depends(db_connection)
+) -> SimilarMovieResult:
+    ''' Neighbors precomputed by `build_similar_movies`, empty until it has run '''
+    similarity_crud = MovieSimilarityCrud(db_connection)
+    similar_movies = await similarity_crud.get_similar_movies(movie_id=movie_id, limit=limit)
+    await attach_movie_summaries(
+        similar_movies,
+        movie_crud=MovieCrud(db_connection),
+        client_session=client_session
+    )
+
+    return {
+        'movie_id': movie_id,
+        'results': similar_movies
+    }
+
+
 @router.get(
     '/{movie_id}',
     name="movies:get-movie-id",
@@ -20,25 +91,62 @@ router = APIRouter()
 async def get_movie(
     *,
     movie_id: int,
+    background_tasks: BackgroundTasks,
     client_session: aiohttp.ClientSession = Depends(client_session),
-    db_session: Database = Depends(db_session)
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> movie.MovieDetailPublic:
-    (status, res) = await tmdb_api.fetch_tmdb_api(
-        endpoint=f'/movie/{movie_id}',
-        params={
-            'append_to_response': 'credits,release_dates'
-        },
-        client_session=client_session
+    rating_crud = RatingCrud(db_connection)
+    movie_crud = MovieCrud(db_connection)
+    sources = await gather_with_deadlines(
+        movie=Source(
+            tmdb_api.fetch_tmdb_api(
+                endpoint=f'/movie/{movie_id}',
+                params={
+                    'append_to_response': 'credits,release_dates'
+                },
+                client_session=client_session
+            ),
+            deadline=settings.TMDB_API_DEADLINE_SECONDS,
+            required=True
+        ),
+        avg_rating=Source(
+            rating_crud.get_avg_rating_per_movie(movie_id=movie_id),
+            deadline=settings.RATINGS_DEADLINE_SECONDS
+        ),
+        catalog_fresh=Source(
+            movie_crud.is_movie_fresh(
+                movie_id=movie_id, max_age_seconds=settings.MOVIE_CATALOG_REFRESH_SECONDS
+            ),
+            deadline=settings.RATINGS_DEADLINE_SECONDS
+        )
     )
+
+    # The movie details can't be served without TMDB, unlike the ratings
+    if not sources['movie'].available:
+        raise HTTPException(
+            http_status.HTTP_504_GATEWAY_TIMEOUT,
+            detail='The Movie DB did not answer in time'
+        )
+    (status, res) = sources['movie'].value
     if status != http_status.HTTP_200_OK:
         raise HTTPException(
             status,
             detail=res['status_message']
         )
 
-    rating_crud = RatingCrud(db_session)
-    avg_rating = await rating_crud.get_avg_rating_per_movie(movie_id=movie_id)
-    return {**res, 'avg_rating': avg_rating}
+    # Add the movie to the local catalog, or refresh a stale entry, once the
+    # response is sent. Skipped when the catalog didn't answer in time.
+    if sources['catalog_fresh'].available and not sources['catalog_fresh'].value:
+        background_tasks.add_task(
+            movie_crud.upsert_movie_summaries,
+            movies=[movie.MovieSummary(**res)]
+        )
+
+    return {
+        **res,
+        'avg_rating': sources['avg_rating'].value,
+        'ratings_available': sources['avg_rating'].available
+    }
 
 
 @router.get(
@@ -57,7 +165,10 @@ async def get_movies(
     *,
     query: str,
     page: int | None = 1,
-    client_session: aiohttp.ClientSession = Depends(client_session)
+    with_ratings: bool = False,
+    client_session: aiohttp.ClientSession = Depends(client_session),
+    token: str | None = Depends(auth.optional_oauth2_scheme),
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> movie.MovieResult:
     (status, res) = await tmdb_api.fetch_tmdb_api(
         endpoint='/search/movie',
@@ -74,4 +185,15 @@ async def get_movies(
             detail=res['status_message']
         )
 
+    if with_ratings:
+        # Only the ratings depend on the user, the token is ignored otherwise
+        current_user = await auth.get_optional_identity_from_token(
+            token=token, db_connection=db_connection
+        )
+        res['results'] = await attach_rating_summaries(
+            res['results'],
+            rating_crud=RatingCrud(db_connection),
+            user_id=current_user.id if current_user else None
+        )
+
     return res
@@ -1,42 +1,121 @@
-from fastapi import APIRouter, Depends, Response, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from starlette.status import HTTP_201_CREATED, HTTP_204_NO_CONTENT
-from databases import Database
+import aiohttp
 import logging
 
 from app.schemas.rating import (
-    RatingCreate, RatingCreatePublic, RatingPublic, RatingResult, RatingUpdatePublic
+    RatingCreate,
+    RatingCreatePublic,
+    RatingExpandedPublic,
+    RatingExpandedResult,
+    RatingPublic,
+    RatingResult,
+    RatingUpdatePublic
 )
-from app.crud.ratings import RatingCrud
-from app.db.deps import db_session
-from app.schemas.user import UserInDB
+from app.crud.movies import MovieCrud
+from app.crud.ratings import EXPORT_EPOCH, RatingCrud
+from app.proxy.deps import client_session
+from app.db.deps import RequestConnection, db_connection
+from app.schemas.user import UserIdentity, UserInDB
 from app.api.dependencies import auth
+from app.api.responses import (
+    accepts_encoding,
+    list_result_response,
+    streaming_export_response
+)
+from app.schemas.core import ExportFormat
+from app.services.composition import attach_movie_summaries
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Comma separated related entities to embed in the ratings
+EXPAND_REGEX = '^(user|movie)(,(user|movie))*$'
+
 
 @router.get(
     "/",
     name="ratings:get-ratings",
     include_in_schema=False,
-    response_model=RatingResult,
+    response_model=RatingExpandedResult,
 )
 @router.get(
     "",
     name="ratings:get-ratings",
     include_in_schema=True,
-    response_model=RatingResult,
+    response_model=RatingExpandedResult,
 )
 async def get_ratings(
     page: int = 1,
     movie_id: int | None = None,
-    db_session: Database = Depends(db_session)
-) -> RatingResult:
-    rating_crud = RatingCrud(db_session)
-    ratings = await rating_crud.get_ratings(page=page, movie_id=movie_id)
+    expand: str | None = Query(None, regex=EXPAND_REGEX),
+    client_session: aiohttp.ClientSession = Depends(client_session),
+    db_connection: RequestConnection = Depends(db_connection)
+) -> Response:
+    expansions = set(expand.split(',')) if expand else set()
+    rating_crud = RatingCrud(db_connection)
+    ratings = await rating_crud.get_ratings(page=page, movie_id=movie_id, expand=expansions)
+
+    if 'movie' in expansions:
+        await attach_movie_summaries(
+            ratings['results'],
+            movie_crud=MovieCrud(db_connection),
+            client_session=client_session
+        )
+
+    return list_result_response(
+        ratings,
+        PublicClass=RatingExpandedPublic if expansions else RatingPublic
+    )
+
 
-    return ratings
+@router.get(
+    "/me",
+    name="ratings:get-ratings-me",
+    include_in_schema=True,
+    response_model=RatingResult,
+)
+async def get_ratings_me(
+    page: int = 1,
+    current_user: UserIdentity = Depends(auth.get_current_active_identity),
+    db_connection: RequestConnection = Depends(db_connection)
+) -> Response:
+    rating_crud = RatingCrud(db_connection)
+    ratings = await rating_crud.get_ratings_per_user(user_id=current_user.id, page=page)
+
+    return list_result_response(ratings, PublicClass=RatingPublic)
+
+
+@router.get(
+    "/export",
+    name="ratings:get-ratings-export",
+    include_in_schema=True,
+    response_class=StreamingResponse,
+)
+async def get_ratings_export(
+    request: Request,
+    format: ExportFormat = ExportFormat.NDJSON,
+    since: datetime | None = None,
+    current_user: UserIdentity = Depends(auth.get_current_active_identity),
+    db_connection: RequestConnection = Depends(db_connection)
+) -> StreamingResponse:
+    ''' All the ratings for admins, their own ones for the other users '''
+    rating_crud = RatingCrud(db_connection)
+    records = rating_crud.iterate_ratings_export(
+        user_id=None if current_user.is_superuser else current_user.id,
+        since=since or EXPORT_EPOCH
+    )
+
+    return streaming_export_response(
+        records,
+        PublicClass=RatingPublic,
+        format=format,
+        filename='ratings',
+        gzip=accepts_encoding(request.headers.get('accept-encoding', ''), 'gzip')
+    )
 
 
 @router.get(
@@ -47,9 +126,9 @@ async def get_ratings(
 )
 async def get_rating_id(
     rating_id: int = 1,
-    db_session: Database = Depends(db_session)
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> RatingPublic:
-    rating_crud = RatingCrud(db_session)
+    rating_crud = RatingCrud(db_connection)
     rating = await rating_crud.get_rating_per_id(rating_id=rating_id)
 
     return rating
@@ -63,10 +142,10 @@ async def get_rating_id(
 )
 async def get_rating_movie_id_me(
     movie_id: int,
-    current_user: UserInDB = Depends(auth.get_current_active_user),
-    db_session: Database = Depends(db_session)
+    current_user: UserIdentity = Depends(auth.get_current_active_identity),
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> RatingPublic:
-    rating_crud = RatingCrud(db_session)
+    rating_crud = RatingCrud(db_connection)
     rating = await rating_crud.get_rating_per_user_movie(
         current_user=current_user, movie_id=movie_id
     )
@@ -90,11 +169,11 @@ async def get_rating_movie_id_me(
 )
 async def post_rating(
     new_public_rating: RatingCreatePublic,
-    current_user: UserInDB = Depends(auth.get_current_active_user),
-    db_session: Database = Depends(db_session)
+    current_user: UserIdentity = Depends(auth.get_current_active_identity),
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> RatingPublic:
-    logger.debug(f'connected user is: {current_user}')
-    rating_crud = RatingCrud(db_session)
+    logger.debug('connected user is: %s', current_user)
+    rating_crud = RatingCrud(db_connection)
     new_rating = RatingCreate(
         user_id=current_user.id,
         **new_public_rating.dict()
@@ -113,11 +192,11 @@ async def post_rating(
 async def put_rating(
     rating_id: int,
     rating_to_update: RatingUpdatePublic,
-    current_user: UserInDB = Depends(auth.get_current_active_user),
-    db_session: Database = Depends(db_session)
+    current_user: UserIdentity = Depends(auth.get_current_active_identity),
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> RatingPublic:
-    logger.debug(f'connected user is: {current_user}')
-    rating_crud = RatingCrud(db_session)
+    logger.debug('connected user is: %s', current_user)
+    rating_crud = RatingCrud(db_connection)
 
     updated_rating = await rating_crud.update_rating(
         rating_id=rating_id, rating_to_update=rating_to_update
@@ -135,14 +214,15 @@ async def put_rating(
 async def delete_rating(
     rating_id: int,
     current_user: UserInDB = Depends(auth.get_current_active_user),
-    db_session: Database = Depends(db_session)
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> Response:
-    logger.debug(f'connected user is: {current_user}')
-    rating_crud = RatingCrud(db_session)
+    logger.debug('connected user is: %s', current_user)
+    rating_crud = RatingCrud(db_connection)
 
     try:
-        rating = await rating_crud.get_rating_per_id(rating_id=rating_id)
-        if rating.user_id == current_user.id:
-            await rating_crud.delete_rating(rating_id=rating_id)
+        async with db_connection.transaction():
+            rating = await rating_crud.get_rating_per_id(rating_id=rating_id)
+            if rating.user_id == current_user.id:
+                await rating_crud.delete_rating(rating_id=rating_id)
     except HTTPException:
         pass
@@ -1,11 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette.status import HTTP_201_CREATED, HTTP_401_UNAUTHORIZED
-from databases import Database
 import logging
 
 from app.schemas.token import AccessToken
-from app.db.deps import db_session
+from app.db.deps import RequestConnection, db_connection
 from app.crud.users import UserCrud
 
 logger = logging.getLogger(__name__)
@@ -30,20 +29,24 @@ router = APIRouter()
 )
 async def post_token(
     form_data: OAuth2PasswordRequestForm = Depends(OAuth2PasswordRequestForm),
-    db_session: Database = Depends(db_session)
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> AccessToken:
-    user_crud = UserCrud(db_session)
+    user_crud = UserCrud(db_connection)
     authenticated_user = await user_crud.authenticate_user(
         username=form_data.username,
         password=form_data.password
     )
-    logger.debug(f'authenticated user is: {authenticated_user}')
     if not authenticated_user:
+        logger.debug('Authentication of "%s" failed', form_data.username)
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail='Authentication was unsuccessful. Please verify username and password',
             headers={"WWW-Authenticate": "Bearer"}
         )
+    # Never the whole user, whose password hash and salt would end up in the logs
+    logger.debug(
+        'Authenticated user %d "%s"', authenticated_user.id, authenticated_user.username
+    )
 
     access_token = AccessToken(
         access_token=user_crud.auth_service.create_access_token_for_user(
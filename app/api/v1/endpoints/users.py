@@ -1,12 +1,14 @@
-from databases import Database
 from fastapi import Depends, APIRouter, Response, HTTPException, status
 from starlette.status import HTTP_201_CREATED, HTTP_204_NO_CONTENT
 import logging
 
+from app.schemas.rating import RatingPublic, RatingResult
 from app.schemas.user import UserCreate, UserInDB, UserPublic, UserResult, UserUpdate
+from app.crud.ratings import RatingCrud
 from app.crud.users import UserCrud
-from app.db.deps import db_session
+from app.db.deps import RequestConnection, db_connection
 from app.api.dependencies import auth
+from app.api.responses import list_result_response
 
 logger = logging.getLogger(__name__)
 
@@ -29,10 +31,11 @@ router = APIRouter()
 )
 async def post_user(
     new_user: UserCreate,
-    db_session: Database = Depends(db_session)
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> UserPublic:
-    user_crud = UserCrud(db_session)
-    created_user = await user_crud.create_new_user(new_user=new_user)
+    user_crud = UserCrud(db_connection)
+    async with db_connection.transaction():
+        created_user = await user_crud.create_new_user(new_user=new_user)
 
     return created_user
 
@@ -57,14 +60,34 @@ async def get_user_me(
 )
 async def get_user_id(
     user_id: int,
-    db_session: Database = Depends(db_session)
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> UserPublic:
-    user_crud = UserCrud(db_session)
+    user_crud = UserCrud(db_connection)
     user = await user_crud.get_user_by_id(user_id=user_id)
 
     return user
 
 
+@router.get(
+    "/{user_id}/ratings",
+    name="users:get-user-id-ratings",
+    include_in_schema=True,
+    response_model=RatingResult,
+)
+async def get_user_id_ratings(
+    user_id: int,
+    page: int = 1,
+    db_connection: RequestConnection = Depends(db_connection)
+) -> Response:
+    user_crud = UserCrud(db_connection)
+    await user_crud.get_user_by_id(user_id=user_id)
+
+    rating_crud = RatingCrud(db_connection)
+    ratings = await rating_crud.get_ratings_per_user(user_id=user_id, page=page)
+
+    return list_result_response(ratings, PublicClass=RatingPublic)
+
+
 @router.get(
     "/",
     name="users:get-users",
@@ -79,12 +102,12 @@ async def get_user_id(
 )
 async def get_users(
     page: int = 1,
-    db_session: Database = Depends(db_session)
-) -> UserResult:
-    user_crud = UserCrud(db_session)
+    db_connection: RequestConnection = Depends(db_connection)
+) -> Response:
+    user_crud = UserCrud(db_connection)
     user_list = await user_crud.get_users(page=page)
 
-    return user_list
+    return list_result_response(user_list, PublicClass=UserPublic)
 
 
 @router.put(
@@ -96,7 +119,7 @@ async def get_users(
 async def put_user_id(
     user_id: int,
     user_to_update: UserUpdate,
-    db_session: Database = Depends(db_session),
+    db_connection: RequestConnection = Depends(db_connection),
     current_user: UserInDB = Depends(auth.get_current_active_user)
 ) -> UserPublic:
     if not current_user.is_superuser and user_id != current_user.id:
@@ -104,7 +127,7 @@ async def put_user_id(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authorized to modify this user."
         )
-    user_crud = UserCrud(db_session)
+    user_crud = UserCrud(db_connection)
     user = await user_crud.update_user(user_id=user_id, user_to_update=user_to_update)
 
     return user
@@ -120,9 +143,9 @@ async def put_user_id(
 async def delete_user(
     user_id: int,
     admin: UserInDB = Depends(auth.get_current_active_admin_user),
-    db_session: Database = Depends(db_session)
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> Response:
-    user_crud = UserCrud(db_session)
+    user_crud = UserCrud(db_connection)
 
     if user_id == admin.id:
         raise HTTPException(
@@ -2,9 +2,13 @@ from datetime import date
 from fastapi import APIRouter, Depends
 import aiohttp
 
+from app.api.dependencies import auth
+from app.crud.ratings import RatingCrud
+from app.db.deps import RequestConnection, db_connection
 from app.proxy import tmdb_api
 from app.proxy.deps import client_session
 from app.schemas import movie
+from app.services.composition import attach_rating_summaries
 
 router = APIRouter()
 
@@ -26,7 +30,10 @@ async def get_weekly_movies(
     release_date_gte: date,
     release_date_lte: date,
     page: int | None = 1,
-    client_session: aiohttp.ClientSession = Depends(client_session)
+    with_ratings: bool = False,
+    client_session: aiohttp.ClientSession = Depends(client_session),
+    token: str | None = Depends(auth.optional_oauth2_scheme),
+    db_connection: RequestConnection = Depends(db_connection)
 ) -> movie.MovieResult:
     (_, res) = await tmdb_api.fetch_tmdb_api(
         endpoint='/discover/movie',
@@ -38,4 +45,15 @@ async def get_weekly_movies(
             'page': page
         }
     )
+    if with_ratings and 'results' in res:
+        # Only the ratings depend on the user, the token is ignored otherwise
+        current_user = await auth.get_optional_identity_from_token(
+            token=token, db_connection=db_connection
+        )
+        res['results'] = await attach_rating_summaries(
+            res['results'],
+            rating_crud=RatingCrud(db_connection),
+            user_id=current_user.id if current_user else None
+        )
+
     return res
@@ -2,9 +2,13 @@ from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import RedirectResponse
 
+from app.api import metrics
 from app.api.v1.api import api_router
 from app.core.config import settings
 from app.core import deps
+from app.core.metrics import PrometheusMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.tracing import TracingMiddleware, instrument_routes
 
 
 def get_application():
@@ -17,11 +21,21 @@ def get_application():
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if settings.METRICS_ENABLED:
+        app.add_middleware(PrometheusMiddleware)
+    if settings.TRACING_ENABLED:
+        app.add_middleware(TracingMiddleware)
+    if settings.PROFILER_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
 
     app.add_event_handler("startup", deps.create_start_app_handler())
     app.add_event_handler("shutdown", deps.create_stop_app_handler())
 
     app.include_router(api_router, prefix=settings.API_V1_STR)
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics.router)
+    if settings.TRACING_ENABLED:
+        instrument_routes(app.routes)
 
     return app
 
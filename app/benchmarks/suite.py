@@ -0,0 +1,145 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+import copy
+import json
+import platform
+import statistics
+import subprocess
+import timeit
+
+from app.proxy.tmdb_api import get_cache_key, merge_params
+from app.schemas.movie import MovieDetailPublic
+from app.schemas.rating import RatingInDB
+from app.schemas.user import UserInDB
+from app.services import auth_service
+
+PAYLOADS_DIR = Path(__file__).parent / 'payloads'
+# Credits of the huge payload, like the ones of a long-running TV-like franchise
+HUGE_CAST_SIZE = 1500
+HUGE_CREW_SIZE = 2500
+SECRET_KEY = 'benchmark-secret-key'
+PASSWORD = 'benchmark-password'
+
+
+def load_movie_detail_payload() -> dict:
+    '''
+    Sample payload shaped like the TMDB answer to
+    `/movie/{id}?append_to_response=credits,release_dates`, with a few credits
+    '''
+    return json.loads((PAYLOADS_DIR / 'movie_detail.json').read_text())
+
+
+def make_huge_payload(payload: dict) -> dict:
+    ''' The sample payload with its credits repeated, deterministically '''
+    huge_payload = copy.deepcopy(payload)
+    for (key, size) in (('cast', HUGE_CAST_SIZE), ('crew', HUGE_CREW_SIZE)):
+        members = payload['credits'][key]
+        huge_payload['credits'][key] = [
+            {**member, 'id': i, 'name': f'{member["name"]} {i}'}
+            for (i, member) in ((i, members[i % len(members)]) for i in range(size))
+        ]
+    return huge_payload
+
+
+def build_benchmarks() -> dict[str, Callable[[], object]]:
+    ''' Benchmarked calls by name, on fixed inputs '''
+    small_payload = load_movie_detail_payload()
+    huge_payload = make_huge_payload(small_payload)
+    (small_json, huge_json) = (json.dumps(small_payload), json.dumps(huge_payload))
+    detail_values = {'avg_rating': 7.5, 'ratings_available': True}
+
+    now = datetime(2022, 7, 1, tzinfo=timezone.utc)
+    rating_record = {
+        'id': 1, 'movie_id': 949, 'user_id': 1, 'grade': 8, 'created_at': now, 'updated_at': now
+    }
+    salt = auth_service.generate_salt()
+    user_record = {
+        'id': 1, 'email': 'benchmark@mail.com', 'username': 'benchmark', 'is_active': True,
+        'is_superuser': False, 'token_version': 0, 'created_at': now, 'updated_at': now,
+        'password': auth_service.hash_password(password=PASSWORD, salt=salt), 'salt': salt,
+    }
+    user = UserInDB(**user_record)
+    token = auth_service.create_access_token_for_user(user=user, secret_key=SECRET_KEY)
+    search_params = {'region': 'FR', 'query': 'heat', 'page': 1, 'year': None}
+
+    return {
+        'movie_detail_validation_small': lambda: MovieDetailPublic(
+            **small_payload, **detail_values
+        ),
+        'movie_detail_validation_huge': lambda: MovieDetailPublic(
+            **huge_payload, **detail_values
+        ),
+        'rating_in_db_validation': lambda: RatingInDB(**rating_record),
+        'rating_in_db_construct': lambda: RatingInDB.construct(**rating_record),
+        'user_in_db_validation': lambda: UserInDB(**user_record),
+        'auth_create_access_token': lambda: auth_service.create_access_token_for_user(
+            user=user, secret_key=SECRET_KEY
+        ),
+        'auth_get_username_from_token': lambda: auth_service.get_username_from_token(
+            token=token, secret_key=SECRET_KEY
+        ),
+        'auth_verify_password': lambda: auth_service.verify_password(
+            password=PASSWORD, salt=salt, hashed_pw=user_record['password']
+        ),
+        'tmdb_params_merge': lambda: get_cache_key('/search/movie', merge_params(search_params)),
+        'tmdb_json_decode_small': lambda: json.loads(small_json),
+        'tmdb_json_decode_huge': lambda: json.loads(huge_json),
+    }
+
+
+def time_benchmark(call: Callable[[], object], *, repeat: int, min_time: float) -> dict:
+    '''
+    Best, median and spread of the time per call, over `repeat` runs of as
+    many calls as take at least `min_time`, with the GC disabled like timeit
+    '''
+    timer = timeit.Timer(call)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    per_call = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+
+    return {
+        'loops': number,
+        'repeat': repeat,
+        'min_us': min(per_call) * 1e6,
+        'median_us': statistics.median(per_call) * 1e6,
+        'stdev_us': statistics.stdev(per_call) * 1e6 if repeat > 1 else 0.0,
+    }
+
+
+def get_git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(*, only: str | None, repeat: int, min_time: float) -> dict:
+    results = {}
+    for (name, call) in build_benchmarks().items():
+        if only is not None and only not in name:
+            continue
+        results[name] = time_benchmark(call, repeat=repeat, min_time=min_time)
+        print(f'{name:<32} {results[name]["min_us"]:>12.2f} us '
+              f'(median {results[name]["median_us"]:.2f} us, {results[name]["loops"]} loops)')
+
+    return {
+        'commit': get_git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'benchmarks': results,
+    }
+
+
+def compare_results(results: dict, baseline: dict) -> None:
+    ''' Print the ratio of each best time to the baseline's, above 1 when slower '''
+    print(f'\nCompared to {baseline["commit"] or "baseline"} ({baseline["created_at"]}):')
+    for (name, result) in results['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        ratio = result['min_us'] / baseline['benchmarks'][name]['min_us']
+        print(f'{name:<32} {ratio:>8.2f}x')
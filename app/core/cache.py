@@ -0,0 +1,413 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.metrics import CACHE_ERRORS, CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """
+    Byte store shared by the caches of a process: values expire after their
+    TTL, and `size_bytes` reports the bytes held against `max_bytes`
+    """
+
+    # Label of the backend in the logs and the metrics
+    NAME: str
+
+    def __init__(self, *, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+
+    async def get(self, key: str) -> bytes | None:
+        return (await self.get_many([key])).get(key)
+
+    @abstractmethod
+    async def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self, prefix: str) -> None:
+        ''' Drop all the keys starting with `prefix` '''
+        ...
+
+    @abstractmethod
+    async def size_bytes(self) -> int:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+    def on_error(self, operation: str, error: Exception) -> None:
+        # The cache is an optimization: a busy or broken store is a miss, and
+        # a failed delete only leaves the value until its TTL
+        logger.warning('%s cache %s error: %s', self.NAME, operation, error)
+        CACHE_ERRORS.labels(self.NAME, operation).inc()
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU, private to each worker
+    """
+
+    NAME = 'memory'
+
+    def __init__(self, *, max_bytes: int) -> None:
+        super().__init__(max_bytes=max_bytes)
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.size = 0
+
+    async def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        now = time.monotonic()
+        values = {}
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            (expires_at, value) = entry
+            if expires_at < now:
+                self._delete(key)
+                continue
+            self._entries.move_to_end(key)
+            values[key] = value
+
+        return values
+
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        self._delete(key)
+        if len(value) > self.max_bytes:
+            return None
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            self._delete(next(iter(self._entries)))
+
+    async def delete(self, key: str) -> None:
+        self._delete(key)
+
+    async def clear(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._delete(key)
+
+    async def size_bytes(self) -> int:
+        return self.size
+
+    def _delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    LRU shared by all the workers of a host, in one SQLite file in WAL mode:
+    readers never block, and a single copy of each value is kept on the host.
+    SQLite calls run in a thread, on one connection per worker.
+    """
+
+    NAME = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at);
+    """
+    # Least recently used entries beyond the byte budget
+    EVICT_QUERY = """
+        DELETE FROM entries
+        WHERE key IN (
+            SELECT key
+            FROM (
+                SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS total_size
+                FROM entries
+            )
+            WHERE total_size > ?
+        );
+    """
+    # The budget is enforced every this many writes, rather than on each one
+    EVICT_EVERY = 100
+    # A hit only writes the access time of the entries not read for this long:
+    # the order of the LRU is that coarse, but most reads stay read-only
+    ACCESS_RESOLUTION_SECONDS = 60.0
+
+    def __init__(self, *, path: str, max_bytes: int) -> None:
+        super().__init__(max_bytes=max_bytes)
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=1.0, isolation_level=None, check_same_thread=False
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _run(self, sql: str, *params: Any) -> list[tuple]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _get_many_sync(self, keys: list[str]) -> dict[str, bytes]:
+        now = time.time()
+        placeholders = ','.join('?' * len(keys))
+        with self._lock:
+            connection = self._connect()
+            rows = connection.execute(
+                f'SELECT key, value, accessed_at FROM entries '
+                f'WHERE key IN ({placeholders}) AND expires_at > ?',
+                (*keys, now)
+            ).fetchall()
+            stale = [
+                key for (key, _, accessed_at) in rows
+                if accessed_at <= now - self.ACCESS_RESOLUTION_SECONDS
+            ]
+            if stale:
+                stale_placeholders = ','.join('?' * len(stale))
+                connection.execute(
+                    f'UPDATE entries SET accessed_at = ? WHERE key IN ({stale_placeholders})',
+                    (now, *stale)
+                )
+
+        return {key: value for (key, value, _) in rows}
+
+    def _set_sync(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), now + ttl, now)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                connection.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+                connection.execute(self.EVICT_QUERY, (self.max_bytes,))
+
+    async def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        if not keys:
+            return {}
+        try:
+            return await asyncio.to_thread(self._get_many_sync, keys)
+        except sqlite3.Error as e:
+            self.on_error('get_many', e)
+            return {}
+
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return None
+        try:
+            await asyncio.to_thread(self._set_sync, key, value, ttl)
+        except sqlite3.Error as e:
+            self.on_error('set', e)
+
+    async def delete(self, key: str) -> None:
+        try:
+            await asyncio.to_thread(self._run, 'DELETE FROM entries WHERE key = ?', key)
+        except sqlite3.Error as e:
+            self.on_error('delete', e)
+
+    async def clear(self, prefix: str) -> None:
+        try:
+            await asyncio.to_thread(
+                self._run, 'DELETE FROM entries WHERE substr(key, 1, ?) = ?', len(prefix), prefix
+            )
+        except sqlite3.Error as e:
+            self.on_error('clear', e)
+
+    async def size_bytes(self) -> int:
+        try:
+            rows = await asyncio.to_thread(
+                self._run, 'SELECT COALESCE(SUM(size), 0) FROM entries'
+            )
+        except sqlite3.Error as e:
+            self.on_error('size_bytes', e)
+            return 0
+
+        return rows[0][0]
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis-protocol store shared by every worker of every host. The byte budget
+    is the server's `maxmemory`, evicting by LRU with `allkeys-lru`.
+    """
+
+    NAME = 'redis'
+
+    def __init__(self, *, client: redis.Redis, max_bytes: int) -> None:
+        super().__init__(max_bytes=max_bytes)
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str, *, max_bytes: int) -> 'RedisCacheBackend':
+        return cls(client=redis.Redis.from_url(url), max_bytes=max_bytes)
+
+    async def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        if not keys:
+            return {}
+        try:
+            values = await self.client.mget(keys)
+        except redis.RedisError as e:
+            self.on_error('get_many', e)
+            return {}
+
+        return {key: value for (key, value) in zip(keys, values) if value is not None}
+
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return None
+        try:
+            await self.client.set(key, value, px=int(ttl * 1000))
+        except redis.RedisError as e:
+            self.on_error('set', e)
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.client.delete(key)
+        except redis.RedisError as e:
+            self.on_error('delete', e)
+
+    async def clear(self, prefix: str) -> None:
+        try:
+            keys = [key async for key in self.client.scan_iter(match=f'{prefix}*', count=1000)]
+            for start in range(0, len(keys), 1000):
+                await self.client.unlink(*keys[start:start + 1000])
+        except redis.RedisError as e:
+            self.on_error('clear', e)
+
+    async def size_bytes(self) -> int:
+        try:
+            info = await self.client.info('memory')
+        except redis.RedisError as e:
+            self.on_error('size_bytes', e)
+            return 0
+
+        return info['used_memory']
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class Cache:
+    """
+    Namespace of a backend storing JSON values, deflated, with a default TTL
+    and its own hit and miss counters
+    """
+
+    def __init__(self, backend: CacheBackend, *, namespace: str, ttl: float) -> None:
+        self.backend = backend
+        self.namespace = namespace
+        self.prefix = f'{namespace}:'
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def encode(value: Any) -> bytes:
+        return zlib.compress(json.dumps(value, separators=(',', ':')).encode())
+
+    @staticmethod
+    def decode(value: bytes) -> Any:
+        return json.loads(zlib.decompress(value))
+
+    async def get(self, key: Any) -> Any | None:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: list[Any]) -> dict[Any, Any]:
+        ''' Cached values of the found keys, in a single backend round trip '''
+        values = await self.backend.get_many([f'{self.prefix}{key}' for key in keys])
+        found = {
+            key: self.decode(values[f'{self.prefix}{key}'])
+            for key in keys if f'{self.prefix}{key}' in values
+        }
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        CACHE_LOOKUPS.labels(self.namespace, 'hit').inc(len(found))
+        CACHE_LOOKUPS.labels(self.namespace, 'miss').inc(len(keys) - len(found))
+
+        return found
+
+    async def set(self, key: Any, value: Any, *, ttl: float | None = None) -> None:
+        await self.backend.set(f'{self.prefix}{key}', self.encode(value), ttl=ttl or self.ttl)
+
+    async def delete(self, key: Any) -> None:
+        await self.backend.delete(f'{self.prefix}{key}')
+
+    async def clear(self) -> None:
+        await self.backend.clear(self.prefix)
+
+
+def create_cache_backend(kind: str) -> CacheBackend:
+    if kind == 'redis':
+        return RedisCacheBackend.from_url(
+            settings.CACHE_REDIS_URL, max_bytes=settings.CACHE_MAX_BYTES
+        )
+    if kind == 'sqlite':
+        return SQLiteCacheBackend(
+            path=settings.CACHE_SQLITE_PATH, max_bytes=settings.CACHE_MAX_BYTES
+        )
+
+    return MemoryCacheBackend(max_bytes=settings.CACHE_MAX_BYTES)
+
+
+class CacheRegistry:
+    """
+    The caches of the process by namespace, each on the backend set for it in
+    `CACHE_NAMESPACE_BACKENDS`, or `CACHE_BACKEND`. One backend of each kind is shared.
+    """
+
+    def __init__(self) -> None:
+        self._backends: dict[str, CacheBackend] = {}
+        self._caches: dict[str, Cache] = {}
+
+    def get_cache(self, namespace: str, *, ttl: float) -> Cache:
+        if namespace not in self._caches:
+            kind = settings.CACHE_NAMESPACE_BACKENDS.get(namespace, settings.CACHE_BACKEND)
+            if kind not in self._backends:
+                self._backends[kind] = create_cache_backend(kind)
+            self._caches[namespace] = Cache(self._backends[kind], namespace=namespace, ttl=ttl)
+
+        return self._caches[namespace]
+
+    async def close(self) -> None:
+        for backend in self._backends.values():
+            await backend.close()
+
+
+cache_registry = CacheRegistry()
@@ -1,6 +1,6 @@
 from pydantic import BaseSettings, validator
 from starlette.datastructures import Secret  # noqa: F401
-from typing import Any
+from typing import Any, Literal
 
 
 class Settings(BaseSettings):
@@ -9,11 +9,44 @@ class Settings(BaseSettings):
     TMDB_API_BASEURL: str = 'https://api.themoviedb.org'
     TMDP_API_V3: str = '/3'
     TMDB_API_KEY: str
+    # Deadlines of the sources composed concurrently in a single response
+    TMDB_API_DEADLINE_SECONDS: float = 5.0
+    RATINGS_DEADLINE_SECONDS: float = 1.0
+    TMDB_CACHE_TTL_SECONDS: int = 3600
+    # A movie detail refreshes its catalog entry once it is older than this
+    MOVIE_CATALOG_REFRESH_SECONDS: int = 24 * 3600
 
     SECRET_KEY: str = 'CHANGEME'
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     JWT_ALGORITHM: str
     JWT_AUDIENCE: str
+    # Evicted across workers on user writes, the TTL bounds a missed notification
+    TOKEN_VERSION_CACHE_TTL_SECONDS: int = 60
+    AVG_RATING_CACHE_TTL_SECONDS: int = 300
+
+    # Cache backend of each namespace ('tmdb', 'token_versions', 'avg_ratings'),
+    # defaulting to CACHE_BACKEND: 'memory' is private to each worker, 'sqlite'
+    # shared by the workers of a host and 'redis' by every host
+    CACHE_BACKEND: Literal['memory', 'sqlite', 'redis'] = 'memory'
+    CACHE_NAMESPACE_BACKENDS: dict[str, Literal['memory', 'sqlite', 'redis']] = {
+        'tmdb': 'sqlite'
+    }
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_SQLITE_PATH: str = '/tmp/movie-rater-cache.sqlite3'
+    CACHE_REDIS_URL: str = 'redis://localhost:6379/0'
+
+    # In-memory leaderboards, rebuilt from the rating rollups
+    LEADERBOARD_REFRESH_SECONDS: float = 60.0
+    # Weight of the mean grade of all movies in each movie's Bayesian average
+    LEADERBOARD_PRIOR_VOTES: int = 10
+
+    # Neighbors kept per movie by `build_similar_movies`, and raters they must share
+    SIMILAR_MOVIES_TOP_K: int = 50
+    SIMILAR_MOVIES_MIN_OVERLAP: int = 3
+
+    # Versions of the offline models, written by `train_grade_predictor` and
+    # memory-mapped by the workers at startup
+    MODEL_DIR: str = 'models'
 
     POSTGRES_USER: str = 'postgres'
     POSTGRES_PASSWORD: str = 'postgres'
@@ -23,6 +56,66 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str | None = None
 
+    # Pool sizes are per worker: the total is multiplied by the gunicorn workers
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    # Connections are recycled after this many queries, or once idle for that long
+    DB_POOL_MAX_QUERIES: int = 50000
+    DB_POOL_MAX_INACTIVE_CONNECTION_LIFETIME: float = 300.0
+    DB_POOL_ACQUIRE_TIMEOUT: float = 10.0
+    # Set to 0 behind a transaction-mode pgbouncer
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Run the CRUD hot statements as asyncpg prepared statements
+    DB_PREPARED_STATEMENTS: bool = True
+    # Rows fetched per round trip by the streaming exports
+    DB_CURSOR_PREFETCH: int = 1000
+    # Reconnection delay of the LISTEN connection of the cross-worker cache invalidations
+    CACHE_INVALIDATION_RECONNECT_SECONDS: float = 5.0
+
+    # Prometheus metrics at /metrics, only readable with this bearer token when set
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: str | None = None
+
+    # Request traces, posted to an OTLP/HTTP collector or appended to a JSON lines file
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: Literal['otlp', 'file'] = 'file'
+    TRACING_OTLP_ENDPOINT: str = 'http://localhost:4318/v1/traces'
+    TRACING_FILE_PATH: str = 'traces.jsonl'
+    # Share of the traces recorded. The sampling decision of the callers from these
+    # hosts (our own services) is kept, the other callers' are capped by the ratio
+    TRACING_SAMPLE_RATIO: float = 1.0
+    TRACING_TRUSTED_CALLERS: list[str] = []
+    TRACING_EXPORT_INTERVAL_SECONDS: float = 5.0
+    TRACING_MAX_QUEUE_SIZE: int = 10000
+
+    # Profiles of the requests sent by admins with `X-Profile: sampling|cprofile`
+    PROFILER_ENABLED: bool = False
+    PROFILER_DIR: str = 'profiles'
+    # Per host, as profiling slows down every request of the worker
+    PROFILER_MAX_PER_HOUR: int = 10
+    PROFILER_MAX_STORED: int = 100
+    PROFILER_SAMPLE_INTERVAL_SECONDS: float = 0.002
+
+    # CRUD queries slower than this are logged, and explained once repeatedly slow
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN_AFTER: int = 3
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATIO: float = 0.1
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: float = 600.0
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS: int = 10000
+
+    # Event loop lag sampling, and stack dumps of the callbacks holding the loop too long
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_SECONDS: float = 0.1
+    LOOP_BLOCK_THRESHOLD_SECONDS: float = 0.1
+    LOOP_MONITOR_MAX_BLOCKS: int = 50
+
+    # Logs of the `app` modules, as JSON lines or plain text, written from a thread
+    LOG_LEVEL: str = 'INFO'
+    LOG_FORMAT: Literal['json', 'text'] = 'json'
+    LOG_QUEUE_MAX_SIZE: int = 10000
+    # Share of the DEBUG records kept per logger prefix, e.g. {"app.crud": 0.01}
+    LOG_SAMPLING: dict[str, float] = {}
+
     @validator("DATABASE_URL", pre=True)
     def assemble_db_uri(cls, v: str | None, values: dict[str, Any]) -> Any:
         if isinstance(v, str):
@@ -1,18 +1,42 @@
 from typing import Callable
 
+from app.core.cache import cache_registry
 from app.proxy.deps import client_session
 from app.db.deps import db_session
+from app.db.invalidation import invalidation_bus
+from app.db.slow_queries import slow_query_log
+from app.core.config import settings
+from app.core.logging import log_pipeline
+from app.core.loop_monitor import loop_monitor
+from app.core.tracing import create_span_exporter, tracer
+from app.services import grade_predictor, leaderboard
 
 
 def create_start_app_handler() -> Callable:
     async def start_app() -> None:
+        # Stopped last by `stop_app`, so that every startup restarts it
+        log_pipeline.start()
+        if settings.TRACING_ENABLED:
+            tracer.start(create_span_exporter())
+        if settings.LOOP_MONITOR_ENABLED:
+            loop_monitor.start()
         client_session.start()
         await db_session.start()
+        slow_query_log.start(db_session)
+        invalidation_bus.start(db_session.DB_URL)
+        leaderboard.start(db_session())
+        grade_predictor.load(settings.MODEL_DIR)
     return start_app
 
 
 def create_stop_app_handler() -> Callable:
     async def stop_app() -> None:
+        await leaderboard.stop()
+        await invalidation_bus.stop()
         await client_session.stop()
+        await cache_registry.close()
         await db_session.stop()
+        await tracer.stop()
+        await loop_monitor.stop()
+        log_pipeline.stop()
     return stop_app
@@ -0,0 +1,144 @@
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import json
+import logging
+import queue
+import random
+import sys
+
+from app.core.config import settings
+from app.core.tracing import tracer
+
+# Logger of all the app modules, which log with `logging.getLogger(__name__)`
+APP_LOGGER = 'app'
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# Attributes of every record, the others come from `extra`
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, with the `extra` fields and the trace of the
+    request which logged it
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        log = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'location': f'{record.module}.{record.funcName}:{record.lineno}',
+            **{
+                key: value for (key, value) in vars(record).items()
+                if key not in RECORD_ATTRIBUTES
+            },
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log['exception'] = record.exc_text
+        if record.stack_info:
+            log['stack'] = record.stack_info
+
+        return json.dumps(log, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of the DEBUG records of the loggers of LOG_SAMPLING, by
+    longest prefix, before they are formatted
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+
+    def get_rate(self, name: str) -> float:
+        while True:
+            if name in self.rates:
+                return self.rates[name]
+            if '.' not in name:
+                return 1.0
+            name = name.rpartition('.')[0]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        return random.random() < self.get_rate(record.name)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Formats the message on the emitting thread, where the `logger.debug('%s', x)`
+    arguments and the current span are, and drops the records when the
+    listener thread can't keep up rather than waiting for it
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        span = tracer.get_current_span()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        # The listener thread may not be able to format the arguments later
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    Routes the records of the app loggers through a bounded queue to a
+    listener thread, which formats and writes them to stderr, so that logging
+    never blocks the event loop on I/O
+    """
+
+    def __init__(self) -> None:
+        self.handler: NonBlockingQueueHandler | None = None
+        self._listener: QueueListener | None = None
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return None
+
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(
+            JsonFormatter() if settings.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+        )
+        self.handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_MAX_SIZE))
+        self.handler.addFilter(SamplingFilter(settings.LOG_SAMPLING))
+        self._listener = QueueListener(self.handler.queue, stream_handler)
+        self._listener.start()
+
+        logger = logging.getLogger(APP_LOGGER)
+        logger.setLevel(settings.LOG_LEVEL)
+        logger.addHandler(self.handler)
+        logger.propagate = False
+
+    def stop(self) -> None:
+        ''' Write the records still queued, and give the app loggers back to the root one '''
+        if self._listener is None:
+            return None
+
+        logger = logging.getLogger(APP_LOGGER)
+        logger.removeHandler(self.handler)
+        logger.propagate = True
+        self._listener.stop()
+        self._listener = None
+
+
+log_pipeline = LogPipeline()
@@ -0,0 +1,103 @@
+from collections import deque
+from datetime import datetime, timezone
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+from app.schemas.loop_monitor import LoopBlock
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """
+    Samples the lag of the event loop from a task ticking every
+    LOOP_MONITOR_INTERVAL_SECONDS. A watchdog thread checks the ticks: when the
+    loop misses them for LOOP_BLOCK_THRESHOLD_SECONDS, it dumps the stack of
+    the loop thread, which shows the blocking call (bcrypt, JSON decoding,
+    validation of a large payload...) and the coroutine running it.
+    """
+
+    def __init__(self) -> None:
+        self.blocks: deque[LoopBlock] = deque(maxlen=settings.LOOP_MONITOR_MAX_BLOCKS)
+        self._last_tick = time.monotonic()
+        self._open_block: LoopBlock | None = None
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample_lag())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return None
+
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._watchdog.join)
+        self._watchdog = None
+
+    def get_blocks(self) -> list[LoopBlock]:
+        ''' The latest blocks, most recent first '''
+        return [block.copy() for block in reversed(self.blocks)]
+
+    async def _sample_lag(self) -> None:
+        interval = settings.LOOP_MONITOR_INTERVAL_SECONDS
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            self._last_tick = time.monotonic()
+            lag = max(self._last_tick - start - interval, 0.0)
+            EVENT_LOOP_LAG.observe(lag)
+
+            block = self._open_block
+            if block is not None:
+                block.duration_ms = lag * 1000
+                self._open_block = None
+                logger.warning('Event loop was blocked for %.0f ms', block.duration_ms)
+
+    def _watch(self) -> None:
+        threshold = settings.LOOP_BLOCK_THRESHOLD_SECONDS
+        allowed = settings.LOOP_MONITOR_INTERVAL_SECONDS + threshold
+        reported_tick = None
+        while not self._stopped.wait(threshold / 2):
+            last_tick = self._last_tick
+            if time.monotonic() - last_tick < allowed or last_tick == reported_tick:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            # One report per block, the loop task closes it on its next tick
+            reported_tick = last_tick
+            block = LoopBlock(
+                detected_at=datetime.now(timezone.utc),
+                stack=traceback.format_stack(frame),
+            )
+            self.blocks.append(block)
+            self._open_block = block
+            EVENT_LOOP_BLOCKS.inc()
+            logger.warning(
+                'Event loop blocked for over %.0f ms by:\n%s',
+                threshold * 1000, ''.join(block.stack)
+            )
+
+
+loop_monitor = LoopMonitor()
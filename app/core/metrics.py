@@ -0,0 +1,133 @@
+import os
+import time
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Under gunicorn, each worker writes its samples in this directory (see
+# gunicorn.conf.py) and a scrape of any worker aggregates all of them
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+UNMATCHED_ROUTE = '<unmatched>'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Latency of the HTTP requests, by route template',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress',
+    'HTTP requests being served, by route template',
+    ['method', 'route'],
+    multiprocess_mode='livesum',
+)
+TMDB_REQUEST_DURATION = Histogram(
+    'tmdb_request_duration_seconds',
+    'Latency of the TMDB API calls, by endpoint template',
+    ['endpoint', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds',
+    'Latency of the CRUD queries, by SQL constant name',
+    ['query'],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'db_pool_connections',
+    'Connections of the DB pools, by state',
+    ['state'],
+    multiprocess_mode='livesum',
+)
+DB_POOL_ACQUIRE_WAIT = Histogram(
+    'db_pool_acquire_wait_seconds',
+    'Time spent waiting for a pool connection',
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_ACQUIRE_TIMEOUTS = Counter(
+    'db_pool_acquire_timeouts',
+    'Pool connection acquisitions given up after DB_POOL_ACQUIRE_TIMEOUT',
+)
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'Delay of the event loop in running a callback once it is due',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+EVENT_LOOP_BLOCKS = Counter(
+    'event_loop_blocks',
+    'Callbacks which held the event loop over LOOP_BLOCK_THRESHOLD_SECONDS',
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups',
+    'Cache lookups, by namespace and result (hit or miss)',
+    ['namespace', 'result'],
+)
+CACHE_ERRORS = Counter(
+    'cache_errors',
+    'Cache backend calls which failed and were skipped, by backend and operation',
+    ['backend', 'operation'],
+)
+
+
+def generate_metrics() -> bytes:
+    if MULTIPROC_DIR_ENV in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+
+    return generate_latest(REGISTRY)
+
+
+def get_route_template(scope: Scope) -> str:
+    ''' Path template of the route matching the request, bounding the label values '''
+    for route in scope['app'].routes:
+        (match, _) = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+
+    return UNMATCHED_ROUTE
+
+
+class PrometheusMiddleware:
+    """
+    Records the latency of each HTTP request, until its last body chunk is
+    sent, and the requests in progress
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        (method, route) = (scope['method'], get_route_template(scope))
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, route, status).observe(
+                time.perf_counter() - start
+            )
+            in_progress.dec()
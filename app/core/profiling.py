@@ -0,0 +1,228 @@
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from uuid import UUID, uuid4
+import asyncio
+import cProfile
+import logging
+import marshal
+import sys
+import threading
+import time
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.dependencies.auth import (
+    get_current_active_admin_user,
+    get_current_active_user,
+    get_user_from_token,
+)
+from app.core.config import settings
+from app.db.deps import RequestConnection, db_session
+from app.schemas.profile import ProfileInfo, ProfilerKind
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'x-profile'
+PROFILE_EXTENSIONS = {
+    ProfilerKind.SAMPLING: 'collapsed',
+    ProfilerKind.CPROFILE: 'pstats',
+}
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the event loop thread from a background thread, and
+    counts the samples of each stack in the collapsed format of flamegraphs
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> bytes:
+        self._stopped.set()
+        self._thread.join()
+        return ''.join(f'{stack} {count}\n' for (stack, count) in self.samples.items()).encode()
+
+
+class CProfiler:
+    """
+    Deterministic profile of every call made on the event loop thread
+    """
+
+    def __init__(self) -> None:
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> bytes:
+        self._profile.disable()
+        self._profile.create_stats()
+        # The marshalled stats are the format of `pstats.Stats.dump_stats`
+        return marshal.dumps(self._profile.stats)
+
+
+class ProfileStore:
+    """
+    Profiles on the local disk, with their info alongside, shared by the
+    workers of the host. The oldest are removed beyond PROFILER_MAX_STORED.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+
+    def _info_paths(self) -> list[Path]:
+        return sorted(self.path.glob('*.json'), key=lambda path: path.stat().st_mtime)
+
+    def count_since(self, since: float) -> int:
+        return sum(1 for path in self._info_paths() if path.stat().st_mtime >= since)
+
+    def save(self, info: ProfileInfo, data: bytes) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / f'{info.id}.{PROFILE_EXTENSIONS[info.profiler]}').write_bytes(data)
+        (self.path / f'{info.id}.json').write_text(info.json())
+
+        for path in self._info_paths()[:-settings.PROFILER_MAX_STORED]:
+            for profile_path in self.path.glob(f'{path.stem}.*'):
+                profile_path.unlink(missing_ok=True)
+
+    def list(self) -> list[ProfileInfo]:
+        return [ProfileInfo.parse_file(path) for path in reversed(self._info_paths())]
+
+    def get(self, profile_id: UUID) -> tuple[ProfileInfo, Path] | None:
+        info_path = self.path / f'{profile_id}.json'
+        if not info_path.exists():
+            return None
+
+        info = ProfileInfo.parse_file(info_path)
+        return (info, self.path / f'{profile_id}.{PROFILE_EXTENSIONS[info.profiler]}')
+
+
+profile_store = ProfileStore(settings.PROFILER_DIR)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests of admins sending `X-Profile: sampling|cprofile`.
+
+    Only one request is profiled at a time per worker, and at most
+    PROFILER_MAX_PER_HOUR per host. Both profilers run on the event loop
+    thread, so the concurrent requests of the worker show up in the profile.
+    The response carries `X-Profile-Status`, and `X-Profile-Id` of the profile
+    to download from `/admin/profiles/{id}`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._profiling = False
+
+    async def _is_admin(self, headers: Headers) -> bool:
+        (scheme, _, token) = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            return False
+
+        connection = RequestConnection(db_session)
+        try:
+            user = await get_user_from_token(token=token, db_connection=connection)
+            get_current_active_admin_user(current_user=get_current_active_user(current_user=user))
+        except HTTPException:
+            return False
+        finally:
+            await connection.release()
+
+        return True
+
+    async def _get_denial(self, headers: Headers) -> str | None:
+        if not await self._is_admin(headers):
+            return 'denied'
+        recent = await asyncio.to_thread(profile_store.count_since, time.time() - 3600)
+        if recent >= settings.PROFILER_MAX_PER_HOUR:
+            return 'rate-limited'
+        # Checked last, right before profiling starts without any await in between
+        if self._profiling:
+            return 'busy'
+
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not settings.PROFILER_ENABLED:
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        if PROFILE_HEADER not in headers:
+            return await self.app(scope, receive, send)
+
+        try:
+            kind = ProfilerKind(headers[PROFILE_HEADER])
+        except ValueError:
+            kind = None
+        denial = 'unknown-profiler' if kind is None else await self._get_denial(headers)
+        if denial is not None:
+            return await self.app(scope, receive, self._with_headers(send, {
+                'X-Profile-Status': denial
+            }))
+
+        profile_id = uuid4()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        self._profiling = True
+        profiler = SamplingProfiler(settings.PROFILER_SAMPLE_INTERVAL_SECONDS) \
+            if kind == ProfilerKind.SAMPLING else CProfiler()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, self._with_headers(send_wrapper, {
+                'X-Profile-Status': 'profiled',
+                'X-Profile-Id': str(profile_id),
+            }))
+        finally:
+            data = profiler.stop()
+            self._profiling = False
+            info = ProfileInfo(
+                id=profile_id,
+                profiler=kind,
+                method=scope['method'],
+                path=scope['path'],
+                status_code=status_code,
+                duration_ms=(time.perf_counter() - start) * 1000,
+                created_at=datetime.now(timezone.utc),
+            )
+            await asyncio.to_thread(profile_store.save, info, data)
+            logger.warning('Profiled %s %s as %s', info.method, info.path, profile_id)
+
+    @staticmethod
+    def _with_headers(send: Send, extra_headers: dict[str, str]) -> Send:
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                response_headers = MutableHeaders(scope=message)
+                for (name, value) in extra_headers.items():
+                    response_headers.append(name, value)
+            await send(message)
+
+        return send_wrapper
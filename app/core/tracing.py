@@ -0,0 +1,390 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Iterator
+import asyncio
+import json
+import logging
+import random
+import re
+import secrets
+import time
+
+import aiohttp
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import get_route_template
+
+logger = logging.getLogger(__name__)
+
+# https://www.w3.org/TR/trace-context/#traceparent-header
+TRACEPARENT_REGEX = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+SAMPLED_FLAG = 0x01
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    sampled: bool
+    kind: int = SPAN_KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+    # End of the endpoint function of a request span, starting its serialization
+    handler_end_ns: int | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return f'00-{self.trace_id}-{self.span_id}-{SAMPLED_FLAG if self.sampled else 0:02x}'
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'kind': self.kind,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': (self.end_ns - self.start_ns) / 1e6,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+_current_span: ContextVar[Span | None] = ContextVar('current_span', default=None)
+
+
+class SpanExporter(ABC):
+    """
+    Destination of the finished spans, exported by batches
+    """
+
+    @abstractmethod
+    async def export(self, spans: list[Span]) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class JsonFileSpanExporter(SpanExporter):
+    """
+    Appends one JSON span per line to a local file, for offline analysis
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+
+    def _write(self, lines: list[str]) -> None:
+        with self.path.open('a') as file:
+            file.writelines(lines)
+
+    async def export(self, spans: list[Span]) -> None:
+        await asyncio.to_thread(
+            self._write, [f'{json.dumps(span.to_dict(), default=str)}\n' for span in spans]
+        )
+
+
+class OTLPSpanExporter(SpanExporter):
+    """
+    Posts the spans in the OTLP/HTTP JSON encoding to a collector, e.g.
+    `http://otel-collector:4318/v1/traces`
+    """
+
+    def __init__(self, endpoint: str, *, service_name: str) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._session: aiohttp.ClientSession | None = None
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> dict:
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    def _encode(self, spans: list[Span]) -> dict:
+        return {'resourceSpans': [{
+            'resource': {'attributes': [self._attribute('service.name', self.service_name)]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [{
+                    'traceId': span.trace_id,
+                    'spanId': span.span_id,
+                    'parentSpanId': span.parent_id or '',
+                    'name': span.name,
+                    'kind': span.kind,
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns),
+                    'attributes': [
+                        self._attribute(key, value) for (key, value) in span.attributes.items()
+                    ],
+                    'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+                } for span in spans],
+            }],
+        }]}
+
+    async def export(self, spans: list[Span]) -> None:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        async with self._session.post(self.endpoint, json=self._encode(spans)) as resp:
+            if resp.status >= 400:
+                logger.warning('OTLP export of %d spans failed with %d', len(spans), resp.status)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def create_span_exporter() -> SpanExporter:
+    if settings.TRACING_EXPORTER == 'otlp':
+        return OTLPSpanExporter(
+            settings.TRACING_OTLP_ENDPOINT, service_name=settings.PROJECT_NAME
+        )
+
+    return JsonFileSpanExporter(settings.TRACING_FILE_PATH)
+
+
+class Tracer:
+    """
+    Spans of the current request, in a context variable so that the spans of
+    concurrent requests and tasks don't mix. Finished spans are queued and
+    exported by batches in the background.
+
+    Traces only start in the request middleware: DB and TMDB spans outside of
+    a request, e.g. of the leaderboard refreshes, are not recorded.
+    """
+
+    def __init__(self) -> None:
+        self.exporter: SpanExporter | None = None
+        self._queue: list[Span] = []
+        self._task: asyncio.Task | None = None
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start(self, exporter: SpanExporter) -> None:
+        self.exporter = exporter
+        self._task = asyncio.create_task(self._export_periodically())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return None
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._flush()
+        await self.exporter.close()
+        self.exporter = None
+
+    @contextmanager
+    def start_trace(
+        self, name: str, *, traceparent: str | None = None, trusted_caller: bool = False,
+        **attributes
+    ) -> Iterator[Span | None]:
+        '''
+        Root span of a request, continuing the trace of the caller's `traceparent`.
+        Only a trusted caller can have its trace recorded beyond the sample ratio.
+        '''
+        if not self.enabled:
+            yield None
+            return
+
+        match = TRACEPARENT_REGEX.match(traceparent or '')
+        if match:
+            (trace_id, parent_id, flags) = match.groups()
+            sampled = bool(int(flags, 16) & SAMPLED_FLAG) and (
+                trusted_caller or random.random() < settings.TRACING_SAMPLE_RATIO
+            )
+        else:
+            (trace_id, parent_id) = (secrets.token_hex(16), None)
+            sampled = random.random() < settings.TRACING_SAMPLE_RATIO
+
+        span = Span(
+            name=name, trace_id=trace_id, span_id=secrets.token_hex(8), parent_id=parent_id,
+            sampled=sampled, kind=SPAN_KIND_SERVER, attributes=attributes
+        )
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def start_span(
+        self, name: str, *, kind: int = SPAN_KIND_INTERNAL, **attributes
+    ) -> Iterator[Span | None]:
+        ''' Child of the current span, none outside of a trace '''
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(
+            name=name, trace_id=parent.trace_id, span_id=secrets.token_hex(8),
+            parent_id=parent.span_id, sampled=parent.sampled, kind=kind, attributes=attributes
+        )
+        with self._activate(span):
+            yield span
+
+    def record_span(self, name: str, *, start_ns: int, end_ns: int, **attributes) -> None:
+        ''' Child of the current span for a time range already elapsed '''
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            return None
+
+        self._end(Span(
+            name=name, trace_id=parent.trace_id, span_id=secrets.token_hex(8),
+            parent_id=parent.span_id, sampled=True, start_ns=start_ns, end_ns=end_ns,
+            attributes=attributes
+        ))
+
+    def get_current_span(self) -> Span | None:
+        return _current_span.get()
+
+    def get_propagation_headers(self) -> dict[str, str]:
+        ''' `traceparent` of the current span, for the calls to our own services only '''
+        span = _current_span.get()
+        return {'traceparent': span.traceparent} if span is not None else {}
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[None]:
+        token = _current_span.set(span)
+        try:
+            yield
+        except BaseException as e:
+            span.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Async generators may be resumed from another context
+                _current_span.set(None)
+            span.end_ns = time.time_ns()
+            if span.sampled:
+                self._end(span)
+
+    def _end(self, span: Span) -> None:
+        if len(self._queue) >= settings.TRACING_MAX_QUEUE_SIZE:
+            self.dropped += 1
+            return None
+        self._queue.append(span)
+
+    async def _flush(self) -> None:
+        (spans, self._queue) = (self._queue, [])
+        if not spans:
+            return None
+        try:
+            await self.exporter.export(spans)
+        except Exception as e:
+            logger.warning('Unable to export %d spans: %s', len(spans), e)
+
+    async def _export_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.TRACING_EXPORT_INTERVAL_SECONDS)
+            await self._flush()
+
+
+tracer = Tracer()
+
+
+class TracingMiddleware:
+    """
+    Opens the span of each HTTP request, named after its route template. The
+    time before the endpoint function runs (request validation, dependencies
+    like auth) and after it returns (response validation and serialization)
+    are recorded as child spans, see `instrument_routes`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not tracer.enabled:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope['headers'])
+        traceparent = headers.get(b'traceparent', b'').decode('latin-1')
+        client = scope.get('client')
+        trusted_caller = client is not None and client[0] in settings.TRACING_TRUSTED_CALLERS
+        route = get_route_template(scope)
+        with tracer.start_trace(
+            f'{scope["method"]} {route}', traceparent=traceparent, trusted_caller=trusted_caller,
+            **{'http.method': scope['method'], 'http.route': route}
+        ) as span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message['type'] == 'http.response.start':
+                    span.set_attribute('http.status_code', message['status'])
+                    if span.handler_end_ns is not None:
+                        tracer.record_span(
+                            'serialize', start_ns=span.handler_end_ns, end_ns=time.time_ns()
+                        )
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+def _trace_endpoint(call: Callable) -> Callable:
+    def record_dependencies() -> None:
+        span = tracer.get_current_span()
+        if span is not None:
+            tracer.record_span('dependencies', start_ns=span.start_ns, end_ns=time.time_ns())
+
+    def record_handler_end() -> None:
+        span = tracer.get_current_span()
+        if span is not None:
+            span.handler_end_ns = time.time_ns()
+
+    # FastAPI awaits coroutine functions and runs the others in a thread
+    if asyncio.iscoroutinefunction(call):
+        @wraps(call)
+        async def traced(**values) -> Any:
+            record_dependencies()
+            with tracer.start_span('handler'):
+                response = await call(**values)
+            record_handler_end()
+            return response
+    else:
+        @wraps(call)
+        def traced(**values) -> Any:
+            record_dependencies()
+            with tracer.start_span('handler'):
+                response = call(**values)
+            record_handler_end()
+            return response
+
+    return traced
+
+
+def instrument_routes(routes: list) -> None:
+    ''' Time the endpoint functions of the routes, once their dependencies are solved '''
+    for route in routes:
+        if isinstance(route, APIRoute):
+            route.dependant.call = _trace_endpoint(route.dependant.call)
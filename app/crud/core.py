@@ -1,28 +1,139 @@
-from typing import Tuple
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterator, Mapping, Tuple
 import math
+import re
+import sys
+import time
 from databases import Database
 
+from app.core.config import settings
+from app.core.metrics import DB_QUERY_DURATION
+from app.core.tracing import SPAN_KIND_CLIENT, tracer
+from app.db.deps import RequestConnection
+from app.db.slow_queries import slow_query_log
 from app.schemas.core import CoreModel, ListResult
 
+# `:name` placeholders, leaving `::TYPE` casts alone
+NAMED_PARAM_REGEX = re.compile(r'(?<!:):([a-zA-Z_][a-zA-Z0-9_]*)')
+
+# Name of the module-level `*_QUERY` constant of each query of the CRUD modules
+QUERY_NAMES: dict[str, str] = {}
+UNNAMED_QUERY_LABEL = 'unnamed'
+
+
+@lru_cache(maxsize=None)
+def to_positional(query: str) -> tuple[str, tuple[str, ...]]:
+    ''' Rewrite the `:name` params of a query as asyncpg `$n` ones, once per query '''
+    names: list[str] = []
+
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f'${names.index(name) + 1}'
+
+    return (NAMED_PARAM_REGEX.sub(replace, query), tuple(names))
+
 
 class BaseCrud:
     PAGE_SIZE = 20
+    # Hot statements run as asyncpg prepared statements, and their rows are
+    # trusted to build models without validation
+    PREPARED_QUERIES: frozenset[str] = frozenset()
 
-    def __init__(self, db: Database) -> None:
+    def __init__(self, db: Database | RequestConnection) -> None:
         self.db = db
 
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        for (name, value) in vars(sys.modules[cls.__module__]).items():
+            if name.endswith('_QUERY') and isinstance(value, str):
+                QUERY_NAMES.setdefault(value, name)
+
+    @contextmanager
+    def _observe(self, query: str, values: dict | None) -> Iterator[None]:
+        ''' Time a query, logging it as slow unless `values` is None '''
+        name = QUERY_NAMES.get(query, UNNAMED_QUERY_LABEL)
+        start = time.perf_counter()
+        try:
+            with tracer.start_span(f'DB {name}', kind=SPAN_KIND_CLIENT):
+                yield
+        finally:
+            duration = time.perf_counter() - start
+            DB_QUERY_DURATION.labels(name).observe(duration)
+            if values is not None and duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+                slow_query_log.record(
+                    name=name, query=query, values=values, duration_ms=duration * 1000
+                )
+
+    def _is_prepared(self, query: str) -> bool:
+        return settings.DB_PREPARED_STATEMENTS \
+            and query in self.PREPARED_QUERIES \
+            and isinstance(self.db, RequestConnection)
+
+    async def _fetch_all(self, query: str, **values) -> list[Mapping]:
+        with self._observe(query, values):
+            if self._is_prepared(query):
+                (positional_query, names) = to_positional(query)
+                return await self.db.fetch_prepared(
+                    positional_query, *(values[name] for name in names)
+                )
+
+            return await self.db.fetch_all(query=query, values=values)
+
+    async def _fetch_one(self, query: str, **values) -> Mapping | None:
+        with self._observe(query, values):
+            if self._is_prepared(query):
+                (positional_query, names) = to_positional(query)
+                return await self.db.fetch_one_prepared(
+                    positional_query, *(values[name] for name in names)
+                )
+
+            return await self.db.fetch_one(query=query, values=values)
+
+    async def _fetch_val(self, query: str, **values) -> Any:
+        with self._observe(query, values):
+            if self._is_prepared(query):
+                (positional_query, names) = to_positional(query)
+                return await self.db.fetch_val_prepared(
+                    positional_query, *(values[name] for name in names)
+                )
+
+            return await self.db.fetch_val(query=query, values=values)
+
+    async def _iterate(self, query: str, **values) -> AsyncIterator[Mapping]:
+        if self._is_prepared(query):
+            (positional_query, names) = to_positional(query)
+            cursor = self.db.cursor_prepared(
+                positional_query, *(values[name] for name in names)
+            )
+        else:
+            cursor = self.db.iterate(query=query, values=values)
+
+        # Streams are timed until exhausted, including the consumer's time,
+        # so they are never logged as slow
+        with self._observe(query, None):
+            async for record in cursor:
+                yield record
+
+    async def _execute(self, query: str, **values) -> Any:
+        with self._observe(query, values):
+            return await self.db.execute(query=query, values=values)
+
+    def _build_result(self, query: str, ResultClass: CoreModel, record: Mapping) -> CoreModel:
+        if self._is_prepared(query):
+            return ResultClass.construct(**record)
+
+        return ResultClass(**record)
+
     def _get_limit_offset_from_page(self, page: int) -> tuple[int, int]:
         return (self.PAGE_SIZE, self.PAGE_SIZE * (page - 1))
 
     async def _get_total_results_and_pages(
         self, *, count_query: str, **query_params
     ) -> Tuple[int, int]:
-        total_results = await self.db.fetch_val(
-            query=count_query,
-            values={
-                **query_params
-            }
-        )
+        total_results = await self._fetch_val(count_query, **query_params)
         total_pages = math.ceil(total_results / self.PAGE_SIZE)
 
         return (total_results, total_pages)
@@ -37,13 +148,11 @@ class BaseCrud:
         **query_params
     ) -> ListResult:
         (limit, offset) = self._get_limit_offset_from_page(page)
-        records = await self.db.fetch_all(
-            query=query,
-            values={
-                "limit": limit,
-                "offset": offset,
-                **query_params
-            }
+        records = await self._fetch_all(
+            query,
+            limit=limit,
+            offset=offset,
+            **query_params
         )
 
         (total_results, total_pages) = \
@@ -56,7 +165,7 @@ class BaseCrud:
             'page': page,
             'total_results': total_results,
             'total_pages': total_pages,
-            'results': [ResultClass(**record)
+            'results': [self._build_result(query, ResultClass, record)
                         for record in records]
         }
 
@@ -69,12 +178,9 @@ class BaseCrud:
         ResultClass: CoreModel,
         **query_params
     ) -> CoreModel:
-        record = await self.db.fetch_one(
-            query=query,
-            values={**query_params}
-        )
+        record = await self._fetch_one(query, **query_params)
 
         if not record:
             return None
 
-        return ResultClass(**record)
+        return self._build_result(query, ResultClass, record)
@@ -0,0 +1,38 @@
+from app.crud.core import BaseCrud
+from app.schemas.leaderboard import MovieRatingStats
+
+GET_MOVIE_RATING_STATS_QUERY = """
+    SELECT movie_id, rating_count, grade_sum
+    FROM movie_rating_stats
+    WHERE rating_count > 0;
+"""
+
+GET_MOVIE_RATING_STATS_SINCE_QUERY = """
+    SELECT movie_id, SUM(rating_count)::INTEGER AS rating_count,
+        SUM(grade_sum)::BIGINT AS grade_sum
+    FROM movie_rating_daily
+    WHERE day > CURRENT_DATE - CAST(:days AS INTEGER)
+    GROUP BY movie_id
+    HAVING SUM(rating_count) > 0;
+"""
+
+
+class MovieStatsCrud(BaseCrud):
+    """
+    Reads of the rating rollups, maintained by triggers on the ratings
+    """
+    PREPARED_QUERIES = frozenset({
+        GET_MOVIE_RATING_STATS_QUERY,
+        GET_MOVIE_RATING_STATS_SINCE_QUERY,
+    })
+
+    async def get_movie_rating_stats(self, *, days: int | None = None) -> list[MovieRatingStats]:
+        ''' Stats of every rated movie, over the last `days` days or overall '''
+        if days is None:
+            query = GET_MOVIE_RATING_STATS_QUERY
+            records = await self._fetch_all(query)
+        else:
+            query = GET_MOVIE_RATING_STATS_SINCE_QUERY
+            records = await self._fetch_all(query, days=days)
+
+        return [self._build_result(query, MovieRatingStats, record) for record in records]
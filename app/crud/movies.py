@@ -0,0 +1,82 @@
+import logging
+
+from app.crud.core import BaseCrud
+from app.schemas.movie import MovieSummary
+
+logger = logging.getLogger(__name__)
+
+GET_MOVIES_BY_IDS_QUERY = """
+    SELECT id, title, original_title, poster_path, release_date
+    FROM movies
+    WHERE id = ANY(:ids);
+"""
+
+# Whether a movie is in the catalog and was refreshed within `max_age_seconds`
+IS_MOVIE_FRESH_QUERY = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM movies
+        WHERE id = :id
+            AND updated_at > now() - make_interval(secs => :max_age_seconds)
+    );
+"""
+
+UPSERT_MOVIES_QUERY = """
+    INSERT INTO movies (id, title, original_title, poster_path, release_date)
+    SELECT *
+    FROM UNNEST(
+        CAST(:ids AS INTEGER[]),
+        CAST(:titles AS TEXT[]),
+        CAST(:original_titles AS TEXT[]),
+        CAST(:poster_paths AS TEXT[]),
+        CAST(:release_dates AS DATE[])
+    )
+    ON CONFLICT (id) DO UPDATE
+    SET title = EXCLUDED.title,
+        original_title = EXCLUDED.original_title,
+        poster_path = EXCLUDED.poster_path,
+        release_date = EXCLUDED.release_date;
+"""
+
+
+class MovieCrud(BaseCrud):
+    PREPARED_QUERIES = frozenset({
+        GET_MOVIES_BY_IDS_QUERY,
+    })
+
+    async def get_movie_summaries_per_ids(
+        self,
+        *,
+        movie_ids: list[int]
+    ) -> dict[int, MovieSummary]:
+        if not movie_ids:
+            return {}
+
+        records = await self._fetch_all(GET_MOVIES_BY_IDS_QUERY, ids=movie_ids)
+
+        return {
+            record['id']: self._build_result(GET_MOVIES_BY_IDS_QUERY, MovieSummary, record)
+            for record in records
+        }
+
+    async def is_movie_fresh(self, *, movie_id: int, max_age_seconds: int) -> bool:
+        return await self._fetch_val(
+            IS_MOVIE_FRESH_QUERY, id=movie_id, max_age_seconds=max_age_seconds
+        )
+
+    async def upsert_movie_summaries(self, *, movies: list[MovieSummary]) -> None:
+        ''' Insert or refresh many catalog entries in a single statement '''
+        if not movies:
+            return None
+
+        await self._execute(
+            UPSERT_MOVIES_QUERY,
+            ids=[movie.id for movie in movies],
+            titles=[movie.title for movie in movies],
+            original_titles=[movie.original_title for movie in movies],
+            poster_paths=[movie.poster_path for movie in movies],
+            release_dates=[movie.release_date for movie in movies]
+        )
+        logger.debug('Upserted %d movies in the catalog', len(movies))
+
+        return None
@@ -1,16 +1,42 @@
+from datetime import datetime, timezone
+from typing import AsyncIterator, Mapping
 import logging
 from asyncpg import UniqueViolationError
 from databases import Database
 from fastapi import HTTPException, status
 
+from app.core.cache import cache_registry
+from app.core.config import settings
 from app.crud.core import BaseCrud
-from app.schemas.rating import RatingCreate, RatingInDB, RatingResult, RatingUpdatePublic
-from app.schemas.user import UserInDB
+from app.db.invalidation import invalidation_bus
+from app.db.deps import RequestConnection
+from app.schemas.rating import (
+    RatingCreate,
+    RatingExpandedInDB,
+    RatingExpandedResult,
+    RatingInDB,
+    RatingResult,
+    RatingSummary,
+    RatingUpdatePublic
+)
+from app.schemas.user import UserIdentity, UserInDB
 from app.services import auth_service
 
 
 logger = logging.getLogger(__name__)
 
+# `since` of a full export
+EXPORT_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+avg_rating_cache = cache_registry.get_cache(
+    'avg_ratings', ttl=settings.AVG_RATING_CACHE_TTL_SECONDS
+)
+invalidation_bus.subscribe(
+    'movie_ratings',
+    evict=lambda movie_id: avg_rating_cache.delete(int(movie_id)),
+    reset=avg_rating_cache.clear
+)
+
 COUNT_RATINGS_QUERY = """
     SELECT COUNT(*)
     FROM ratings;
@@ -22,11 +48,17 @@ COUNT_RATINGS_BY_MOVIE_QUERY = """
     WHERE movie_id = :movie_id;
 """
 
+COUNT_RATINGS_BY_USER_QUERY = """
+    SELECT COUNT(*)
+    FROM ratings
+    WHERE user_id = :user_id;
+"""
+
 GET_RATINGS_QUERY = """
     SELECT id, movie_id, user_id, grade,
         created_at, updated_at
     FROM ratings
-    ORDER BY created_at DESC
+    ORDER BY created_at DESC, id
     LIMIT :limit OFFSET :offset;
 """
 
@@ -35,7 +67,26 @@ GET_RATINGS_BY_MOVIE_QUERY = """
         created_at, updated_at
     FROM ratings
     WHERE movie_id = :movie_id
-    ORDER BY created_at DESC
+    ORDER BY created_at DESC, id
+    LIMIT :limit OFFSET :offset;
+"""
+
+GET_RATINGS_WITH_USER_QUERY = """
+    SELECT ratings.id, ratings.movie_id, ratings.user_id, ratings.grade,
+        ratings.created_at, ratings.updated_at, users.username
+    FROM ratings
+    JOIN users ON users.id = ratings.user_id
+    ORDER BY ratings.created_at DESC, ratings.id
+    LIMIT :limit OFFSET :offset;
+"""
+
+GET_RATINGS_BY_MOVIE_WITH_USER_QUERY = """
+    SELECT ratings.id, ratings.movie_id, ratings.user_id, ratings.grade,
+        ratings.created_at, ratings.updated_at, users.username
+    FROM ratings
+    JOIN users ON users.id = ratings.user_id
+    WHERE ratings.movie_id = :movie_id
+    ORDER BY ratings.created_at DESC, ratings.id
     LIMIT :limit OFFSET :offset;
 """
 
@@ -44,10 +95,31 @@ GET_RATINGS_BY_USER_QUERY = """
         created_at, updated_at
     FROM ratings
     WHERE user_id = :user_id
-    ORDER BY created_at DESC
+    ORDER BY created_at DESC, id
     LIMIT :limit OFFSET :offset;
 """
 
+EXPORT_RATINGS_QUERY = """
+    SELECT id, movie_id, user_id, grade,
+        created_at, updated_at
+    FROM ratings
+    WHERE updated_at >= :since
+    ORDER BY updated_at, id;
+"""
+
+EXPORT_RATINGS_BY_USER_QUERY = """
+    SELECT id, movie_id, user_id, grade,
+        created_at, updated_at
+    FROM ratings
+    WHERE user_id = :user_id AND updated_at >= :since
+    ORDER BY updated_at, id;
+"""
+
+GET_RATING_GRADES_QUERY = """
+    SELECT user_id, movie_id, grade
+    FROM ratings;
+"""
+
 GET_RATING_BY_USER_MOVIE_QUERY = """
     SELECT id, movie_id, user_id, grade,
         created_at, updated_at
@@ -61,7 +133,16 @@ GET_AVG_RATING_BY_MOVIE_QUERY = """
     WHERE movie_id = :movie_id;
 """
 
-GET_RATING_BY_ID = """
+GET_RATING_SUMMARIES_BY_MOVIES_QUERY = """
+    SELECT movie_id, AVG(grade)::NUMERIC(3,1)::FLOAT AS avg_rating,
+        COUNT(*) AS rating_count,
+        MAX(grade) FILTER (WHERE user_id = :user_id) AS user_grade
+    FROM ratings
+    WHERE movie_id = ANY(:movie_ids)
+    GROUP BY movie_id;
+"""
+
+GET_RATING_BY_ID_QUERY = """
     SELECT id, movie_id, user_id, grade,
         created_at, updated_at
     FROM ratings
@@ -85,50 +166,99 @@ UPDATE_RATING_QUERY = """
 
 DELETE_RATING_QUERY = """
     DELETE FROM ratings
-    WHERE id = :id;
+    WHERE id = :id
+    RETURNING movie_id;
 """
 
 
 class RatingCrud(BaseCrud):
-
-    def __init__(self, db: Database) -> None:
+    PREPARED_QUERIES = frozenset({
+        COUNT_RATINGS_QUERY,
+        COUNT_RATINGS_BY_MOVIE_QUERY,
+        COUNT_RATINGS_BY_USER_QUERY,
+        GET_RATINGS_QUERY,
+        GET_RATINGS_BY_MOVIE_QUERY,
+        GET_RATINGS_WITH_USER_QUERY,
+        GET_RATINGS_BY_MOVIE_WITH_USER_QUERY,
+        GET_RATINGS_BY_USER_QUERY,
+        EXPORT_RATINGS_QUERY,
+        EXPORT_RATINGS_BY_USER_QUERY,
+        GET_RATING_GRADES_QUERY,
+        GET_RATING_BY_USER_MOVIE_QUERY,
+        GET_AVG_RATING_BY_MOVIE_QUERY,
+        GET_RATING_SUMMARIES_BY_MOVIES_QUERY,
+        GET_RATING_BY_ID_QUERY,
+    })
+
+    def __init__(self, db: Database | RequestConnection) -> None:
         super().__init__(db)
         self.auth_service = auth_service
 
-    async def get_ratings(self, *, page: int = 1, movie_id: int | None = None) -> RatingResult:
+    async def get_ratings(
+        self,
+        *,
+        page: int = 1,
+        movie_id: int | None = None,
+        expand: set[str] = frozenset()
+    ) -> RatingResult | RatingExpandedResult:
+        ''' Usernames are joined in the same query when `expand` includes "user" '''
+        ResultClass = RatingExpandedInDB if expand else RatingInDB
         if movie_id is None:
             return await self._get_list_results(
-                query=GET_RATINGS_QUERY,
+                query=GET_RATINGS_WITH_USER_QUERY if 'user' in expand else GET_RATINGS_QUERY,
                 count_query=COUNT_RATINGS_QUERY,
                 page=page,
-                ResultClass=RatingInDB
+                ResultClass=ResultClass
             )
 
         return await self._get_list_results(
-            query=GET_RATINGS_BY_MOVIE_QUERY,
+            query=GET_RATINGS_BY_MOVIE_WITH_USER_QUERY if 'user' in expand
+            else GET_RATINGS_BY_MOVIE_QUERY,
             count_query=COUNT_RATINGS_BY_MOVIE_QUERY,
             page=page,
             movie_id=movie_id,
-            ResultClass=RatingInDB
+            ResultClass=ResultClass
         )
 
     async def get_ratings_per_user(
         self,
         *,
-        current_user: UserInDB,
+        user_id: int,
         page: int = 1
     ) -> RatingResult:
         return await self._get_list_results(
-            query=GET_RATINGS_QUERY,
-            count_query=COUNT_RATINGS_QUERY,
+            query=GET_RATINGS_BY_USER_QUERY,
+            count_query=COUNT_RATINGS_BY_USER_QUERY,
             page=page,
             ResultClass=RatingInDB,
-            user_id=current_user.id
+            user_id=user_id
         )
 
+    async def iterate_ratings_export(
+        self,
+        *,
+        user_id: int | None = None,
+        since: datetime = EXPORT_EPOCH
+    ) -> AsyncIterator[Mapping]:
+        '''
+        Stream the ratings updated since `since`, oldest first, so that the last
+        `updated_at` of an export is the `since` of the next one
+        '''
+        if user_id is None:
+            records = self._iterate(EXPORT_RATINGS_QUERY, since=since)
+        else:
+            records = self._iterate(EXPORT_RATINGS_BY_USER_QUERY, user_id=user_id, since=since)
+
+        async for record in records:
+            yield record
+
+    def iterate_rating_grades(self) -> AsyncIterator[Mapping]:
+        ''' Stream the (user_id, movie_id, grade) of every rating, for the offline models '''
+        return self._iterate(GET_RATING_GRADES_QUERY)
+
     async def get_rating_per_id(self, *, rating_id: int) -> RatingInDB:
         rating = await self._get_single_result(
-            query=GET_RATING_BY_ID,
+            query=GET_RATING_BY_ID_QUERY,
             ResultClass=RatingInDB,
             id=rating_id
         )
@@ -145,7 +275,7 @@ class RatingCrud(BaseCrud):
     async def get_rating_per_user_movie(
         self,
         *,
-        current_user: UserInDB,
+        current_user: UserIdentity | UserInDB,
         movie_id: int
     ) -> RatingInDB:
         rating = await self._get_single_result(
@@ -168,43 +298,69 @@ class RatingCrud(BaseCrud):
         *,
         movie_id: int
     ) -> float | None:
-        res = await self.db.fetch_one(
-            query=GET_AVG_RATING_BY_MOVIE_QUERY,
-            values={'movie_id': movie_id}
+        cached = await avg_rating_cache.get_many([movie_id])
+        if movie_id in cached:
+            return cached[movie_id]
+
+        avg_rating = await self._fetch_val(
+            GET_AVG_RATING_BY_MOVIE_QUERY,
+            movie_id=movie_id
         )
+        avg_rating = float(avg_rating) if avg_rating else None
+        await avg_rating_cache.set(movie_id, avg_rating)
 
-        if not res[0]:
-            return None
+        return avg_rating
 
-        return float(res[0])
+    async def get_rating_summaries_per_movies(
+        self,
+        *,
+        movie_ids: list[int],
+        user_id: int | None = None
+    ) -> dict[int, RatingSummary]:
+        ''' Average, count and user grade of many movies in a single query '''
+        if not movie_ids:
+            return {}
+
+        records = await self._fetch_all(
+            GET_RATING_SUMMARIES_BY_MOVIES_QUERY,
+            movie_ids=movie_ids,
+            user_id=user_id
+        )
+
+        return {
+            record['movie_id']: self._build_result(
+                GET_RATING_SUMMARIES_BY_MOVIES_QUERY, RatingSummary, record
+            )
+            for record in records
+        }
 
     async def create_new_rating(self, *, new_rating: RatingCreate) -> RatingInDB:
         try:
-            created_rating = await self.db.fetch_one(
-                query=CREATE_NEW_RATING_QUERY,
-                values=new_rating.dict()
+            created_rating = await self._fetch_one(
+                CREATE_NEW_RATING_QUERY,
+                **new_rating.dict()
             )
-            logger.debug(f'Created rating is {created_rating}')
+            logger.debug('Created rating is %s', created_rating)
         except UniqueViolationError:
             detail = "Another rating already exists"
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail=detail
             )
+        # Other workers are notified by the ratings trigger
+        await avg_rating_cache.delete(new_rating.movie_id)
 
         return RatingInDB(**created_rating)
 
     async def update_rating(
         self, *, rating_id: int, rating_to_update: RatingUpdatePublic
     ) -> RatingInDB:
-        updated_rating = await self.db.fetch_one(
-            query=UPDATE_RATING_QUERY,
-            values={
-                **rating_to_update.dict(),
-                'id': rating_id
-            }
+        updated_rating = await self._fetch_one(
+            UPDATE_RATING_QUERY,
+            **rating_to_update.dict(),
+            id=rating_id
         )
-        logger.debug(f'Updated rating is {updated_rating}')
+        logger.debug('Updated rating is %s', updated_rating)
 
         if updated_rating is None:
             detail = f'Rating with id={rating_id} does not exist'
@@ -212,17 +368,18 @@ class RatingCrud(BaseCrud):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=detail
             )
+        await avg_rating_cache.delete(updated_rating['movie_id'])
 
         return RatingInDB(**updated_rating)
 
     async def delete_rating(
         self, *, rating_id: int
     ) -> None:
-        await self.db.fetch_one(
-            query=DELETE_RATING_QUERY,
-            values={
-                'id': rating_id
-            }
+        movie_id = await self._fetch_val(
+            DELETE_RATING_QUERY,
+            id=rating_id
         )
+        if movie_id is not None:
+            await avg_rating_cache.delete(movie_id)
 
         return None
@@ -0,0 +1,100 @@
+from datetime import datetime
+import logging
+
+from app.crud.core import BaseCrud
+from app.schemas.similarity import SimilarMovie
+
+logger = logging.getLogger(__name__)
+
+GET_SIMILAR_MOVIES_QUERY = """
+    SELECT similar_movie_id AS movie_id, similarity
+    FROM movie_similarities
+    WHERE movie_id = :movie_id
+    ORDER BY similarity DESC
+    LIMIT :limit;
+"""
+
+GET_MOVIES_RATED_SINCE_QUERY = """
+    SELECT DISTINCT movie_id
+    FROM ratings
+    WHERE updated_at >= :since;
+"""
+
+DELETE_SIMILARITIES_BY_MOVIES_QUERY = """
+    DELETE FROM movie_similarities
+    WHERE movie_id = ANY(:movie_ids);
+"""
+
+DELETE_SIMILARITIES_EXCEPT_MOVIES_QUERY = """
+    DELETE FROM movie_similarities
+    WHERE NOT (movie_id = ANY(:movie_ids));
+"""
+
+INSERT_SIMILARITIES_QUERY = """
+    INSERT INTO movie_similarities (movie_id, similar_movie_id, similarity)
+    SELECT *
+    FROM UNNEST(
+        CAST(:movie_ids AS INTEGER[]),
+        CAST(:similar_movie_ids AS INTEGER[]),
+        CAST(:similarities AS REAL[])
+    );
+"""
+
+GET_MODEL_BUILT_AT_QUERY = """
+    SELECT built_at
+    FROM model_builds
+    WHERE name = :name;
+"""
+
+UPSERT_MODEL_BUILT_AT_QUERY = """
+    INSERT INTO model_builds (name, built_at)
+    VALUES (:name, :built_at)
+    ON CONFLICT (name) DO UPDATE
+    SET built_at = EXCLUDED.built_at;
+"""
+
+
+class MovieSimilarityCrud(BaseCrud):
+    MODEL_NAME = 'movie_similarities'
+    PREPARED_QUERIES = frozenset({
+        GET_SIMILAR_MOVIES_QUERY,
+    })
+
+    async def get_similar_movies(self, *, movie_id: int, limit: int) -> list[SimilarMovie]:
+        records = await self._fetch_all(GET_SIMILAR_MOVIES_QUERY, movie_id=movie_id, limit=limit)
+
+        return [
+            self._build_result(GET_SIMILAR_MOVIES_QUERY, SimilarMovie, record)
+            for record in records
+        ]
+
+    async def get_movie_ids_rated_since(self, *, since: datetime) -> list[int]:
+        records = await self._fetch_all(GET_MOVIES_RATED_SINCE_QUERY, since=since)
+        return [record['movie_id'] for record in records]
+
+    async def replace_similarities(
+        self,
+        *,
+        movie_ids: list[int],
+        similarities: list[tuple[int, int, float]]
+    ) -> None:
+        ''' Swap the neighbors of many movies, `similarities` being (movie, neighbor, score) '''
+        async with self.db.transaction():
+            await self._execute(DELETE_SIMILARITIES_BY_MOVIES_QUERY, movie_ids=movie_ids)
+            if similarities:
+                await self._execute(
+                    INSERT_SIMILARITIES_QUERY,
+                    movie_ids=[movie_id for (movie_id, _, _) in similarities],
+                    similar_movie_ids=[similar_id for (_, similar_id, _) in similarities],
+                    similarities=[similarity for (_, _, similarity) in similarities]
+                )
+        logger.debug('Replaced the neighbors of %d movies', len(movie_ids))
+
+    async def delete_similarities_except(self, *, movie_ids: list[int]) -> None:
+        await self._execute(DELETE_SIMILARITIES_EXCEPT_MOVIES_QUERY, movie_ids=movie_ids)
+
+    async def get_built_at(self) -> datetime | None:
+        return await self._fetch_val(GET_MODEL_BUILT_AT_QUERY, name=self.MODEL_NAME)
+
+    async def set_built_at(self, *, built_at: datetime) -> None:
+        await self._execute(UPSERT_MODEL_BUILT_AT_QUERY, name=self.MODEL_NAME, built_at=built_at)
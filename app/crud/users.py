@@ -7,7 +7,8 @@ import logging
 
 from app.schemas.user import UserCreate, UserInDB, UserUpdate
 from .core import BaseCrud
-from app.services import auth_service
+from app.db.deps import RequestConnection
+from app.services import auth_service, token_version_cache
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +19,7 @@ COUNT_USERS_QUERY = """
 
 GET_USERS_QUERY = """
     SELECT id, username, email, password, salt,
-        is_active, is_superuser, created_at, updated_at
+        is_active, is_superuser, token_version, created_at, updated_at
     FROM users
     ORDER BY created_at DESC
     LIMIT :limit OFFSET :offset;
@@ -26,38 +27,45 @@ GET_USERS_QUERY = """
 
 GET_USER_BY_ID_QUERY = """
     SELECT id, username, email, password, salt,
-        is_active, is_superuser, created_at, updated_at
+        is_active, is_superuser, token_version, created_at, updated_at
     FROM users
     WHERE id = :id;
 """
 
 GET_USER_BY_EMAIL_QUERY = """
     SELECT id, username, email, password, salt,
-        is_active, is_superuser, created_at, updated_at
+        is_active, is_superuser, token_version, created_at, updated_at
     FROM users
     WHERE email = LOWER(:email);
 """
 
 GET_USER_BY_USERNAME_QUERY = """
     SELECT id, username, email, password, salt,
-        is_active, is_superuser, created_at, updated_at
+        is_active, is_superuser, token_version, created_at, updated_at
     FROM users
     WHERE username = LOWER(:username);
 """
 
+GET_USER_TOKEN_VERSION_QUERY = """
+    SELECT token_version
+    FROM users
+    WHERE id = :id;
+"""
+
 CREATE_NEW_USER_QUERY = """
     INSERT INTO users (username, email, password, salt, is_superuser)
     VALUES (LOWER(:username), LOWER(:email), :password, :salt, :is_superuser)
     RETURNING id, username, email, password, salt,
-        is_active, is_superuser, created_at, updated_at;
+        is_active, is_superuser, token_version, created_at, updated_at;
 """
 
 UPDATE_USER_QUERY = """
     UPDATE users
-    SET username = LOWER(:username), email = LOWER(:email)
+    SET username = LOWER(:username), email = LOWER(:email),
+        token_version = token_version + 1
     WHERE id = :id
     RETURNING id, username, email, password, salt,
-        is_active, is_superuser, created_at, updated_at;
+        is_active, is_superuser, token_version, created_at, updated_at;
 """
 
 DELETE_USER_QUERY = """
@@ -67,8 +75,15 @@ DELETE_USER_QUERY = """
 
 
 class UserCrud(BaseCrud):
-
-    def __init__(self, db: Database) -> None:
+    PREPARED_QUERIES = frozenset({
+        COUNT_USERS_QUERY,
+        GET_USERS_QUERY,
+        GET_USER_BY_ID_QUERY,
+        GET_USER_BY_USERNAME_QUERY,
+        GET_USER_TOKEN_VERSION_QUERY,
+    })
+
+    def __init__(self, db: Database | RequestConnection) -> None:
         super().__init__(db)
         self.auth_service = auth_service
 
@@ -110,6 +125,18 @@ class UserCrud(BaseCrud):
             username=username
         )
 
+    async def get_token_version(self, *, user_id: int) -> int | None:
+        version = await token_version_cache.get(user_id)
+        if token_version_cache.is_missing(version):
+            generation = token_version_cache.generation
+            version = await self._fetch_val(
+                GET_USER_TOKEN_VERSION_QUERY,
+                id=user_id
+            )
+            await token_version_cache.set(user_id, version, generation=generation)
+
+        return version
+
     async def _prepare_new_user(
         self,
         *,
@@ -147,12 +174,10 @@ class UserCrud(BaseCrud):
         is_superuser: bool = False
     ) -> UserInDB:
         new_user_params = await self._prepare_new_user(new_user=new_user)
-        created_user = await self.db.fetch_one(
-            query=CREATE_NEW_USER_QUERY,
-            values={
-                **new_user_params.dict(),
-                'is_superuser': is_superuser
-            }
+        created_user = await self._fetch_one(
+            CREATE_NEW_USER_QUERY,
+            **new_user_params.dict(),
+            is_superuser=is_superuser
         )
 
         return UserInDB(**created_user)
@@ -164,7 +189,6 @@ class UserCrud(BaseCrud):
         password: str
     ) -> Optional[UserInDB]:
         user = await self.get_user_by_username(username=username)
-        logger.debug(f'get_user_by_username: user is {user}')
         if not user:
             return None
         if not self.auth_service.verify_password(
@@ -179,14 +203,13 @@ class UserCrud(BaseCrud):
     async def update_user(
         self, *, user_id: int, user_to_update: UserUpdate
     ) -> UserInDB:
-        updated_user = await self.db.fetch_one(
-            query=UPDATE_USER_QUERY,
-            values={
-                **user_to_update.dict(),
-                'id': user_id
-            }
+        updated_user = await self._fetch_one(
+            UPDATE_USER_QUERY,
+            **user_to_update.dict(),
+            id=user_id
         )
-        logger.debug(f'Updated user is {updated_user}')
+        logger.debug('Updated user %d', user_id)
+        await token_version_cache.invalidate(user_id)
 
         if updated_user is None:
             detail = f'User with id={user_id} does not exist'
@@ -200,11 +223,10 @@ class UserCrud(BaseCrud):
     async def delete_user(
         self, *, user_id: int
     ) -> None:
-        await self.db.fetch_one(
-            query=DELETE_USER_QUERY,
-            values={
-                'id': user_id
-            }
+        await self._fetch_one(
+            DELETE_USER_QUERY,
+            id=user_id
         )
+        await token_version_cache.invalidate(user_id)
 
         return None
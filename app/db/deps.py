@@ -1,12 +1,55 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Mapping
 from databases import Database
+from databases.core import Connection, Transaction
+from fastapi import HTTPException, status
+import asyncio
+import asyncpg
+import bisect
 import logging
 import os
+import time
 
 from app.core.config import settings
+from app.core.metrics import DB_POOL_ACQUIRE_TIMEOUTS, DB_POOL_ACQUIRE_WAIT, DB_POOL_CONNECTIONS
+from app.schemas.db import PoolStats
 
 logger = logging.getLogger(__name__)
 
 
+class PoolMetrics:
+    """
+    Counters and wait-time histogram of the pool connection acquisitions
+    """
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self) -> None:
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_seconds_sum = 0.0
+        # One counter per bucket upper bound, plus the overflow (+Inf) bucket
+        self.wait_buckets = [0] * (len(self.WAIT_BUCKETS) + 1)
+
+    def observe_wait(self, seconds: float) -> None:
+        self.acquisitions += 1
+        self.wait_seconds_sum += seconds
+        self.wait_buckets[bisect.bisect_left(self.WAIT_BUCKETS, seconds)] += 1
+        DB_POOL_ACQUIRE_WAIT.observe(seconds)
+
+    def observe_timeout(self) -> None:
+        self.timeouts += 1
+        DB_POOL_ACQUIRE_TIMEOUTS.inc()
+
+    def wait_histogram(self) -> dict[str, int]:
+        ''' Cumulative counts per upper bound, Prometheus style '''
+        histogram = {}
+        count = 0
+        for (bound, bucket) in zip((*self.WAIT_BUCKETS, '+Inf'), self.wait_buckets):
+            count += bucket
+            histogram[str(bound)] = count
+        return histogram
+
+
 class DBSession:
 
     def __init__(self):
@@ -15,10 +58,18 @@ class DBSession:
             self.DB_URL = f"{settings.DATABASE_URL}_test"
         else:
             self.DB_URL = settings.DATABASE_URL
-        self.db_session = Database(self.DB_URL, min_size=2, max_size=10)
+        self.db_session = Database(
+            self.DB_URL,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            max_queries=settings.DB_POOL_MAX_QUERIES,
+            max_inactive_connection_lifetime=settings.DB_POOL_MAX_INACTIVE_CONNECTION_LIFETIME,
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+        )
+        self.pool_metrics = PoolMetrics()
 
     async def start(self):
-        logger.warning(f"--- Connecting to {settings.DATABASE_URL} ---")
+        logger.warning("--- Connecting to %s ---", settings.DATABASE_URL)
         try:
             await self.db_session.connect()
         except Exception as e:
@@ -34,9 +85,184 @@ class DBSession:
             logger.warning(e)
             logger.warning("--- DB DISCONNECT ERROR ---")
 
+    async def acquire(self) -> Connection:
+        ''' Check out a dedicated pool connection, recording the time spent waiting '''
+        # A fresh Connection rather than the task-local `Database.connection()`,
+        # so that one abandoned on timeout is never handed out again
+        connection = Connection(self.db_session._backend)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                connection.__aenter__(),
+                timeout=settings.DB_POOL_ACQUIRE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            self.pool_metrics.observe_timeout()
+            logger.warning(
+                "--- DB POOL ACQUISITION TIMEOUT after %ss ---", settings.DB_POOL_ACQUIRE_TIMEOUT
+            )
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Database is busy, please retry later"
+            )
+        self.pool_metrics.observe_wait(time.perf_counter() - start)
+        self._observe_pool_usage()
+
+        return connection
+
+    async def release(self, connection: Connection) -> None:
+        await connection.__aexit__()
+        self._observe_pool_usage()
+
+    def _get_pool_sizes(self) -> tuple[int, int]:
+        # `databases` doesn't expose the asyncpg pool, which holds the live counts
+        pool = self.db_session._backend._pool
+        if pool is None:
+            return (0, 0)
+
+        return (pool.get_size(), pool.get_idle_size())
+
+    def _observe_pool_usage(self) -> None:
+        (size, idle) = self._get_pool_sizes()
+        DB_POOL_CONNECTIONS.labels('in_use').set(size - idle)
+        DB_POOL_CONNECTIONS.labels('idle').set(idle)
+        DB_POOL_CONNECTIONS.labels('max').set(settings.DB_POOL_MAX_SIZE)
+
+    def get_pool_stats(self) -> PoolStats:
+        (size, idle) = self._get_pool_sizes()
+
+        return PoolStats(
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            size=size,
+            idle=idle,
+            in_use=size - idle,
+            acquisitions=self.pool_metrics.acquisitions,
+            timeouts=self.pool_metrics.timeouts,
+            wait_seconds_sum=self.pool_metrics.wait_seconds_sum,
+            wait_seconds_histogram=self.pool_metrics.wait_histogram(),
+        )
+
     def __call__(self) -> Database:
         assert self.db_session is not None
         return self.db_session
 
 
 db_session = DBSession()
+
+
+class RequestConnection:
+    """
+    Pool connection shared by all the queries of a request.
+
+    The connection is checked out lazily on the first query, so handlers that
+    never reach the DB don't hold one, and it is released when the request ends.
+    Streams (`iterate`, `cursor_prepared`) hold their connection until they are
+    exhausted, so they run on a pool connection of their own: the other queries
+    of the request aren't blocked while a stream is consumed, but don't share
+    its transaction either.
+    """
+
+    def __init__(self, session: DBSession) -> None:
+        self._session = session
+        self._connection: Connection | None = None
+        self._lock = asyncio.Lock()
+        # Serializes `databases` and raw asyncpg queries sharing the connection
+        self._query_lock = asyncio.Lock()
+
+    async def _acquire(self) -> Connection:
+        async with self._lock:
+            if self._connection is None:
+                self._connection = await self._session.acquire()
+        return self._connection
+
+    async def release(self) -> None:
+        async with self._lock:
+            if self._connection is not None:
+                await self._session.release(self._connection)
+                self._connection = None
+
+    async def fetch_all(self, query: str, values: dict = None) -> list[Mapping]:
+        connection = await self._acquire()
+        async with self._query_lock:
+            return await connection.fetch_all(query, values)
+
+    async def fetch_one(self, query: str, values: dict = None) -> Mapping | None:
+        connection = await self._acquire()
+        async with self._query_lock:
+            return await connection.fetch_one(query, values)
+
+    async def fetch_val(self, query: str, values: dict = None, column: Any = 0) -> Any:
+        connection = await self._acquire()
+        async with self._query_lock:
+            return await connection.fetch_val(query, values, column=column)
+
+    async def execute(self, query: str, values: dict = None) -> Any:
+        connection = await self._acquire()
+        async with self._query_lock:
+            return await connection.execute(query, values)
+
+    async def execute_many(self, query: str, values: list) -> None:
+        connection = await self._acquire()
+        async with self._query_lock:
+            return await connection.execute_many(query, values)
+
+    @asynccontextmanager
+    async def _stream_connection(self) -> AsyncIterator[Connection]:
+        connection = await self._session.acquire()
+        try:
+            yield connection
+        finally:
+            await self._session.release(connection)
+
+    async def iterate(self, query: str, values: dict = None) -> AsyncIterator[Mapping]:
+        async with self._stream_connection() as connection:
+            async for record in connection.iterate(query, values):
+                yield record
+
+    async def cursor_prepared(self, query: str, *args) -> AsyncIterator[asyncpg.Record]:
+        '''
+        Stream the rows of a `$n` positional query from a server-side cursor,
+        fetching DB_CURSOR_PREFETCH rows per round trip
+        '''
+        async with self._stream_connection() as connection:
+            async with connection.raw_connection.transaction(readonly=True):
+                cursor = connection.raw_connection.cursor(
+                    query, *args, prefetch=settings.DB_CURSOR_PREFETCH
+                )
+                async for record in cursor:
+                    yield record
+
+    async def fetch_prepared(self, query: str, *args) -> list[asyncpg.Record]:
+        '''
+        Run a `$n` positional query straight on asyncpg, which keeps it prepared
+        in the per-connection statement cache (see DB_STATEMENT_CACHE_SIZE)
+        '''
+        connection = await self._acquire()
+        async with self._query_lock:
+            return await connection.raw_connection.fetch(query, *args)
+
+    async def fetch_one_prepared(self, query: str, *args) -> asyncpg.Record | None:
+        connection = await self._acquire()
+        async with self._query_lock:
+            return await connection.raw_connection.fetchrow(query, *args)
+
+    async def fetch_val_prepared(self, query: str, *args) -> Any:
+        connection = await self._acquire()
+        async with self._query_lock:
+            return await connection.raw_connection.fetchval(query, *args)
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs) -> AsyncIterator[Transaction]:
+        ''' Wrap the following queries in a transaction on the request connection '''
+        connection = await self._acquire()
+        async with connection.transaction(**kwargs) as transaction:
+            yield transaction
+
+
+async def db_connection() -> AsyncIterator[RequestConnection]:
+    connection = RequestConnection(db_session)
+    try:
+        yield connection
+    finally:
+        await connection.release()
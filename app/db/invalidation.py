@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+import asyncio
+import inspect
+import asyncpg
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Channel notified by the triggers of migration f4c81d9e2b36, changing it needs a migration
+INVALIDATION_CHANNEL = 'cache_invalidation'
+
+
+@dataclass
+class Subscriber:
+    """
+    Per-process cache of one entity: `evict` drops the entry of a key, `reset`
+    drops everything when notifications may have been missed
+    """
+    evict: Callable[[str], Awaitable[None] | None]
+    reset: Callable[[], Awaitable[None] | None]
+
+
+class InvalidationBus:
+    """
+    Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+    Triggers notify `<entity>:<key>` on INVALIDATION_CHANNEL once the
+    writing transaction commits, whichever worker or script wrote. Each worker
+    listens on one dedicated connection, outside of the pool, and evicts the
+    matching entries of its caches.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: dict[str, list[Subscriber]] = {}
+        self._task: asyncio.Task | None = None
+        # Evictions of async caches still running, referenced until they finish
+        self._pending: set[asyncio.Task] = set()
+        # Set while the LISTEN connection is up
+        self.listening = asyncio.Event()
+
+    def subscribe(
+        self,
+        entity: str,
+        *,
+        evict: Callable[[str], Awaitable[None] | None],
+        reset: Callable[[], Awaitable[None] | None]
+    ) -> None:
+        self._subscribers.setdefault(entity, []).append(Subscriber(evict=evict, reset=reset))
+
+    def start(self, db_url: str) -> None:
+        self._task = asyncio.create_task(self._listen(db_url))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return None
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def dispatch(self, payload: str) -> None:
+        (entity, _, key) = payload.partition(':')
+        for subscriber in self._subscribers.get(entity, []):
+            self._run(subscriber.evict(key))
+
+    def reset(self) -> None:
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                self._run(subscriber.reset())
+
+    def _run(self, result: Awaitable[None] | None) -> None:
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    def _on_notification(self, connection, pid, channel, payload: str) -> None:
+        try:
+            self.dispatch(payload)
+        except Exception:
+            logger.exception('Unable to dispatch the invalidation "%s"', payload)
+
+    async def _listen(self, db_url: str) -> None:
+        ''' Keep a LISTEN connection open, reconnecting after any failure '''
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(db_url)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(
+                    INVALIDATION_CHANNEL, self._on_notification
+                )
+                # Writes made while not listening were never notified
+                self.reset()
+                self.listening.set()
+                await closed.wait()
+                logger.warning('--- INVALIDATION LISTENER DISCONNECTED ---')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('--- INVALIDATION LISTENER ERROR ---')
+                logger.warning(e)
+            finally:
+                self.listening.clear()
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            self.reset()
+            await asyncio.sleep(settings.CACHE_INVALIDATION_RECONNECT_SECONDS)
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from typing import Any
+import asyncio
+import logging
+import random
+import re
+
+from app.core.config import settings
+from app.schemas.db import SlowQueryStats
+
+logger = logging.getLogger(__name__)
+
+# Only plain reads are explained: EXPLAIN ANALYZE runs the statement
+SELECT_REGEX = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+
+
+def get_param_shape(value: Any) -> str:
+    ''' Type of a query parameter, and length of its sequences, but never its value '''
+    if isinstance(value, (list, tuple, set, frozenset)):
+        item_types = sorted({type(item).__name__ for item in value})
+        return f'{type(value).__name__}[{"|".join(item_types)}]({len(value)})'
+    if isinstance(value, (str, bytes)):
+        return f'{type(value).__name__}({len(value)})'
+
+    return type(value).__name__
+
+
+class SlowQueryLog:
+    """
+    Queries of the CRUD classes slower than SLOW_QUERY_THRESHOLD_MS, by SQL
+    constant name, in the current worker.
+
+    Once a query has been slow SLOW_QUERY_EXPLAIN_AFTER times, a sample of its
+    slow runs are explained with ANALYZE and BUFFERS, in the background and on
+    a separate pool connection, at most every SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+    per query and one at a time.
+    """
+
+    def __init__(self) -> None:
+        self._stats: dict[str, SlowQueryStats] = {}
+        self._session = None
+        self._explaining = False
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self, session) -> None:
+        ''' Explain the slow queries on the pool of `session`, a `DBSession` '''
+        self._session = session
+
+    def record(self, *, name: str, query: str, values: dict[str, Any], duration_ms: float) -> None:
+        param_shapes = {key: get_param_shape(value) for (key, value) in values.items()}
+        logger.warning('Slow query %s took %.1f ms, params %s', name, duration_ms, param_shapes)
+
+        now = datetime.now(timezone.utc)
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = SlowQueryStats(name=name, last_seen_at=now)
+        stats.count += 1
+        stats.total_ms += duration_ms
+        stats.max_ms = max(stats.max_ms, duration_ms)
+        stats.last_ms = duration_ms
+        stats.last_seen_at = now
+        stats.param_shapes = param_shapes
+
+        if self._should_explain(stats, query, now):
+            self._explaining = True
+            task = asyncio.create_task(self._explain(stats, query, values))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _should_explain(self, stats: SlowQueryStats, query: str, now: datetime) -> bool:
+        return self._session is not None \
+            and not self._explaining \
+            and stats.count >= settings.SLOW_QUERY_EXPLAIN_AFTER \
+            and SELECT_REGEX.match(query) is not None \
+            and (
+                stats.plan_captured_at is None
+                or (now - stats.plan_captured_at).total_seconds()
+                >= settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+            ) \
+            and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATIO
+
+    async def _explain(self, stats: SlowQueryStats, query: str, values: dict[str, Any]) -> None:
+        # Imported here as the CRUD base module imports this one
+        from app.crud.core import to_positional
+
+        (positional_query, names) = to_positional(query)
+        try:
+            async with self._session().connection() as connection:
+                raw_connection = connection.raw_connection
+                # Read-only and rolled back, whatever the statement does
+                transaction = raw_connection.transaction(readonly=True)
+                await transaction.start()
+                try:
+                    await raw_connection.execute(
+                        f'SET LOCAL statement_timeout = {settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS}'
+                    )
+                    rows = await raw_connection.fetch(
+                        f'EXPLAIN (ANALYZE, BUFFERS) {positional_query}',
+                        *(values[name] for name in names)
+                    )
+                finally:
+                    await transaction.rollback()
+            stats.plan = '\n'.join(row[0] for row in rows)
+        except Exception as e:
+            stats.plan = f'EXPLAIN failed: {type(e).__name__}: {e}'
+        finally:
+            stats.plan_captured_at = datetime.now(timezone.utc)
+            self._explaining = False
+
+    def get_stats(self) -> list[SlowQueryStats]:
+        ''' The slow queries, by decreasing total time '''
+        return sorted(
+            (stats.copy() for stats in self._stats.values()),
+            key=lambda stats: stats.total_ms, reverse=True
+        )
+
+    def clear(self) -> None:
+        self._stats.clear()
+
+
+slow_query_log = SlowQueryLog()
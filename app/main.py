@@ -1,14 +1,32 @@
+from pathlib import Path
+from alembic.config import Config as AlembicConfig
+from alembic.script import ScriptDirectory
 from fastapi import HTTPException
 from pydantic import EmailStr
 import uvicorn
 import argparse
 import asyncio
+import asyncpg
+import json
+import numpy as np
 
+from app.core.config import settings
 from app.schemas.user import UserCreate, UserInDB
 
 from .app import app  # noqa: F401
+from app.benchmarks.suite import compare_results, run_benchmarks
+from app.crud.ratings import RatingCrud
+from app.crud.similarities import MovieSimilarityCrud
 from app.crud.users import UserCrud
-from app.db.deps import DBSession
+from app.db.deps import DBSession, RequestConnection
+from app.services.dataset import (
+    DATASET_PASSWORD,
+    DatasetSpec,
+    get_catalog_movie_ids,
+    load_dataset,
+)
+from app.services.predictions import save_factor_model, train_factor_model
+from app.services.similarities import load_rating_grades, rebuild_similar_movies
 
 
 def __main__():
@@ -56,3 +74,248 @@ def create_admin() -> UserInDB:
     new_user = UserCreate(**vars(args))
 
     asyncio.run(_create_super_admin(new_user=new_user))
+
+
+async def _build_similar_movies(*, incremental: bool, top_k: int, min_overlap: int) -> None:
+    db_session = DBSession()
+    await db_session.start()
+    db_connection = RequestConnection(db_session)
+    try:
+        rebuilt = await rebuild_similar_movies(
+            MovieSimilarityCrud(db_connection),
+            RatingCrud(db_connection),
+            incremental=incremental,
+            top_k=top_k,
+            min_overlap=min_overlap
+        )
+        print(f'Similar movies of {rebuilt} movies successfully rebuilt')
+    finally:
+        await db_connection.release()
+        await db_session.stop()
+
+
+def build_similar_movies() -> None:
+    ''' Rebuild the similar movies using `poetry run build_similar_movies [--incremental]` '''
+    parser = argparse.ArgumentParser(description='Rebuild the similar movies.')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only rebuild the movies rated since the last build'
+    )
+    parser.add_argument(
+        '--top-k',
+        type=int,
+        default=settings.SIMILAR_MOVIES_TOP_K,
+        help='Number of neighbors kept per movie'
+    )
+    parser.add_argument(
+        '--min-overlap',
+        type=int,
+        default=settings.SIMILAR_MOVIES_MIN_OVERLAP,
+        help='Minimum number of users who rated both movies'
+    )
+    args = parser.parse_args()
+
+    asyncio.run(_build_similar_movies(**vars(args)))
+
+
+async def _train_grade_predictor(
+    *,
+    factors: int,
+    iterations: int,
+    regularization: float,
+    model_dir: str
+) -> None:
+    db_session = DBSession()
+    await db_session.start()
+    db_connection = RequestConnection(db_session)
+    try:
+        (user_ids, movie_ids, grades) = await load_rating_grades(RatingCrud(db_connection))
+    finally:
+        await db_connection.release()
+        await db_session.stop()
+
+    if not len(grades):
+        print('Unable to train the grade predictor\nException: no ratings')
+        return None
+
+    model = train_factor_model(
+        user_ids,
+        movie_ids,
+        grades,
+        factors=factors,
+        iterations=iterations,
+        regularization=regularization
+    )
+    version = save_factor_model(model, model_dir)
+    print(f'Grade predictor version "{version}" successfully trained on {len(grades)} ratings')
+
+
+def train_grade_predictor() -> None:
+    ''' Train a new grade predictor version using `poetry run train_grade_predictor` '''
+    parser = argparse.ArgumentParser(description='Train the grade predictor.')
+    parser.add_argument(
+        '--factors',
+        type=int,
+        default=32,
+        help='Number of latent factors'
+    )
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=15,
+        help='Number of ALS iterations'
+    )
+    parser.add_argument(
+        '--regularization',
+        type=float,
+        default=0.1,
+        help='L2 regularization, weighted by the number of ratings'
+    )
+    parser.add_argument(
+        '--model-dir',
+        type=str,
+        default=settings.MODEL_DIR,
+        help='Directory of the model versions'
+    )
+    args = parser.parse_args()
+
+    asyncio.run(_train_grade_predictor(**vars(args)))
+
+
+def benchmark() -> None:
+    ''' Run the micro-benchmarks of the hot paths using `poetry run benchmark` '''
+    parser = argparse.ArgumentParser(description='Run the micro-benchmarks.')
+    parser.add_argument(
+        '--only',
+        type=str,
+        default=None,
+        help='Only run the benchmarks whose name contains this'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=7,
+        help='Number of timed runs of each benchmark'
+    )
+    parser.add_argument(
+        '--min-time',
+        type=float,
+        default=0.2,
+        help='Minimum duration of each run, in seconds'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        default=None,
+        help='JSON file of the results, benchmark-results/<commit>.json by default'
+    )
+    parser.add_argument(
+        '--compare',
+        type=str,
+        default=None,
+        help='JSON file of previous results to compare with'
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(only=args.only, repeat=args.repeat, min_time=args.min_time)
+    output = Path(args.output or f'benchmark-results/{results["commit"] or "results"}.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f'Results written to {output}')
+
+    if args.compare is not None:
+        compare_results(results, json.loads(Path(args.compare).read_text()))
+
+
+async def _generate_dataset(
+    *,
+    users: int,
+    ratings: int,
+    movies: int,
+    seed: int,
+    movie_skew: float,
+    user_skew: float,
+    days: int,
+    database_url: str
+) -> None:
+    connection = await asyncpg.connect(database_url)
+    try:
+        catalog_movie_ids = await get_catalog_movie_ids(connection)
+        spec = DatasetSpec(
+            users=users,
+            ratings_per_user=max(ratings / users, 1.0),
+            movie_ids=catalog_movie_ids if len(catalog_movie_ids) else np.arange(1, movies + 1),
+            seed=seed,
+            movie_skew=movie_skew,
+            user_skew=user_skew,
+            days=days
+        )
+        head = ScriptDirectory.from_config(AlembicConfig('alembic.ini')).get_current_head()
+        (user_count, rating_count) = await load_dataset(connection, spec, schema_version=head)
+        print(
+            f'{user_count} users and {rating_count} ratings of {len(spec.movie_ids)} movies '
+            f'successfully generated, with the password "{DATASET_PASSWORD}"'
+        )
+    except Exception as e:
+        print(f'Unable to generate the dataset\nException: {str(e)}')
+    finally:
+        await connection.close()
+
+
+def generate_dataset() -> None:
+    ''' Bulk-load synthetic users and ratings using `poetry run generate_dataset` '''
+    parser = argparse.ArgumentParser(description='Generate a synthetic dataset.')
+    parser.add_argument(
+        '--users',
+        type=int,
+        default=1_000_000,
+        help='Number of users'
+    )
+    parser.add_argument(
+        '--ratings',
+        type=int,
+        default=20_000_000,
+        help='Approximate number of ratings'
+    )
+    parser.add_argument(
+        '--movies',
+        type=int,
+        default=20_000,
+        help='Number of rated movies, when the movie catalog is empty'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Seed of the random generators'
+    )
+    parser.add_argument(
+        '--movie-skew',
+        type=float,
+        default=1.0,
+        help='Zipf exponent of the movie popularity'
+    )
+    parser.add_argument(
+        '--user-skew',
+        type=float,
+        default=1.5,
+        help='Pareto shape of the ratings per user, above 1: the lower, the more power users'
+    )
+    parser.add_argument(
+        '--days',
+        type=int,
+        default=3 * 365,
+        help='Time spread of the users and ratings'
+    )
+    parser.add_argument(
+        '--database-url',
+        type=str,
+        default=f'{settings.DATABASE_URL}_test',
+        help='Database to load, the test database by default'
+    )
+    args = parser.parse_args()
+    if args.user_skew <= 1:
+        parser.error('--user-skew must be above 1')
+
+    asyncio.run(_generate_dataset(**vars(args)))
@@ -1,27 +1,70 @@
+from urllib.parse import urlencode
+from fastapi import status as http_status
 import aiohttp
+import re
+import time
+from app.core.cache import Cache, cache_registry
 from app.core.config import settings
+from app.core.metrics import TMDB_REQUEST_DURATION
+from app.core.tracing import SPAN_KIND_CLIENT, tracer
 
 DEFAULT_PARAMS = {
     'language': 'fr-FR',
     'with_release_type': '3'
 }
 
+# Ids in the endpoint paths, replaced to label the metrics by endpoint template
+PATH_ID_REGEX = re.compile(r'/\d+(?=/|$)')
 
-async def fetch_tmdb_api(
-        endpoint: str,
-        client_session: aiohttp.ClientSession,
-        params: dict = None) -> tuple[int, dict]:
+tmdb_cache = cache_registry.get_cache('tmdb', ttl=settings.TMDB_CACHE_TTL_SECONDS)
+
+
+def merge_params(params: dict | None) -> dict:
     if params:
-        merged_params = {
+        return {
             **DEFAULT_PARAMS,
             **{k: v for k, v in params.items() if v is not None}
         }
-    else:
-        merged_params = DEFAULT_PARAMS
-    async with client_session.get(
-            f'{settings.TMDP_API_V3}{endpoint}',
-            params=merged_params) as resp:
-        status = resp.status
-        json = await resp.json()
-
-        return (status, json)
+
+    return DEFAULT_PARAMS
+
+
+def get_cache_key(endpoint: str, params: dict) -> str:
+    return f'{endpoint}?{urlencode(sorted(params.items()))}'
+
+
+async def fetch_tmdb_api(
+        endpoint: str,
+        client_session: aiohttp.ClientSession,
+        params: dict = None,
+        cache: Cache | None = tmdb_cache) -> tuple[int, dict]:
+    merged_params = merge_params(params)
+
+    cache_key = get_cache_key(endpoint, merged_params)
+    if cache is not None:
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            return (http_status.HTTP_200_OK, cached)
+
+    endpoint_template = PATH_ID_REGEX.sub('/{id}', endpoint)
+    start = time.perf_counter()
+    # Our trace ids are not propagated to a third party
+    with tracer.start_span(
+        f'TMDB GET {endpoint_template}', kind=SPAN_KIND_CLIENT, **{'http.url': endpoint}
+    ) as span:
+        async with client_session.get(
+                f'{settings.TMDP_API_V3}{endpoint}',
+                params=merged_params) as resp:
+            status = resp.status
+            json = await resp.json()
+        if span is not None:
+            span.set_attribute('http.status_code', status)
+    TMDB_REQUEST_DURATION.labels(endpoint_template, status).observe(
+        time.perf_counter() - start
+    )
+
+    # Only the successes are cached, errors may be transient
+    if cache is not None and status == http_status.HTTP_200_OK:
+        await cache.set(cache_key, json)
+
+    return (status, json)
@@ -1,5 +1,6 @@
 from typing import Any, Optional
 from datetime import datetime
+from enum import Enum
 from pydantic import BaseModel, validator
 
 
@@ -28,3 +29,8 @@ class ListResult(BaseModel):
     results: list[Any]
     total_results: int
     total_pages: int
+
+
+class ExportFormat(str, Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from app.schemas.core import CoreModel
+
+
+class PoolStats(CoreModel):
+    """
+    Connection pool utilization of the current worker
+    """
+    min_size: int
+    max_size: int
+    size: int
+    idle: int
+    in_use: int
+    acquisitions: int
+    timeouts: int
+    wait_seconds_sum: float
+    wait_seconds_histogram: dict[str, int]
+
+
+class SlowQueryStats(CoreModel):
+    """
+    Runs of a CRUD query over SLOW_QUERY_THRESHOLD_MS in the current worker,
+    with the parameter shapes of the last one and its latest captured plan
+    """
+    name: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_ms: float = 0.0
+    last_seen_at: datetime
+    param_shapes: dict[str, str] = {}
+    plan: str | None = None
+    plan_captured_at: datetime | None = None
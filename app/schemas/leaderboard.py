@@ -0,0 +1,44 @@
+from datetime import datetime
+from enum import Enum
+
+from app.schemas.core import CoreModel
+from app.schemas.movie import MovieSummary
+
+
+class LeaderboardWindow(str, Enum):
+    ALL = 'all'
+    MONTH = '30d'
+    WEEK = '7d'
+
+
+class LeaderboardSort(str, Enum):
+    RATING = 'rating'
+    VOTES = 'votes'
+
+
+class MovieRatingStats(CoreModel):
+    """
+    Rollup of the ratings of a movie over a window
+    """
+    movie_id: int
+    rating_count: int
+    grade_sum: int
+
+
+class LeaderboardEntry(CoreModel):
+    """
+    `score` is the average pulled toward the mean of all movies, by the prior votes
+    """
+    movie_id: int
+    avg_rating: float
+    rating_count: int
+    score: float
+    movie: MovieSummary | None
+
+
+class LeaderboardResult(CoreModel):
+    window: LeaderboardWindow
+    sort: LeaderboardSort
+    min_votes: int
+    refreshed_at: datetime | None
+    results: list[LeaderboardEntry]
@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from app.schemas.core import CoreModel
+
+
+class LoopBlock(CoreModel):
+    """
+    Callback which held the event loop of the current worker over
+    LOOP_BLOCK_THRESHOLD_SECONDS, with the stack of the loop thread when detected
+    """
+    detected_at: datetime
+    # None while the loop is still blocked
+    duration_ms: float | None = None
+    stack: list[str]
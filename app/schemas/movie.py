@@ -4,11 +4,12 @@ from pydantic import constr, confloat, root_validator, validator, Extra
 from app.schemas.core import CoreModel, IDModelMixin, ListResult
 
 
-class MovieBase(CoreModel):
+class MovieCatalogBase(CoreModel):
+    """
+    Fields of a movie kept in our local catalog
+    """
     original_title: str
     title: str
-    vote_average: float
-    vote_count: int
     poster_path: str | None
     release_date: date | None
 
@@ -19,10 +20,27 @@ class MovieBase(CoreModel):
         return v
 
 
-class MoviePublic(IDModelMixin, MovieBase):
+class MovieBase(MovieCatalogBase):
+    vote_average: float
+    vote_count: int
+
+
+class MovieSummary(IDModelMixin, MovieCatalogBase):
+    """
+    Movie attached to the ratings, from the catalog rather than from TMDB
+    """
     pass
 
 
+class MoviePublic(IDModelMixin, MovieBase):
+    # Only filled in when the ratings are requested along the movies
+    avg_rating: confloat(ge=0.0, le=10.0) | None
+    rating_count: int | None
+    user_grade: int | None
+    # Only for the logged-in users, on the movies they haven't rated
+    predicted_grade: confloat(ge=0.0, le=10.0) | None
+
+
 class MovieDetailPublic(MoviePublic):
     imdb_id: constr(
         regex='^tt[0-9]{7,8}',  # noqa: F722
@@ -31,6 +49,8 @@ class MovieDetailPublic(MoviePublic):
     ) | None
     directors: list[str] | None
     avg_rating: confloat(ge=0.0, le=10.0) | None
+    # False when the ratings could not be retrieved in time
+    ratings_available: bool = True
     theatrical_release_date: datetime | None
 
     @root_validator(pre=True)
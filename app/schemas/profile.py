@@ -0,0 +1,25 @@
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+
+from app.schemas.core import CoreModel
+
+
+class ProfilerKind(str, Enum):
+    # Collapsed stacks, for flamegraph.pl or speedscope
+    SAMPLING = 'sampling'
+    # pstats dump, for snakeviz or flameprof
+    CPROFILE = 'cprofile'
+
+
+class ProfileInfo(CoreModel):
+    """
+    Profile of a single request, recorded on an admin's demand
+    """
+    id: UUID
+    profiler: ProfilerKind
+    method: str
+    path: str
+    status_code: int
+    duration_ms: float
+    created_at: datetime
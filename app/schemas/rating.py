@@ -6,6 +6,7 @@ from app.schemas.core import (
     IDModelMixin,
     ListResult
 )
+from app.schemas.movie import MovieSummary
 
 
 class RatingBase(CoreModel):
@@ -57,5 +58,35 @@ class RatingPublic(IDModelMixin, DateTimeModelMixin, RatingBase):
     pass
 
 
+class RatingExpandedInDB(RatingInDB):
+    """
+    Add in the related entities requested with `expand`
+    """
+    username: str | None
+    movie: MovieSummary | None
+
+
+class RatingExpandedPublic(RatingPublic):
+    """
+    Same as ExpandedInDB
+    """
+    username: str | None
+    movie: MovieSummary | None
+
+
+class RatingSummary(CoreModel):
+    """
+    Ratings of a movie on our platform, and the grade of the current user
+    """
+    movie_id: int
+    avg_rating: float | None
+    rating_count: int = 0
+    user_grade: int | None
+
+
 class RatingResult(ListResult):
     results: list[RatingPublic]
+
+
+class RatingExpandedResult(ListResult):
+    results: list[RatingExpandedPublic]
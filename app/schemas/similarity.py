@@ -0,0 +1,16 @@
+from app.schemas.core import CoreModel
+from app.schemas.movie import MovieSummary
+
+
+class SimilarMovie(CoreModel):
+    """
+    Neighbor of a movie, by adjusted cosine similarity of their ratings
+    """
+    movie_id: int
+    similarity: float
+    movie: MovieSummary | None
+
+
+class SimilarMovieResult(CoreModel):
+    movie_id: int
+    results: list[SimilarMovie]
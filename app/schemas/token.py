@@ -20,9 +20,19 @@ class JWTCreds(CoreModel):
     username: str
 
 
-class JWTPayload(JWTMeta, JWTCreds):
+class JWTClaims(CoreModel):
     """
-    JWT Payload right before it's encoded - combine meta and username
+    Identity and role claims, so that most requests don't need a user lookup
+    """
+    user_id: int
+    is_active: bool
+    is_superuser: bool
+    token_version: int
+
+
+class JWTPayload(JWTMeta, JWTCreds, JWTClaims):
+    """
+    JWT Payload right before it's encoded - combine meta, username and claims
     """
     pass
 
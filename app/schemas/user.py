@@ -40,12 +40,20 @@ class UserPasswordUpdate(CoreModel):
     salt: str
 
 
+class UserIdentity(IDModelMixin, UserBase):
+    """
+    Identity carried by the access token claims, trusted without a DB lookup
+    """
+    token_version: int = 0
+
+
 class UserInDB(IDModelMixin, DateTimeModelMixin, UserBase):
     """
     Add in id, created_at, updated_at, and user's password and salt
     """
     password: constr(min_length=5, max_length=100)
     salt: str
+    token_version: int = 0
 
 
 class UserPublic(IDModelMixin, DateTimeModelMixin, UserBase):
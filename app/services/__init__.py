@@ -1,3 +1,17 @@
+from app.db.invalidation import invalidation_bus
+
 from .authentication import AuthService
+from .leaderboard import Leaderboard
+from .predictions import GradePredictor
+from .token_versions import TokenVersionCache
 
 auth_service = AuthService()
+grade_predictor = GradePredictor()
+leaderboard = Leaderboard()
+token_version_cache = TokenVersionCache()
+
+invalidation_bus.subscribe(
+    'user',
+    evict=lambda user_id: token_version_cache.invalidate(int(user_id)),
+    reset=token_version_cache.clear
+)
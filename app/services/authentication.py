@@ -5,8 +5,8 @@ from datetime import datetime, timedelta
 from fastapi import HTTPException, status
 from pydantic import ValidationError
 
-from app.schemas.user import UserPasswordUpdate, UserInDB
-from app.schemas.token import JWTMeta, JWTCreds, JWTPayload
+from app.schemas.user import UserIdentity, UserPasswordUpdate, UserInDB
+from app.schemas.token import JWTClaims, JWTMeta, JWTCreds, JWTPayload
 from app.core.config import settings
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
@@ -48,9 +48,16 @@ class AuthService:
             exp=datetime.timestamp(datetime.utcnow() + timedelta(minutes=expires_in)),
         )
         jwt_creds = JWTCreds(sub=user.email, username=user.username)
+        jwt_claims = JWTClaims(
+            user_id=user.id,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            token_version=user.token_version,
+        )
         token_payload = JWTPayload(
             **jwt_meta.dict(),
             **jwt_creds.dict(),
+            **jwt_claims.dict(),
         )
         # NOTE - previous versions of pyjwt ("<2.0") returned the token as bytes insted of a string.
         # That is no longer the case and the `.decode("utf-8")` has been removed.
@@ -61,12 +68,12 @@ class AuthService:
         )
         return access_token
 
-    def get_username_from_token(
+    def get_payload_from_token(
         self,
         *,
         token: str,
         secret_key: str = settings.SECRET_KEY
-    ) -> str | None:
+    ) -> JWTPayload:
         try:
             decoded_token = jwt.decode(
                 token,
@@ -82,4 +89,31 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"}
             )
 
+        return payload
+
+    def get_username_from_token(
+        self,
+        *,
+        token: str,
+        secret_key: str = settings.SECRET_KEY
+    ) -> str | None:
+        payload = self.get_payload_from_token(token=token, secret_key=secret_key)
+
         return payload.username
+
+    def get_identity_from_token(
+        self,
+        *,
+        token: str,
+        secret_key: str = settings.SECRET_KEY
+    ) -> UserIdentity:
+        payload = self.get_payload_from_token(token=token, secret_key=secret_key)
+
+        return UserIdentity(
+            id=payload.user_id,
+            email=payload.sub,
+            username=payload.username,
+            is_active=payload.is_active,
+            is_superuser=payload.is_superuser,
+            token_version=payload.token_version,
+        )
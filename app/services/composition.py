@@ -0,0 +1,178 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable
+from fastapi import status as http_status
+from pydantic import ValidationError
+import aiohttp
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.crud.movies import MovieCrud
+from app.crud.ratings import RatingCrud
+from app.proxy import tmdb_api
+from app.schemas.leaderboard import LeaderboardEntry
+from app.schemas.movie import MovieSummary
+from app.schemas.rating import RatingExpandedInDB
+from app.schemas.similarity import SimilarMovie
+from app.services import grade_predictor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Source:
+    """
+    One independent lookup (TMDB, DB...) and the time it is allowed to take.
+    The response can't be served without a required source, the others are
+    flagged as unavailable when they fail.
+    """
+    awaitable: Awaitable
+    deadline: float
+    required: bool = False
+
+
+@dataclass
+class SourceResult:
+    value: Any = None
+    available: bool = True
+
+
+async def _run_with_deadline(name: str, source: Source) -> SourceResult:
+    try:
+        value = await asyncio.wait_for(source.awaitable, timeout=source.deadline)
+    except asyncio.TimeoutError:
+        logger.warning('Source "%s" missed its %ss deadline', name, source.deadline)
+        return SourceResult(available=False)
+    except Exception:
+        if source.required:
+            raise
+        logger.warning('Source "%s" failed', name, exc_info=True)
+        return SourceResult(available=False)
+
+    return SourceResult(value=value)
+
+
+async def gather_with_deadlines(**sources: Source) -> dict[str, SourceResult]:
+    '''
+    Run the sources concurrently, so that the latency is the slowest of them
+    rather than their sum. A source missing its deadline is cancelled and
+    flagged as unavailable, and so is an optional one failing. The errors of
+    the required sources are raised once all sources are done.
+    '''
+    names = list(sources)
+    results = await asyncio.gather(
+        *(_run_with_deadline(name, sources[name]) for name in names),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    return dict(zip(names, results))
+
+
+async def attach_rating_summaries(
+    movies: list[dict],
+    *,
+    rating_crud: RatingCrud,
+    user_id: int | None = None
+) -> list[dict]:
+    '''
+    Add our ratings to a page of TMDB movies, with one query for the whole page,
+    and the user's predicted grades of the movies they haven't rated.
+    The page is returned untouched when the ratings miss their deadline.
+    '''
+    sources = await gather_with_deadlines(
+        summaries=Source(
+            rating_crud.get_rating_summaries_per_movies(
+                movie_ids=[movie['id'] for movie in movies],
+                user_id=user_id
+            ),
+            deadline=settings.RATINGS_DEADLINE_SECONDS
+        )
+    )
+    if not sources['summaries'].available:
+        return movies
+
+    summaries = sources['summaries'].value
+    predicted_grades = grade_predictor.predict(
+        user_id=user_id,
+        movie_ids=[movie['id'] for movie in movies]
+    ) if user_id is not None else {}
+
+    enriched_movies = []
+    for movie in movies:
+        summary = summaries.get(movie['id'])
+        user_grade = summary.user_grade if summary else None
+        enriched_movies.append({
+            **movie,
+            'avg_rating': summary.avg_rating if summary else None,
+            'rating_count': summary.rating_count if summary else 0,
+            'user_grade': user_grade,
+            'predicted_grade': predicted_grades.get(movie['id']) if user_grade is None else None,
+        })
+
+    return enriched_movies
+
+
+async def fetch_movie_summaries(
+    movie_ids: list[int],
+    *,
+    client_session: aiohttp.ClientSession
+) -> dict[int, MovieSummary]:
+    '''
+    Fetch many movies from TMDB concurrently, skipping the late or failed ones,
+    and those TMDB answers without the catalog fields (e.g. removed movies)
+    '''
+    sources = await gather_with_deadlines(**{
+        str(movie_id): Source(
+            tmdb_api.fetch_tmdb_api(
+                endpoint=f'/movie/{movie_id}',
+                client_session=client_session
+            ),
+            deadline=settings.TMDB_API_DEADLINE_SECONDS
+        )
+        for movie_id in movie_ids
+    })
+
+    summaries = {}
+    for (movie_id, source) in sources.items():
+        if not source.available:
+            continue
+        (status, res) = source.value
+        if status != http_status.HTTP_200_OK:
+            continue
+        try:
+            summaries[int(movie_id)] = MovieSummary(**res)
+        except ValidationError as e:
+            logger.warning('Invalid TMDB movie %s skipped: %s', movie_id, e)
+
+    return summaries
+
+
+async def attach_movie_summaries(
+    ratings: list[RatingExpandedInDB | LeaderboardEntry | SimilarMovie],
+    *,
+    movie_crud: MovieCrud,
+    client_session: aiohttp.ClientSession
+) -> list[RatingExpandedInDB | LeaderboardEntry | SimilarMovie]:
+    '''
+    Attach the rated movies from the local catalog with one query for the whole
+    page. Movies missing from the catalog are fetched from TMDB and saved there.
+    '''
+    movie_ids = list({rating.movie_id for rating in ratings})
+    movies = await movie_crud.get_movie_summaries_per_ids(movie_ids=movie_ids)
+
+    missing_movie_ids = [movie_id for movie_id in movie_ids if movie_id not in movies]
+    if missing_movie_ids:
+        fetched_movies = await fetch_movie_summaries(
+            missing_movie_ids,
+            client_session=client_session
+        )
+        await movie_crud.upsert_movie_summaries(movies=list(fetched_movies.values()))
+        movies.update(fetched_movies)
+
+    for rating in ratings:
+        rating.movie = movies.get(rating.movie_id)
+
+    return ratings
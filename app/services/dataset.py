@@ -0,0 +1,258 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+import logging
+import time
+import asyncpg
+import numpy as np
+
+from app.services import auth_service
+
+logger = logging.getLogger(__name__)
+
+# Every synthetic user logs in with this password
+DATASET_PASSWORD = 'synthetic-password'
+# Fixed so that a seed always generates the same rows, whatever the day
+DEFAULT_UNTIL = datetime(2022, 7, 1, tzinfo=timezone.utc)
+USERS_PER_CHUNK = 10_000
+# Independent random streams, so that changing one distribution doesn't shift the others
+(MOVIES_STREAM, USERS_STREAM, RATINGS_STREAM) = (0, 1, 2)
+MIN_GRADE = 0
+MAX_GRADE = 10
+
+USER_COLUMNS = (
+    'id', 'username', 'email', 'salt', 'password', 'is_active', 'is_superuser',
+    'token_version', 'created_at', 'updated_at'
+)
+RATING_COLUMNS = ('movie_id', 'user_id', 'grade', 'created_at', 'updated_at')
+
+SCHEMA_VERSION_QUERY = '''
+    SELECT version_num FROM alembic_version
+'''
+
+MAX_USER_ID_QUERY = '''
+    SELECT COALESCE(MAX(id), 0) FROM users
+'''
+
+CATALOG_MOVIE_IDS_QUERY = '''
+    SELECT id FROM movies ORDER BY id
+'''
+
+# The rollup and invalidation triggers would run once per copied rating
+DISABLE_RATING_TRIGGERS_QUERY = '''
+    ALTER TABLE ratings DISABLE TRIGGER USER
+'''
+
+ENABLE_RATING_TRIGGERS_QUERY = '''
+    ALTER TABLE ratings ENABLE TRIGGER USER
+'''
+
+RESET_USER_ID_SEQUENCE_QUERY = '''
+    SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT MAX(id) FROM users))
+'''
+
+# Same as the backfill of the rollups migration
+REBUILD_MOVIE_RATING_STATS_QUERIES = (
+    'TRUNCATE movie_rating_stats, movie_rating_daily',
+    '''
+    INSERT INTO movie_rating_stats (movie_id, rating_count, grade_sum)
+    SELECT movie_id, COUNT(*), SUM(grade)
+    FROM ratings
+    GROUP BY movie_id
+    ''',
+    '''
+    INSERT INTO movie_rating_daily (movie_id, day, rating_count, grade_sum)
+    SELECT movie_id, created_at::DATE, COUNT(*), SUM(grade)
+    FROM ratings
+    GROUP BY movie_id, created_at::DATE
+    ''',
+)
+
+ANALYZE_QUERY = '''
+    ANALYZE users, ratings, movie_rating_stats, movie_rating_daily
+'''
+
+
+@dataclass
+class DatasetSpec:
+    """
+    Shape of a synthetic dataset: the same spec and seed always generate the
+    same users and ratings
+    """
+    users: int
+    # Average per user, before the duplicate (user, movie) pairs are dropped
+    ratings_per_user: float
+    movie_ids: np.ndarray
+    seed: int = 0
+    # Exponent of the Zipf law of the movie popularity, by rank
+    movie_skew: float = 1.0
+    # Pareto shape of the ratings per user: the lower, the more power users
+    user_skew: float = 1.5
+    days: int = 3 * 365
+    until: datetime = DEFAULT_UNTIL
+
+
+@dataclass
+class Movies:
+    """
+    Movies by decreasing popularity, with the cumulative probability to rate
+    each of them and their average grade
+    """
+    ids: np.ndarray
+    cdf: np.ndarray
+    quality: np.ndarray
+
+
+def _rng(spec: DatasetSpec, stream: int, chunk: int = 0) -> np.random.Generator:
+    return np.random.default_rng([spec.seed, stream, chunk])
+
+
+def _to_datetimes(timestamps: np.ndarray) -> list[datetime]:
+    return [
+        datetime.fromtimestamp(timestamp, timezone.utc) for timestamp in timestamps.tolist()
+    ]
+
+
+def generate_movies(spec: DatasetSpec) -> Movies:
+    rng = _rng(spec, MOVIES_STREAM)
+    # Popularity shouldn't follow the TMDB ids
+    ids = rng.permutation(np.asarray(spec.movie_ids, dtype=np.int64))
+    weights = 1.0 / np.arange(1, len(ids) + 1) ** spec.movie_skew
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    quality = rng.normal(6.5, 1.2, size=len(ids))
+
+    return Movies(ids=ids, cdf=cdf, quality=quality)
+
+
+def generate_user_chunk(
+    spec: DatasetSpec, chunk: int, *, first_id: int
+) -> tuple[np.ndarray, np.ndarray]:
+    ''' Ids and creation timestamps of the users of a chunk, more of them lately '''
+    rng = _rng(spec, USERS_STREAM, chunk)
+    start = chunk * USERS_PER_CHUNK
+    ids = np.arange(first_id + start, first_id + min(start + USERS_PER_CHUNK, spec.users))
+    until = spec.until.timestamp()
+    span = timedelta(days=spec.days).total_seconds()
+    created_at = until - span + span * rng.power(2.0, size=len(ids))
+
+    return (ids, created_at)
+
+
+def generate_rating_chunk(
+    spec: DatasetSpec,
+    chunk: int,
+    movies: Movies,
+    user_ids: np.ndarray,
+    user_created_at: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    ''' Movie ids, user ids, grades and creation timestamps of the ratings of some users '''
+    rng = _rng(spec, RATINGS_STREAM, chunk)
+    n_movies = len(movies.ids)
+
+    # Lomax distributed, of mean `ratings_per_user - 1`, plus the rating every user has
+    shape = spec.user_skew
+    counts = 1 + np.floor(
+        rng.pareto(shape, size=len(user_ids)) * (spec.ratings_per_user - 1) * (shape - 1)
+    ).astype(np.int64)
+    counts = np.minimum(counts, n_movies)
+    users = np.repeat(np.arange(len(user_ids)), counts)
+    ranks = np.minimum(np.searchsorted(movies.cdf, rng.random(len(users))), n_movies - 1)
+
+    # A user rates a movie once
+    (_, unique) = np.unique(users * n_movies + ranks, return_index=True)
+    (users, ranks) = (users[unique], ranks[unique])
+
+    user_bias = rng.normal(0.0, 1.0, size=len(user_ids))
+    grades = np.clip(
+        np.rint(movies.quality[ranks] + user_bias[users] + rng.normal(0.0, 1.5, len(users))),
+        MIN_GRADE, MAX_GRADE
+    ).astype(np.int64)
+    # Any time between the user's signup and the end of the dataset
+    since = user_created_at[users]
+    created_at = since + (spec.until.timestamp() - since) * rng.random(len(users))
+
+    # Inserted in time order, like in production
+    order = np.argsort(created_at, kind='stable')
+    return (movies.ids[ranks][order], user_ids[users][order], grades[order], created_at[order])
+
+
+def generate_chunks(
+    spec: DatasetSpec, *, first_id: int, salt: str, password: str
+) -> Iterator[tuple[list[tuple], list[tuple]]]:
+    ''' User and rating rows, USERS_PER_CHUNK users at a time to keep the memory flat '''
+    movies = generate_movies(spec)
+    for chunk in range(-(-spec.users // USERS_PER_CHUNK)):
+        (user_ids, user_created_at) = generate_user_chunk(spec, chunk, first_id=first_id)
+        user_rows = [
+            (user_id, f'user{user_id}', f'user{user_id}@example.com', salt, password,
+             True, False, 0, created_at, created_at)
+            for (user_id, created_at) in zip(user_ids.tolist(), _to_datetimes(user_created_at))
+        ]
+
+        (movie_ids, rating_user_ids, grades, rating_created_at) = generate_rating_chunk(
+            spec, chunk, movies, user_ids, user_created_at
+        )
+        rating_rows = [
+            (movie_id, user_id, grade, created_at, created_at)
+            for (movie_id, user_id, grade, created_at) in zip(
+                movie_ids.tolist(), rating_user_ids.tolist(), grades.tolist(),
+                _to_datetimes(rating_created_at)
+            )
+        ]
+
+        yield (user_rows, rating_rows)
+
+
+async def get_catalog_movie_ids(connection: asyncpg.Connection) -> np.ndarray:
+    rows = await connection.fetch(CATALOG_MOVIE_IDS_QUERY)
+    return np.array([row['id'] for row in rows], dtype=np.int64)
+
+
+async def load_dataset(
+    connection: asyncpg.Connection, spec: DatasetSpec, *, schema_version: str
+) -> tuple[int, int]:
+    '''
+    COPY the users and ratings of `spec` after the existing ones, in a single
+    transaction, then rebuild the rating rollups and the planner statistics.
+    Returns the number of users and ratings loaded.
+    '''
+    current_version = await connection.fetchval(SCHEMA_VERSION_QUERY)
+    if current_version != schema_version:
+        raise ValueError(
+            f'The database is at revision {current_version}, not at the head {schema_version}'
+        )
+
+    # A single hash: bcrypt would take days for millions of users
+    salt = auth_service.generate_salt()
+    password = auth_service.hash_password(password=DATASET_PASSWORD, salt=salt)
+
+    (user_count, rating_count) = (0, 0)
+    start = time.perf_counter()
+    async with connection.transaction():
+        first_id = await connection.fetchval(MAX_USER_ID_QUERY) + 1
+        await connection.execute(DISABLE_RATING_TRIGGERS_QUERY)
+        for (user_rows, rating_rows) in generate_chunks(
+            spec, first_id=first_id, salt=salt, password=password
+        ):
+            await connection.copy_records_to_table(
+                'users', records=user_rows, columns=USER_COLUMNS
+            )
+            await connection.copy_records_to_table(
+                'ratings', records=rating_rows, columns=RATING_COLUMNS
+            )
+            user_count += len(user_rows)
+            rating_count += len(rating_rows)
+            logger.warning(
+                '%d users and %d ratings copied in %.0fs',
+                user_count, rating_count, time.perf_counter() - start
+            )
+        await connection.execute(ENABLE_RATING_TRIGGERS_QUERY)
+        await connection.execute(RESET_USER_ID_SEQUENCE_QUERY)
+        for query in REBUILD_MOVIE_RATING_STATS_QUERIES:
+            await connection.execute(query)
+
+    # Plans are only realistic once the planner knows the new sizes
+    await connection.execute(ANALYZE_QUERY)
+
+    return (user_count, rating_count)
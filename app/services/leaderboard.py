@@ -0,0 +1,126 @@
+from datetime import datetime, timezone
+from databases import Database
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.crud.movie_stats import MovieStatsCrud
+from app.schemas.leaderboard import (
+    LeaderboardEntry,
+    LeaderboardSort,
+    LeaderboardWindow,
+    MovieRatingStats
+)
+
+logger = logging.getLogger(__name__)
+
+WINDOW_DAYS: dict[LeaderboardWindow, int | None] = {
+    LeaderboardWindow.ALL: None,
+    LeaderboardWindow.MONTH: 30,
+    LeaderboardWindow.WEEK: 7,
+}
+
+
+def rank_movies(
+    stats: list[MovieRatingStats],
+    *,
+    prior_votes: int
+) -> dict[LeaderboardSort, list[LeaderboardEntry]]:
+    '''
+    All the movies by Bayesian average and by votes. Each average is pulled
+    toward the mean grade of the window as if the movie had `prior_votes` more votes.
+    Not truncated: `min_votes` may only keep movies ranked far down by average.
+    '''
+    total_count = sum(movie_stats.rating_count for movie_stats in stats)
+    if not total_count:
+        return {sort: [] for sort in LeaderboardSort}
+
+    prior_mean = sum(movie_stats.grade_sum for movie_stats in stats) / total_count
+    entries = [
+        LeaderboardEntry(
+            movie_id=movie_stats.movie_id,
+            avg_rating=round(movie_stats.grade_sum / movie_stats.rating_count, 1),
+            rating_count=movie_stats.rating_count,
+            score=round(
+                (prior_votes * prior_mean + movie_stats.grade_sum)
+                / (prior_votes + movie_stats.rating_count),
+                3
+            )
+        )
+        for movie_stats in stats
+    ]
+
+    return {
+        LeaderboardSort.RATING: sorted(
+            entries, key=lambda entry: (-entry.score, -entry.rating_count, entry.movie_id)
+        ),
+        LeaderboardSort.VOTES: sorted(
+            entries, key=lambda entry: (-entry.rating_count, -entry.score, entry.movie_id)
+        ),
+    }
+
+
+class Leaderboard:
+    """
+    Per-process leaderboards of each window, rebuilt from the rating rollups
+    every `LEADERBOARD_REFRESH_SECONDS` by a background task
+    """
+
+    def __init__(self) -> None:
+        self.refreshed_at: datetime | None = None
+        self._rankings: dict[LeaderboardWindow, dict[LeaderboardSort, list[LeaderboardEntry]]] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self, db: Database) -> None:
+        self._task = asyncio.create_task(self._refresh_periodically(db))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return None
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def refresh(self, db: Database) -> None:
+        movie_stats_crud = MovieStatsCrud(db)
+        rankings = {}
+        for (window, days) in WINDOW_DAYS.items():
+            stats = await movie_stats_crud.get_movie_rating_stats(days=days)
+            rankings[window] = rank_movies(stats, prior_votes=settings.LEADERBOARD_PRIOR_VOTES)
+
+        self._rankings = rankings
+        self.refreshed_at = datetime.now(timezone.utc)
+
+    async def _refresh_periodically(self, db: Database) -> None:
+        while True:
+            try:
+                await self.refresh(db)
+            except Exception:
+                logger.exception('Unable to refresh the leaderboards')
+            await asyncio.sleep(settings.LEADERBOARD_REFRESH_SECONDS)
+
+    def get_top(
+        self,
+        *,
+        window: LeaderboardWindow,
+        sort: LeaderboardSort = LeaderboardSort.RATING,
+        min_votes: int = 1,
+        limit: int = 20
+    ) -> list[LeaderboardEntry]:
+        ''' Copies of the entries, so that callers can attach the movies '''
+        entries = self._rankings.get(window, {}).get(sort, [])
+        top = []
+        for entry in entries:
+            # By votes, the movies with enough votes come first
+            if sort == LeaderboardSort.VOTES and entry.rating_count < min_votes:
+                break
+            if entry.rating_count >= min_votes:
+                top.append(entry.copy())
+                if len(top) == limit:
+                    break
+
+        return top
@@ -0,0 +1,244 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = 'grade_predictor'
+CURRENT_VERSION_FILE = 'CURRENT'
+MIN_GRADE = 0.0
+MAX_GRADE = 10.0
+
+
+@dataclass
+class FactorModel:
+    """
+    Biased matrix factorization, folded so that a prediction is a single dot
+    product: users are `[factors, user_bias, 1]` and movies `[factors, 1, movie_bias]`
+    """
+    global_mean: float
+    user_ids: np.ndarray
+    user_factors: np.ndarray
+    movie_ids: np.ndarray
+    movie_factors: np.ndarray
+
+    def predict(self, user_id: int, movie_ids: list[int]) -> dict[int, float]:
+        ''' Predicted grades of the known movies, none when the user is unknown '''
+        user_index = np.searchsorted(self.user_ids, user_id)
+        if user_index == len(self.user_ids) or self.user_ids[user_index] != user_id:
+            return {}
+
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        movie_indices = np.minimum(
+            np.searchsorted(self.movie_ids, movie_ids), len(self.movie_ids) - 1
+        )
+        known = self.movie_ids[movie_indices] == movie_ids
+        grades = self.movie_factors[movie_indices[known]] @ self.user_factors[user_index]
+        grades = np.clip(grades.astype(np.float64) + self.global_mean, MIN_GRADE, MAX_GRADE)
+
+        return dict(zip(movie_ids[known].tolist(), np.round(grades, 1).tolist()))
+
+
+def _indptr(indices: np.ndarray, size: int) -> np.ndarray:
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=size), out=indptr[1:])
+    return indptr
+
+
+def _accumulate_row(
+    start: int,
+    end: int,
+    columns: np.ndarray,
+    values: np.ndarray,
+    fixed: np.ndarray,
+    chunk_size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    ''' Gram matrix and target of a single row, `chunk_size` ratings at a time '''
+    k = fixed.shape[1]
+    (gram, target) = (np.zeros((k, k)), np.zeros(k))
+    for slice_start in range(start, end, chunk_size):
+        slice_end = min(slice_start + chunk_size, end)
+        row_fixed = fixed[columns[slice_start:slice_end]]
+        gram += row_fixed.T @ row_fixed
+        target += row_fixed.T @ values[slice_start:slice_end]
+
+    return (gram, target)
+
+
+def _solve_least_squares(
+    indptr: np.ndarray,
+    columns: np.ndarray,
+    values: np.ndarray,
+    fixed: np.ndarray,
+    regularization: float,
+    chunk_size: int = 100_000
+) -> np.ndarray:
+    '''
+    One ALS half-step: the factors of each row fitting its values against the
+    fixed factors of its columns, with a regularization weighted by the row's count.
+    Rows are solved as batched k x k systems, their Gram matrices summed from the
+    outer products of about `chunk_size / k` ratings at a time, so that the memory
+    stays within `chunk_size x k` floats. A row with more ratings than that, like a
+    popular movie, is accumulated slice by slice on its own.
+    '''
+    (n_rows, k) = (len(indptr) - 1, fixed.shape[1])
+    counts = np.diff(indptr)
+    solved = np.zeros((n_rows, k))
+    identity = np.eye(k)
+    batch_size = max(chunk_size // k, 1)
+
+    start_row = 0
+    while start_row < n_rows:
+        end_row = min(
+            np.searchsorted(indptr, indptr[start_row] + batch_size, side='right') - 1, n_rows
+        )
+        if end_row > start_row:
+            rows = np.arange(start_row, end_row)[counts[start_row:end_row] > 0]
+            if not len(rows):
+                start_row = end_row
+                continue
+            (start, end) = (indptr[start_row], indptr[end_row])
+            row_fixed = fixed[columns[start:end]]
+            offsets = indptr[rows] - start
+            grams = np.add.reduceat(row_fixed[:, :, None] * row_fixed[:, None, :], offsets, axis=0)
+            targets = np.add.reduceat(row_fixed * values[start:end, None], offsets, axis=0)
+        else:
+            (rows, end_row) = (np.array([start_row]), start_row + 1)
+            (gram, target) = _accumulate_row(
+                indptr[start_row], indptr[end_row], columns, values, fixed, chunk_size
+            )
+            (grams, targets) = (gram[None], target[None])
+        grams += regularization * counts[rows, None, None] * identity
+        solved[rows] = np.linalg.solve(grams, targets[:, :, None])[:, :, 0]
+        start_row = end_row
+
+    return solved
+
+
+def train_factor_model(
+    user_ids: np.ndarray,
+    movie_ids: np.ndarray,
+    grades: np.ndarray,
+    *,
+    factors: int,
+    iterations: int,
+    regularization: float,
+    bias_regularization: float = 5.0,
+    seed: int = 0
+) -> FactorModel:
+    ''' Alternating least squares on the grades minus the mean and the biases '''
+    (unique_user_ids, users) = np.unique(user_ids, return_inverse=True)
+    (unique_movie_ids, movies) = np.unique(movie_ids, return_inverse=True)
+    (n_users, n_movies) = (len(unique_user_ids), len(unique_movie_ids))
+
+    grades = grades.astype(np.float64)
+    global_mean = float(grades.mean()) if len(grades) else 0.0
+    movie_biases = np.bincount(movies, weights=grades - global_mean, minlength=n_movies) \
+        / (np.bincount(movies, minlength=n_movies) + bias_regularization)
+    residuals = grades - global_mean - movie_biases[movies]
+    user_biases = np.bincount(users, weights=residuals, minlength=n_users) \
+        / (np.bincount(users, minlength=n_users) + bias_regularization)
+    residuals -= user_biases[users]
+
+    by_user = np.argsort(users, kind='stable')
+    by_movie = np.argsort(movies, kind='stable')
+    (user_indptr, movie_indptr) = (_indptr(users, n_users), _indptr(movies, n_movies))
+
+    rng = np.random.default_rng(seed)
+    movie_factors = rng.normal(0.0, 0.1, (n_movies, factors))
+    user_factors = np.zeros((n_users, factors))
+    for iteration in range(iterations):
+        user_factors = _solve_least_squares(
+            user_indptr, movies[by_user], residuals[by_user], movie_factors, regularization
+        )
+        movie_factors = _solve_least_squares(
+            movie_indptr, users[by_movie], residuals[by_movie], user_factors, regularization
+        )
+        errors = residuals - np.einsum('ij,ij->i', user_factors[users], movie_factors[movies])
+        logger.info(
+            'ALS iteration %d/%d: train RMSE %.4f',
+            iteration + 1, iterations, np.sqrt(np.mean(errors ** 2))
+        )
+
+    return FactorModel(
+        global_mean=global_mean,
+        user_ids=unique_user_ids,
+        user_factors=np.hstack(
+            [user_factors, user_biases[:, None], np.ones((n_users, 1))]
+        ).astype(np.float32),
+        movie_ids=unique_movie_ids,
+        movie_factors=np.hstack(
+            [movie_factors, np.ones((n_movies, 1)), movie_biases[:, None]]
+        ).astype(np.float32),
+    )
+
+
+def save_factor_model(model: FactorModel, model_dir: str) -> str:
+    '''
+    Write the model in a new version directory, then point CURRENT to it, so that
+    workers never load a partially written model. Returns the version.
+    '''
+    root = Path(model_dir) / MODEL_NAME
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    version_dir = root / version
+    version_dir.mkdir(parents=True)
+
+    for name in ('user_ids', 'user_factors', 'movie_ids', 'movie_factors'):
+        np.save(version_dir / f'{name}.npy', getattr(model, name))
+    (version_dir / 'meta.json').write_text(json.dumps({'global_mean': model.global_mean}))
+
+    pointer = root / f'{CURRENT_VERSION_FILE}.tmp'
+    pointer.write_text(version)
+    os.replace(pointer, root / CURRENT_VERSION_FILE)
+
+    return version
+
+
+def load_factor_model(model_dir: str) -> tuple[str, FactorModel] | None:
+    '''
+    Memory-map the current model version: the pages are shared through the OS
+    cache by all the workers of the host instead of being copied in each of them
+    '''
+    root = Path(model_dir) / MODEL_NAME
+    try:
+        version = (root / CURRENT_VERSION_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+    version_dir = root / version
+    meta = json.loads((version_dir / 'meta.json').read_text())
+    arrays = {
+        name: np.load(version_dir / f'{name}.npy', mmap_mode='r')
+        for name in ('user_ids', 'user_factors', 'movie_ids', 'movie_factors')
+    }
+
+    return (version, FactorModel(global_mean=meta['global_mean'], **arrays))
+
+
+class GradePredictor:
+    """
+    Per-process handle on the current grade predictor model, if any was trained
+    """
+
+    def __init__(self) -> None:
+        self.version: str | None = None
+        self.model: FactorModel | None = None
+
+    def load(self, model_dir: str) -> None:
+        loaded = load_factor_model(model_dir)
+        if loaded is None:
+            logger.info('No grade predictor model in "%s", predictions are disabled', model_dir)
+            return None
+
+        (self.version, self.model) = loaded
+        logger.info('Loaded the grade predictor model version %s', self.version)
+
+    def predict(self, *, user_id: int, movie_ids: list[int]) -> dict[int, float]:
+        if self.model is None or not movie_ids:
+            return {}
+
+        return self.model.predict(user_id, movie_ids)
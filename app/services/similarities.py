@@ -0,0 +1,183 @@
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import logging
+import numpy as np
+
+from app.crud.ratings import RatingCrud
+from app.crud.similarities import MovieSimilarityCrud
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RatingMatrix:
+    """
+    Sparse user x movie matrix of the grades minus the mean grade of each user,
+    stored both by user (CSR) and by movie (CSC) as flat NumPy arrays
+    """
+    movie_ids: np.ndarray
+    # CSR: the ratings of user `u` are at `user_indptr[u]:user_indptr[u + 1]`
+    user_indptr: np.ndarray
+    user_movies: np.ndarray
+    user_residuals: np.ndarray
+    # CSC: the ratings of movie `m` are at `movie_indptr[m]:movie_indptr[m + 1]`
+    movie_indptr: np.ndarray
+    movie_users: np.ndarray
+    movie_residuals: np.ndarray
+    movie_norms: np.ndarray
+
+    @property
+    def n_movies(self) -> int:
+        return len(self.movie_ids)
+
+    def movie_index(self, movie_id: int) -> int | None:
+        index = np.searchsorted(self.movie_ids, movie_id)
+        if index < self.n_movies and self.movie_ids[index] == movie_id:
+            return int(index)
+        return None
+
+
+def _indptr(indices: np.ndarray, size: int) -> np.ndarray:
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=size), out=indptr[1:])
+    return indptr
+
+
+def build_rating_matrix(
+    user_ids: np.ndarray,
+    movie_ids: np.ndarray,
+    grades: np.ndarray
+) -> RatingMatrix:
+    (_, users) = np.unique(user_ids, return_inverse=True)
+    (unique_movie_ids, movies) = np.unique(movie_ids, return_inverse=True)
+    n_users = users.max() + 1 if len(users) else 0
+    n_movies = len(unique_movie_ids)
+
+    # Adjusted cosine: center the grades on each user's mean, so that harsh
+    # and generous raters agree on what they liked
+    grades = grades.astype(np.float64)
+    user_means = np.bincount(users, weights=grades, minlength=n_users) \
+        / np.maximum(np.bincount(users, minlength=n_users), 1)
+    residuals = grades - user_means[users]
+
+    by_user = np.argsort(users, kind='stable')
+    by_movie = np.argsort(movies, kind='stable')
+
+    return RatingMatrix(
+        movie_ids=unique_movie_ids,
+        user_indptr=_indptr(users, n_users),
+        user_movies=movies[by_user],
+        user_residuals=residuals[by_user],
+        movie_indptr=_indptr(movies, n_movies),
+        movie_users=users[by_movie],
+        movie_residuals=residuals[by_movie],
+        movie_norms=np.sqrt(np.bincount(movies, weights=residuals ** 2, minlength=n_movies)),
+    )
+
+
+def top_similar_movies(
+    matrix: RatingMatrix,
+    movie_index: int,
+    *,
+    top_k: int,
+    min_overlap: int
+) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Dense indices and similarities of the `top_k` movies most similar to one
+    movie, among those rated by at least `min_overlap` of its raters.
+    Only the ratings of the users who rated the movie are visited.
+    '''
+    start, end = matrix.movie_indptr[movie_index], matrix.movie_indptr[movie_index + 1]
+    raters = matrix.movie_users[start:end]
+    rater_residuals = matrix.movie_residuals[start:end]
+
+    # Gather the CSR rows of all the raters at once
+    row_starts = matrix.user_indptr[raters]
+    row_lengths = matrix.user_indptr[raters + 1] - row_starts
+    row_offsets = np.repeat(row_starts - np.cumsum(row_lengths) + row_lengths, row_lengths)
+    positions = row_offsets + np.arange(row_lengths.sum())
+
+    neighbors = matrix.user_movies[positions]
+    weights = np.repeat(rater_residuals, row_lengths) * matrix.user_residuals[positions]
+    dots = np.bincount(neighbors, weights=weights, minlength=matrix.n_movies)
+    overlaps = np.bincount(neighbors, minlength=matrix.n_movies)
+
+    norms = matrix.movie_norms * matrix.movie_norms[movie_index]
+    similarities = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+    # Only the movies liked alike are recommended
+    similarities[(overlaps < min_overlap) | (similarities <= 0)] = 0.0
+    similarities[movie_index] = 0.0
+
+    candidates = np.flatnonzero(similarities)
+    if len(candidates) > top_k:
+        candidates = candidates[np.argpartition(-similarities[candidates], top_k - 1)[:top_k]]
+    candidates = candidates[np.argsort(-similarities[candidates], kind='stable')]
+
+    return (candidates, similarities[candidates])
+
+
+async def load_rating_grades(rating_crud: RatingCrud) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ''' Stream all the grades into compact arrays, rather than a list of records '''
+    (user_ids, movie_ids, grades) = (array('q'), array('q'), array('b'))
+    async for record in rating_crud.iterate_rating_grades():
+        user_ids.append(record['user_id'])
+        movie_ids.append(record['movie_id'])
+        grades.append(record['grade'])
+
+    return (
+        np.frombuffer(user_ids, dtype=np.int64),
+        np.frombuffer(movie_ids, dtype=np.int64),
+        np.frombuffer(grades, dtype=np.int8)
+    )
+
+
+async def rebuild_similar_movies(
+    similarity_crud: MovieSimilarityCrud,
+    rating_crud: RatingCrud,
+    *,
+    incremental: bool = False,
+    top_k: int,
+    min_overlap: int,
+    batch_size: int = 500
+) -> int:
+    '''
+    Recompute and store the neighbors of every movie, or with `incremental` only
+    of the movies rated since the last build. Returns the number of movies rebuilt.
+
+    Incremental builds don't revisit the lists in which a rebuilt movie appears
+    as a neighbor, so a full build should still run periodically.
+    '''
+    started_at = datetime.now(timezone.utc)
+    matrix = build_rating_matrix(*await load_rating_grades(rating_crud))
+
+    built_at = await similarity_crud.get_built_at() if incremental else None
+    if built_at is None:
+        movie_ids = matrix.movie_ids.tolist()
+        await similarity_crud.delete_similarities_except(movie_ids=movie_ids)
+    else:
+        movie_ids = await similarity_crud.get_movie_ids_rated_since(since=built_at)
+
+    for batch_start in range(0, len(movie_ids), batch_size):
+        batch = movie_ids[batch_start:batch_start + batch_size]
+        similarities = []
+        for movie_id in batch:
+            movie_index = matrix.movie_index(movie_id)
+            if movie_index is None:
+                continue
+            (neighbors, scores) = top_similar_movies(
+                matrix, movie_index, top_k=top_k, min_overlap=min_overlap
+            )
+            neighbor_ids = matrix.movie_ids[neighbors].tolist()
+            similarities.extend(
+                (movie_id, neighbor_id, score)
+                for (neighbor_id, score) in zip(neighbor_ids, scores.tolist())
+            )
+        await similarity_crud.replace_similarities(movie_ids=batch, similarities=similarities)
+        logger.info(
+            'Rebuilt the neighbors of %d/%d movies', batch_start + len(batch), len(movie_ids)
+        )
+
+    await similarity_crud.set_built_at(built_at=started_at)
+
+    return len(movie_ids)
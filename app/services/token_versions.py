@@ -0,0 +1,44 @@
+from app.core.cache import Cache, cache_registry
+from app.core.config import settings
+
+_MISSING = object()
+
+
+class TokenVersionCache:
+    """
+    Cache of the current token version of each user.
+
+    A token is revoked as soon as its `token_version` claim differs from the
+    user's version. Entries are evicted on the user writes of any worker
+    through the invalidation bus, and expire after a TTL in case a
+    notification is missed.
+    """
+
+    def __init__(self, cache: Cache | None = None) -> None:
+        self.cache = cache or cache_registry.get_cache(
+            'token_versions', ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS
+        )
+        # Bumped by every eviction, so that a version read before it isn't cached after it
+        self.generation = 0
+
+    async def get(self, user_id: int) -> int | None | object:
+        ''' Cached version of the user (None if deleted), `_MISSING` when unknown '''
+        found = await self.cache.get_many([user_id])
+        return found[user_id] if user_id in found else _MISSING
+
+    async def set(self, user_id: int, version: int | None, *, generation: int) -> None:
+        ''' Cache a version read from the DB since `generation`, unless evicted since '''
+        if generation == self.generation:
+            await self.cache.set(user_id, version)
+
+    async def invalidate(self, user_id: int) -> None:
+        self.generation += 1
+        await self.cache.delete(user_id)
+
+    async def clear(self) -> None:
+        self.generation += 1
+        await self.cache.clear()
+
+    @staticmethod
+    def is_missing(version: int | None | object) -> bool:
+        return version is _MISSING
@@ -0,0 +1,20 @@
+import os
+import shutil
+import tempfile
+
+# Loaded by gunicorn from the working directory, before the workers import the
+# app: each of them writes its Prometheus samples in this directory
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'movie-rater-metrics')
+)
+
+
+def on_starting(server):
+    # Samples of a previous run would be added to the new ones
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
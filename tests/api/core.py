@@ -2,7 +2,9 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from starlette.status import HTTP_201_CREATED
 
+from app.crud.users import UserCrud
 from app.schemas import token, user
+from app.schemas.user import UserCreate, UserPublic
 
 
 # Retrive a token for a user
@@ -14,3 +16,21 @@ def get_token(app_: FastAPI, client_: TestClient, *, user: user.UserCreate) -> t
     assert res.status_code == HTTP_201_CREATED
 
     return token.AccessToken(**res.json())
+
+
+async def get_or_create_user(
+    user_crud_: UserCrud, *, user_c: UserCreate, is_superuser: bool = False
+) -> UserPublic:
+    user = await user_crud_.get_user_by_email(email=user_c.email)
+
+    if user is None:
+        new_user = UserCreate(
+            email=user_c.email, username=user_c.username, password=user_c.password
+        )
+        user = await user_crud_.create_new_user(
+            new_user=new_user, is_superuser=is_superuser
+        )
+        assert user.id is not None
+
+    assert user.id is not None
+    return user
@@ -0,0 +1,224 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
+
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.profiling import profile_store
+from app.crud.users import UserCrud
+from app.db.slow_queries import slow_query_log
+from app.schemas.db import PoolStats, SlowQueryStats
+from app.schemas.loop_monitor import LoopBlock
+from app.schemas.profile import ProfileInfo, ProfilerKind
+from app.schemas.user import UserCreate
+
+from tests.api.core import get_or_create_user, get_token
+
+
+class TestAdminAPIRoutes:
+
+    def test_routes_exists(self, app: FastAPI, client: TestClient) -> None:
+        res = client.get(app.url_path_for("admin:get-db-pool"))
+        assert res.status_code != HTTP_404_NOT_FOUND
+
+        res = client.get(app.url_path_for("admin:get-profiles"))
+        assert res.status_code != HTTP_404_NOT_FOUND
+
+        res = client.get(app.url_path_for("admin:get-slow-queries"))
+        assert res.status_code != HTTP_404_NOT_FOUND
+
+        res = client.get(app.url_path_for("admin:get-loop-blocks"))
+        assert res.status_code != HTTP_404_NOT_FOUND
+
+
+@pytest.fixture
+def admin_test_pool():
+    return UserCreate(
+        email='admin_pool@mail.com',
+        username='admin_pool',
+        password='password'
+    )
+
+
+@pytest.fixture
+def user_test_pool():
+    return UserCreate(
+        email='user_pool@mail.com',
+        username='user_pool',
+        password='password'
+    )
+
+
+class TestAdminDBPool:
+
+    async def test_get_db_pool_as_admin(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_crud: UserCrud,
+        admin_test_pool: UserCreate
+    ):
+        await get_or_create_user(user_crud, user_c=admin_test_pool, is_superuser=True)
+        token = get_token(app, client, user=admin_test_pool)
+        headers = {
+            'Authorization': f'{token.token_type} {token.access_token}'
+        }
+
+        res = client.get(app.url_path_for("admin:get-db-pool"), headers=headers)
+        assert res.status_code == HTTP_200_OK
+
+        pool_stats = PoolStats(**res.json())
+        assert pool_stats.size >= pool_stats.min_size
+        assert pool_stats.in_use >= 1
+        assert pool_stats.acquisitions >= 1
+        assert pool_stats.wait_seconds_histogram['+Inf'] == pool_stats.acquisitions
+
+    async def test_get_db_pool_as_user(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_crud: UserCrud,
+        user_test_pool: UserCreate
+    ):
+        await get_or_create_user(user_crud, user_c=user_test_pool, is_superuser=False)
+        token = get_token(app, client, user=user_test_pool)
+        headers = {
+            'Authorization': f'{token.token_type} {token.access_token}'
+        }
+
+        res = client.get(app.url_path_for("admin:get-db-pool"), headers=headers)
+        assert res.status_code == HTTP_401_UNAUTHORIZED
+
+
+class TestAdminSlowQueries:
+
+    async def test_get_slow_queries_as_admin(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_crud: UserCrud,
+        admin_test_pool: UserCreate,
+        monkeypatch: pytest.MonkeyPatch
+    ):
+        await get_or_create_user(user_crud, user_c=admin_test_pool, is_superuser=True)
+        token = get_token(app, client, user=admin_test_pool)
+        headers = {
+            'Authorization': f'{token.token_type} {token.access_token}'
+        }
+        # Every query is slow
+        monkeypatch.setattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 0.0)
+        slow_query_log.clear()
+
+        client.get(app.url_path_for("movies:get-movie-id-similar", movie_id=1))
+        res = client.get(app.url_path_for("admin:get-slow-queries"), headers=headers)
+        assert res.status_code == HTTP_200_OK
+
+        slow_queries = {stats['name']: SlowQueryStats(**stats) for stats in res.json()}
+        stats = slow_queries['GET_SIMILAR_MOVIES_QUERY']
+        assert stats.count == 1
+        # Shapes only, never the values
+        assert stats.param_shapes == {'movie_id': 'int', 'limit': 'int'}
+
+
+class TestAdminLoopBlocks:
+
+    async def test_get_loop_blocks_as_admin(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_crud: UserCrud,
+        admin_test_pool: UserCreate
+    ):
+        await get_or_create_user(user_crud, user_c=admin_test_pool, is_superuser=True)
+        token = get_token(app, client, user=admin_test_pool)
+        headers = {
+            'Authorization': f'{token.token_type} {token.access_token}'
+        }
+        loop_monitor.blocks.append(
+            LoopBlock(detected_at=datetime.now(timezone.utc), stack=['  File "app.py"\n'])
+        )
+
+        res = client.get(app.url_path_for("admin:get-loop-blocks"), headers=headers)
+        assert res.status_code == HTTP_200_OK
+
+        blocks = [LoopBlock(**block) for block in res.json()]
+        assert blocks[0].stack == ['  File "app.py"\n']
+
+
+@pytest.fixture
+def profiling_app(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> FastAPI:
+    monkeypatch.setattr(settings, 'PROFILER_ENABLED', True)
+    monkeypatch.setattr(profile_store, 'path', tmp_path)
+    from app.app import get_application
+    return get_application()
+
+
+class TestAdminProfiles:
+
+    async def test_profile_request_as_admin(
+        self,
+        profiling_app: FastAPI,
+        user_crud: UserCrud,
+        admin_test_pool: UserCreate
+    ):
+        await get_or_create_user(user_crud, user_c=admin_test_pool, is_superuser=True)
+        with TestClient(profiling_app) as client:
+            token = get_token(profiling_app, client, user=admin_test_pool)
+            headers = {
+                'Authorization': f'{token.token_type} {token.access_token}'
+            }
+
+            res = client.get(
+                profiling_app.url_path_for("movies:get-movie-id-similar", movie_id=1),
+                headers={**headers, 'X-Profile': ProfilerKind.SAMPLING.value}
+            )
+            assert res.status_code == HTTP_200_OK
+            assert res.headers['X-Profile-Status'] == 'profiled'
+            profile_id = res.headers['X-Profile-Id']
+
+            res = client.get(profiling_app.url_path_for("admin:get-profiles"), headers=headers)
+            assert res.status_code == HTTP_200_OK
+            profiles = [ProfileInfo(**profile) for profile in res.json()]
+            assert str(profiles[0].id) == profile_id
+            assert profiles[0].path == '/api/v1/movies/1/similar'
+
+            res = client.get(
+                profiling_app.url_path_for("admin:get-profile-id", profile_id=profile_id),
+                headers=headers
+            )
+            assert res.status_code == HTTP_200_OK
+            # Collapsed stacks: `frame;frame;... <samples>` lines
+            assert all(line.rsplit(' ', 1)[1].isdigit() for line in res.text.splitlines())
+
+    async def test_profile_request_as_user(
+        self,
+        profiling_app: FastAPI,
+        user_crud: UserCrud,
+        user_test_pool: UserCreate
+    ):
+        await get_or_create_user(user_crud, user_c=user_test_pool, is_superuser=False)
+        with TestClient(profiling_app) as client:
+            token = get_token(profiling_app, client, user=user_test_pool)
+            headers = {
+                'Authorization': f'{token.token_type} {token.access_token}',
+                'X-Profile': ProfilerKind.CPROFILE.value
+            }
+
+            res = client.get(
+                profiling_app.url_path_for("movies:get-movie-id-similar", movie_id=1),
+                headers=headers
+            )
+            assert res.status_code == HTTP_200_OK
+            assert res.headers['X-Profile-Status'] == 'denied'
+            assert 'X-Profile-Id' not in res.headers
+
+    def test_get_profile_unauthenticated(self, app: FastAPI, client: TestClient) -> None:
+        res = client.get(
+            app.url_path_for(
+                "admin:get-profile-id", profile_id='00000000-0000-0000-0000-000000000000'
+            )
+        )
+        assert res.status_code == HTTP_401_UNAUTHORIZED
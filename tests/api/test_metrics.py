@@ -0,0 +1,46 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
+
+from app.core.config import settings
+
+
+@pytest.fixture
+def metrics_app(monkeypatch: pytest.MonkeyPatch) -> FastAPI:
+    monkeypatch.setattr(settings, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(settings, 'METRICS_TOKEN', 'metrics-token')
+    from app.app import get_application
+    return get_application()
+
+
+class TestMetricsAPI:
+
+    def test_metrics_disabled(self, client: TestClient) -> None:
+        res = client.get("/metrics")
+        assert res.status_code == HTTP_404_NOT_FOUND
+
+    def test_metrics_token(self, metrics_app: FastAPI) -> None:
+        with TestClient(metrics_app) as client:
+            res = client.get(metrics_app.url_path_for("metrics:get-metrics"))
+            assert res.status_code == HTTP_401_UNAUTHORIZED
+
+            res = client.get(
+                metrics_app.url_path_for("metrics:get-metrics"),
+                headers={'Authorization': 'Bearer wrong-token'}
+            )
+            assert res.status_code == HTTP_401_UNAUTHORIZED
+
+    def test_metrics(self, metrics_app: FastAPI) -> None:
+        with TestClient(metrics_app) as client:
+            client.get(metrics_app.url_path_for("movies:get-movie-id-similar", movie_id=1))
+            res = client.get(
+                metrics_app.url_path_for("metrics:get-metrics"),
+                headers={'Authorization': 'Bearer metrics-token'}
+            )
+            assert res.status_code == HTTP_200_OK
+
+            # Requests are labeled by route template, queries by SQL constant name
+            assert 'route="/api/v1/movies/{movie_id}/similar",status="200"' in res.text
+            assert 'query="GET_SIMILAR_MOVIES_QUERY"' in res.text
+            assert 'db_pool_connections{state="max"}' in res.text
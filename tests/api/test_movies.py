@@ -0,0 +1,133 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK, HTTP_404_NOT_FOUND, HTTP_422_UNPROCESSABLE_ENTITY
+
+from app.crud.ratings import RatingCrud
+from app.crud.users import UserCrud
+from app.proxy import tmdb_api
+from app.schemas.movie import MovieResult
+from app.schemas.rating import RatingCreate
+from app.schemas.similarity import SimilarMovieResult
+from app.schemas.user import UserCreate
+
+from tests.api.core import get_or_create_user, get_token
+
+# Movies not rated by any other test
+SEARCH_MOVIE_IDS = (901, 902)
+
+
+@pytest.fixture
+def user_test_movies() -> UserCreate:
+    return UserCreate(
+        email='movies_user@mail.com',
+        username='movies_user',
+        password='password'
+    )
+
+
+@pytest.fixture
+def tmdb_search(monkeypatch: pytest.MonkeyPatch) -> None:
+    ''' A page of search results, without calling TMDB '''
+    async def fetch_tmdb_api(endpoint: str, client_session, params: dict = None) -> tuple:
+        return (HTTP_200_OK, {
+            'page': 1,
+            'total_pages': 1,
+            'total_results': len(SEARCH_MOVIE_IDS),
+            'results': [
+                {
+                    'id': movie_id, 'title': f'Movie {movie_id}',
+                    'original_title': f'Movie {movie_id}', 'poster_path': None,
+                    'release_date': '2000-01-01', 'vote_average': 7.0, 'vote_count': 10
+                }
+                for movie_id in SEARCH_MOVIE_IDS
+            ]
+        })
+
+    monkeypatch.setattr(tmdb_api, 'fetch_tmdb_api', fetch_tmdb_api)
+
+
+class TestMoviesAPIRoutes:
+
+    def test_routes_exists(self, app: FastAPI, client: TestClient) -> None:
+        res = client.get(app.url_path_for("movies:get-movie-id-similar", movie_id=1))
+        assert res.status_code != HTTP_404_NOT_FOUND
+
+
+class TestMoviesAPI:
+
+    def test_get_similar_movies_not_built(self, app: FastAPI, client: TestClient) -> None:
+        res = client.get(app.url_path_for("movies:get-movie-id-similar", movie_id=1))
+        assert res.status_code == HTTP_200_OK
+
+        similar_movies = SimilarMovieResult(**res.json())
+        assert similar_movies.movie_id == 1
+        assert similar_movies.results == []
+
+    def test_get_similar_movies_limit(self, app: FastAPI, client: TestClient) -> None:
+        res = client.get(
+            app.url_path_for("movies:get-movie-id-similar", movie_id=1),
+            params={
+                'limit': 1000
+            }
+        )
+        assert res.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_get_movies_with_ratings(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        tmdb_search: None,
+        user_crud: UserCrud,
+        user_test_movies: UserCreate,
+        monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        user = await get_or_create_user(user_crud, user_c=user_test_movies)
+        rating_crud = RatingCrud(user_crud.db)
+        rating = await rating_crud.create_new_rating(
+            new_rating=RatingCreate(movie_id=SEARCH_MOVIE_IDS[0], user_id=user.id, grade=8)
+        )
+        try:
+            token = get_token(app, client, user=user_test_movies)
+            url = app.url_path_for("movies:get-movies")
+
+            # Anonymous
+            res = client.get(url, params={'query': 'movie', 'with_ratings': True})
+            assert res.status_code == HTTP_200_OK
+            movies = MovieResult(**res.json()).results
+            assert [(movie.avg_rating, movie.rating_count, movie.user_grade) for movie in movies] \
+                == [(8.0, 1, None), (None, 0, None)]
+
+            # Authenticated
+            headers = {'Authorization': f'{token.token_type} {token.access_token}'}
+            res = client.get(url, params={'query': 'movie', 'with_ratings': True}, headers=headers)
+            assert res.status_code == HTTP_200_OK
+            movies = MovieResult(**res.json()).results
+            assert [(movie.avg_rating, movie.user_grade) for movie in movies] \
+                == [(8.0, 8), (None, None)]
+
+            # A bad token makes the caller anonymous, and is only checked for the ratings
+            lookups = []
+            get_token_version = UserCrud.get_token_version
+
+            async def count_lookups(self, *, user_id: int) -> int:
+                lookups.append(user_id)
+                return await get_token_version(self, user_id=user_id)
+
+            monkeypatch.setattr(UserCrud, 'get_token_version', count_lookups)
+            res = client.get(
+                url,
+                params={'query': 'movie', 'with_ratings': True},
+                headers={'Authorization': 'Bearer not-a-token'}
+            )
+            assert res.status_code == HTTP_200_OK
+            assert MovieResult(**res.json()).results[0].user_grade is None
+
+            res = client.get(url, params={'query': 'movie'}, headers=headers)
+            assert res.status_code == HTTP_200_OK
+            assert MovieResult(**res.json()).results[0].avg_rating is None
+            assert lookups == []
+        finally:
+            # The ratings and users tests expect the tables they find
+            await rating_crud.delete_rating(rating_id=rating.id)
+            await user_crud.delete_user(user_id=user.id)
@@ -1,4 +1,5 @@
 import pytest
+from databases import Database
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from starlette.status import (
@@ -9,9 +10,16 @@ from starlette.status import (
     HTTP_422_UNPROCESSABLE_ENTITY
 )
 
+from app.crud.movie_stats import MovieStatsCrud
+from app.crud.ratings import RatingCrud
 from app.crud.users import UserCrud
+from app.proxy import tmdb_api
+from app.schemas.leaderboard import LeaderboardWindow
 from app.schemas.user import UserCreate
-from app.schemas.rating import RatingCreatePublic, RatingPublic, RatingResult
+from app.schemas.rating import (
+    RatingCreatePublic, RatingExpandedResult, RatingPublic, RatingResult
+)
+from app.services.leaderboard import Leaderboard
 
 from tests.api.core import get_token
 
@@ -28,6 +36,9 @@ class TestRatingsAPIRoutes:
         res = client.delete(app.url_path_for("ratings:delete-rating-id", rating_id=1), json={})
         assert res.status_code != HTTP_404_NOT_FOUND
 
+        res = client.get(app.url_path_for("ratings:get-ratings-me"))
+        assert res.status_code != HTTP_404_NOT_FOUND
+
 
 @pytest.fixture
 def user_test_rating():
@@ -272,6 +283,64 @@ class TestRatingsAPI:
         assert ratings.total_pages == 1
         assert ratings.results
 
+    def test_get_ratings_expand_user(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_test_rating: UserCreate,
+    ):
+        res = client.get(
+            app.url_path_for("ratings:get-ratings"),
+            params={
+                'expand': 'user'
+            }
+        )
+        assert res.status_code == HTTP_200_OK
+        ratings = RatingExpandedResult(**res.json())
+        assert ratings.total_results == 3
+        assert all(rating.username == user_test_rating.username for rating in ratings.results)
+
+        res = client.get(
+            app.url_path_for("ratings:get-ratings"),
+            params={
+                'expand': 'author'
+            }
+        )
+        assert res.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_get_ratings_expand_movie(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        monkeypatch: pytest.MonkeyPatch
+    ):
+        # The rated movies 1, 2 and 3 are found, invalid (removed) and missing on TMDB
+        async def fetch_tmdb_api(endpoint: str, client_session, params: dict = None) -> tuple:
+            movie_id = int(endpoint.rsplit('/', 1)[1])
+            if movie_id == 1:
+                return (HTTP_200_OK, {
+                    'id': 1, 'title': 'Movie 1', 'original_title': 'Movie 1',
+                    'poster_path': None, 'release_date': '2000-01-01'
+                })
+            if movie_id == 2:
+                return (HTTP_200_OK, {'id': 2, 'adult': True})
+            return (HTTP_404_NOT_FOUND, {'status_message': 'Not found'})
+
+        monkeypatch.setattr(tmdb_api, 'fetch_tmdb_api', fetch_tmdb_api)
+        res = client.get(
+            app.url_path_for("ratings:get-ratings"),
+            params={
+                'expand': 'movie,user'
+            }
+        )
+        assert res.status_code == HTTP_200_OK
+        ratings = RatingExpandedResult(**res.json())
+        assert ratings.total_results == 3
+        movies = {rating.movie_id: rating.movie for rating in ratings.results}
+        assert movies[1].title == 'Movie 1'
+        assert (movies[2], movies[3]) == (None, None)
+        assert all(rating.username is not None for rating in ratings.results)
+
     def test_get_ratings_page2(
         self,
         app: FastAPI,
@@ -296,6 +365,74 @@ class TestRatingsAPI:
         assert ratings.total_pages == 1
         assert ratings.results == []
 
+    async def test_get_ratings_per_user(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_crud: UserCrud,
+        user_test_rating: UserCreate,
+    ):
+        user = await user_crud.get_user_by_username(username=user_test_rating.username)
+        token = get_token(app, client, user=user_test_rating)
+        headers = {
+            'Authorization': f'{token.token_type} {token.access_token}'
+        }
+
+        res = client.get(app.url_path_for("ratings:get-ratings-me"), headers=headers)
+        assert res.status_code == HTTP_200_OK
+        ratings = RatingResult(**res.json())
+        assert ratings.total_results == 3
+        assert all(rating.user_id == user.id for rating in ratings.results)
+        created_ats = [rating.created_at for rating in ratings.results]
+        assert created_ats == sorted(created_ats, reverse=True)
+
+        res = client.get(app.url_path_for("users:get-user-id-ratings", user_id=user.id))
+        assert res.status_code == HTTP_200_OK
+        assert RatingResult(**res.json()) == ratings
+
+        res = client.get(app.url_path_for("users:get-user-id-ratings", user_id=1000000))
+        assert res.status_code == HTTP_404_NOT_FOUND
+
+    def test_export_ratings(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_test_rating: UserCreate,
+    ):
+        token = get_token(app, client, user=user_test_rating)
+        headers = {
+            'Authorization': f'{token.token_type} {token.access_token}'
+        }
+
+        res = client.get(app.url_path_for("ratings:get-ratings-export"), headers=headers)
+        assert res.status_code == HTTP_200_OK
+        assert res.headers['content-encoding'] == 'gzip'
+        ratings = [RatingPublic.parse_raw(line) for line in res.text.splitlines()]
+        assert len(ratings) == 3
+        updated_ats = [rating.updated_at for rating in ratings]
+        assert updated_ats == sorted(updated_ats)
+
+        res = client.get(
+            app.url_path_for("ratings:get-ratings-export"),
+            params={
+                'format': 'csv',
+                'since': updated_ats[-1].isoformat()
+            },
+            headers=headers
+        )
+        assert res.status_code == HTTP_200_OK
+        lines = res.text.splitlines()
+        assert lines[0].split(',') == list(RatingPublic.__fields__)
+        assert len(lines) == 2
+
+        res = client.get(
+            app.url_path_for("ratings:get-ratings-export"),
+            headers={**headers, 'Accept-Encoding': 'gzip;q=0, identity'}
+        )
+        assert res.status_code == HTTP_200_OK
+        assert 'content-encoding' not in res.headers
+        assert len(res.text.splitlines()) == 3
+
     def test_delete_rating(
         self,
         app: FastAPI,
@@ -354,3 +491,50 @@ class TestRatingsAPI:
             headers=headers
         )
         assert res.status_code == HTTP_404_NOT_FOUND
+
+    async def test_get_rating_summaries_per_movies(
+        self,
+        db: Database,
+        user_crud: UserCrud,
+        user_test_rating: UserCreate
+    ):
+        user = await user_crud.get_user_by_username(username=user_test_rating.username)
+        rating_crud = RatingCrud(db)
+
+        summaries = await rating_crud.get_rating_summaries_per_movies(
+            movie_ids=[2, 3, 10000],
+            user_id=user.id
+        )
+        assert set(summaries) == {2, 3}
+        assert summaries[2].rating_count == 1
+        assert summaries[2].user_grade == 10
+        assert summaries[3].avg_rating == 8.0
+
+        summaries = await rating_crud.get_rating_summaries_per_movies(movie_ids=[2])
+        assert summaries[2].rating_count == 1
+        assert summaries[2].user_grade is None
+
+    async def test_movie_rating_rollups(
+        self,
+        db: Database,
+    ):
+        # Movie 1 rating was deleted, and movie 2 rating updated from 9 to 10
+        movie_stats_crud = MovieStatsCrud(db)
+        stats = {
+            movie_stats.movie_id: movie_stats
+            for movie_stats in await movie_stats_crud.get_movie_rating_stats()
+        }
+        assert set(stats) == {2, 3}
+        assert stats[2].rating_count == 1
+        assert stats[2].grade_sum == 10
+
+        weekly_stats = await movie_stats_crud.get_movie_rating_stats(days=7)
+        assert {movie_stats.movie_id for movie_stats in weekly_stats} == {2, 3}
+
+        leaderboard = Leaderboard()
+        await leaderboard.refresh(db)
+        top = leaderboard.get_top(window=LeaderboardWindow.WEEK)
+        assert [entry.movie_id for entry in top] == [2, 3]
+        assert top[0].avg_rating == 10.0
+        assert top[0].score < 10.0
+        assert leaderboard.get_top(window=LeaderboardWindow.ALL, min_votes=2) == []
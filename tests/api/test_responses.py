@@ -0,0 +1,25 @@
+import pytest
+
+from app.api.responses import accepts_encoding
+
+
+class TestAcceptsEncoding:
+
+    @pytest.mark.parametrize('accept_encoding, accepted', [
+        ('gzip', True),
+        ('gzip, deflate, br', True),
+        ('GZIP;Q=0.5', True),
+        ('deflate, gzip;q=0.001', True),
+        ('*', True),
+        ('gzip;q=0', False),
+        ('gzip; q=0.0, identity', False),
+        ('*;q=0', False),
+        # An explicit coding overrides `*`
+        ('*, gzip;q=0', False),
+        ('gzip, *;q=0', True),
+        ('deflate, br', False),
+        ('', False),
+        ('gzip;q=high', False),
+    ])
+    def test_q_values(self, accept_encoding: str, accepted: bool) -> None:
+        assert accepts_encoding(accept_encoding, 'gzip') is accepted
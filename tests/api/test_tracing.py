@@ -0,0 +1,123 @@
+import json
+from pathlib import Path
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK
+
+from app.core.config import settings
+from app.core.tracing import JsonFileSpanExporter, tracer
+from app.proxy import tmdb_api
+
+TRACE_ID = '0af7651916cd43dd8448eb211c80319c'
+PARENT_ID = 'b7ad6b7169203331'
+
+
+@pytest.fixture
+def traces_path(tmp_path: Path) -> Path:
+    return tmp_path / 'traces.jsonl'
+
+
+class FakeResponse:
+    status = HTTP_200_OK
+
+    async def json(self) -> dict:
+        return {'id': 1}
+
+    async def __aenter__(self) -> 'FakeResponse':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+
+class FakeClientSession:
+
+    def __init__(self) -> None:
+        self.headers: list[dict | None] = []
+
+    def get(self, url: str, *, params: dict, headers: dict = None) -> FakeResponse:
+        self.headers.append(headers)
+        return FakeResponse()
+
+
+@pytest.fixture
+def tracing_app(monkeypatch: pytest.MonkeyPatch, traces_path: Path) -> FastAPI:
+    monkeypatch.setattr(settings, 'TRACING_ENABLED', True)
+    monkeypatch.setattr(settings, 'TRACING_EXPORTER', 'file')
+    monkeypatch.setattr(settings, 'TRACING_FILE_PATH', str(traces_path))
+    from app.app import get_application
+    return get_application()
+
+
+class TestTracing:
+
+    def test_request_spans(self, tracing_app: FastAPI, traces_path: Path) -> None:
+        # Spans are flushed to the file on shutdown
+        with TestClient(tracing_app) as client:
+            res = client.get(
+                tracing_app.url_path_for("movies:get-movie-id-similar", movie_id=1),
+                headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'}
+            )
+            assert res.status_code == HTTP_200_OK
+
+        spans = {
+            span['name']: span
+            for span in map(json.loads, traces_path.read_text().splitlines())
+        }
+        request_span = spans['GET /api/v1/movies/{movie_id}/similar']
+        assert request_span['parent_id'] == PARENT_ID
+        assert request_span['attributes']['http.status_code'] == HTTP_200_OK
+
+        assert {'dependencies', 'handler', 'serialize', 'DB GET_SIMILAR_MOVIES_QUERY'} \
+            <= set(spans)
+        assert all(span['trace_id'] == TRACE_ID for span in spans.values())
+        assert spans['DB GET_SIMILAR_MOVIES_QUERY']['parent_id'] == spans['handler']['span_id']
+
+    def test_unsampled_request(self, tracing_app: FastAPI, traces_path: Path) -> None:
+        with TestClient(tracing_app) as client:
+            client.get(
+                tracing_app.url_path_for("movies:get-movie-id-similar", movie_id=1),
+                headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-00'}
+            )
+
+        assert not traces_path.exists()
+
+    def test_untrusted_caller_sampling_is_capped(
+        self, tracing_app: FastAPI, traces_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(settings, 'TRACING_SAMPLE_RATIO', 0.0)
+        with TestClient(tracing_app) as client:
+            client.get(
+                tracing_app.url_path_for("movies:get-movie-id-similar", movie_id=1),
+                headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'}
+            )
+
+        assert not traces_path.exists()
+
+    def test_trusted_caller_sampling_is_kept(
+        self, tracing_app: FastAPI, traces_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(settings, 'TRACING_SAMPLE_RATIO', 0.0)
+        monkeypatch.setattr(settings, 'TRACING_TRUSTED_CALLERS', ['testclient'])
+        with TestClient(tracing_app) as client:
+            client.get(
+                tracing_app.url_path_for("movies:get-movie-id-similar", movie_id=1),
+                headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'}
+            )
+
+        spans = list(map(json.loads, traces_path.read_text().splitlines()))
+        assert spans and all(span['trace_id'] == TRACE_ID for span in spans)
+
+    async def test_trace_is_not_sent_to_tmdb(
+        self, traces_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(tracer, 'exporter', JsonFileSpanExporter(str(traces_path)))
+        monkeypatch.setattr(tracer, '_queue', [])
+        client_session = FakeClientSession()
+
+        with tracer.start_trace('GET /test', traceparent=f'00-{TRACE_ID}-{PARENT_ID}-01'):
+            await tmdb_api.fetch_tmdb_api('/movie/1', client_session, cache=None)
+
+        assert client_session.headers == [None]
+        assert [span.name for span in tracer._queue] == ['TMDB GET /movie/{id}', 'GET /test']
@@ -1,5 +1,8 @@
+from databases import Database
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
+import asyncio
+import logging
 import pytest
 from starlette.status import (
     HTTP_404_NOT_FOUND,
@@ -10,28 +13,11 @@ from starlette.status import (
 )
 
 from app.crud.users import UserCrud
-from app.schemas.user import UserCreate, UserInDB, UserPublic
+from app.db.invalidation import InvalidationBus
+from app.schemas.user import UserCreate, UserInDB, UserPublic, UserResult, UserUpdate
 from app.schemas.token import AccessToken
 
-from tests.api.core import get_token
-
-
-async def get_or_create_user(
-    user_crud_: UserCrud, *, user_c: UserCreate, is_superuser: bool = False
-) -> UserPublic:
-    user = await user_crud_.get_user_by_email(email=user_c.email)
-
-    if user is None:
-        new_user = UserCreate(
-            email=user_c.email, username=user_c.username, password=user_c.password
-        )
-        user = await user_crud_.create_new_user(
-            new_user=new_user, is_superuser=is_superuser
-        )
-        assert user.id is not None
-
-    assert user.id is not None
-    return user
+from tests.api.core import get_or_create_user, get_token
 
 
 class TestUsersAPIRoutes:
@@ -210,6 +196,32 @@ class TestUsersAPILogin:
         assert user_test_login.username == user_me.username
         assert user_test_login.email == user_me.email
 
+    async def test_token_logs_no_secrets(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_test_login: UserCreate,
+        user_crud: UserCrud,
+        caplog
+    ):
+        user = await user_crud.get_user_by_username(username=user_test_login.username)
+        # The app loggers don't propagate to the root one while the log pipeline runs
+        logger = logging.getLogger('app')
+        logger.addHandler(caplog.handler)
+        caplog.set_level(logging.DEBUG, logger='app')
+        try:
+            res = client.post(
+                app.url_path_for("tokens:post-token"),
+                data={'username': user_test_login.username, 'password': user_test_login.password}
+            )
+        finally:
+            logger.removeHandler(caplog.handler)
+        assert res.status_code == HTTP_201_CREATED
+
+        assert f'Authenticated user {user.id} "{user.username}"' in caplog.messages
+        for secret in (user.password, user.salt, user_test_login.password):
+            assert secret not in caplog.text
+
     def test_token_not_existing_user(
         self,
         app: FastAPI,
@@ -299,6 +311,10 @@ class TestUsersAdminAPILogin:
         )
         assert res.status_code == HTTP_200_OK
 
+        users = UserResult(**res.json())
+        assert users.results
+        assert all('password' not in user and 'salt' not in user for user in res.json()['results'])
+
 
 @pytest.fixture
 def user_test_modify():
@@ -327,6 +343,24 @@ def admin_test_modify():
     )
 
 
+@pytest.fixture
+def user_test_revoke():
+    return UserCreate(
+        email='paul.doe@mail.com',
+        username='paul_doe',
+        password='password'
+    )
+
+
+@pytest.fixture
+def user_test_notify():
+    return UserCreate(
+        email='nina.doe@mail.com',
+        username='nina_doe',
+        password='password'
+    )
+
+
 class TestUsersAPIModify:
 
     async def test_modify_user_without_token(
@@ -435,6 +469,64 @@ class TestUsersAPIModify:
         assert user_mod_1.username == 'username_mod_by_admin'
         assert user_mod_1.email == 'email_mod_by_admin@mail.com'
 
+    async def test_modified_user_token_is_revoked(
+        self,
+        app: FastAPI,
+        client: TestClient,
+        user_crud: UserCrud,
+        user_test_revoke: UserCreate
+    ):
+        user = await get_or_create_user(
+            user_crud, user_c=user_test_revoke, is_superuser=False
+        )
+        token = get_token(app, client, user=user_test_revoke)
+
+        headers = {
+            'Authorization': f'{token.token_type} {token.access_token}'
+        }
+        res = client.get(
+            app.url_path_for("ratings:get-rating-movie-id-me", movie_id=1),
+            headers=headers
+        )
+        assert res.status_code == HTTP_404_NOT_FOUND
+
+        res = client.put(
+            app.url_path_for("users:put-user-id", user_id=user.id),
+            headers=headers,
+            json={
+                'username': 'revoked_username', 'email': 'revoked_email@mail.com'
+            }
+        )
+        assert res.status_code == HTTP_200_OK
+
+        res = client.get(
+            app.url_path_for("ratings:get-rating-movie-id-me", movie_id=1),
+            headers=headers
+        )
+        assert res.status_code == HTTP_401_UNAUTHORIZED
+
+    async def test_user_write_is_notified_to_other_workers(
+        self,
+        db: Database,
+        user_crud: UserCrud,
+        user_test_notify: UserCreate
+    ):
+        user = await get_or_create_user(user_crud, user_c=user_test_notify)
+        bus = InvalidationBus()
+        evicted = asyncio.Queue()
+        bus.subscribe('user', evict=evicted.put_nowait, reset=lambda: None)
+        bus.start(str(db.url))
+        try:
+            await asyncio.wait_for(bus.listening.wait(), timeout=5)
+
+            await user_crud.update_user(
+                user_id=user.id,
+                user_to_update=UserUpdate(username='notified_username', email=user.email)
+            )
+            assert await asyncio.wait_for(evicted.get(), timeout=5) == str(user.id)
+        finally:
+            await bus.stop()
+
 
 @pytest.fixture
 def user_test_delete():
@@ -0,0 +1,16 @@
+from app.benchmarks.suite import build_benchmarks, time_benchmark
+
+
+class TestBenchmarkSuite:
+
+    def test_benchmarks_run(self) -> None:
+        for (name, call) in build_benchmarks().items():
+            assert call() is not None, name
+
+    def test_time_benchmark(self) -> None:
+        result = time_benchmark(lambda: None, repeat=1, min_time=1e-6)
+
+        assert result['loops'] >= 1
+        assert result['repeat'] == 1
+        assert 0 < result['min_us'] == result['median_us']
+        assert result['stdev_us'] == 0.0
@@ -0,0 +1,166 @@
+import asyncio
+import fakeredis
+import pytest
+from fakeredis import aioredis
+from prometheus_client import REGISTRY
+
+from app.core.cache import (
+    Cache,
+    CacheBackend,
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    SQLiteCacheBackend,
+)
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def backend(request, tmp_path) -> CacheBackend:
+    if request.param == 'redis':
+        return RedisCacheBackend(client=aioredis.FakeRedis(), max_bytes=1000)
+    if request.param == 'sqlite':
+        return SQLiteCacheBackend(path=str(tmp_path / 'cache.db'), max_bytes=1000)
+    return MemoryCacheBackend(max_bytes=1000)
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def broken_backend(request, tmp_path) -> CacheBackend:
+    if request.param == 'redis':
+        server = fakeredis.FakeServer()
+        server.connected = False
+        return RedisCacheBackend(client=aioredis.FakeRedis(server=server), max_bytes=1000)
+    # The file can't be created
+    return SQLiteCacheBackend(path=str(tmp_path / 'missing' / 'cache.db'), max_bytes=1000)
+
+
+class TestCacheBackends:
+
+    async def test_get_set_delete(self, backend: CacheBackend) -> None:
+        await backend.set('a', b'1', ttl=60)
+        await backend.set('b', b'2', ttl=60)
+        assert await backend.get('a') == b'1'
+        assert await backend.get_many(['a', 'b', 'c']) == {'a': b'1', 'b': b'2'}
+
+        await backend.delete('a')
+        assert await backend.get('a') is None
+
+    async def test_ttl(self, backend: CacheBackend) -> None:
+        await backend.set('a', b'1', ttl=0.05)
+        assert await backend.get('a') == b'1'
+
+        await asyncio.sleep(0.1)
+        assert await backend.get('a') is None
+
+    async def test_clear_prefix(self, backend: CacheBackend) -> None:
+        await backend.set('tmdb:1', b'1', ttl=60)
+        await backend.set('tmdb:2', b'2', ttl=60)
+        await backend.set('users:1', b'3', ttl=60)
+
+        await backend.clear('tmdb:')
+        assert await backend.get_many(['tmdb:1', 'tmdb:2', 'users:1']) == {'users:1': b'3'}
+
+    async def test_errors_are_misses(self, broken_backend: CacheBackend) -> None:
+        def errors(operation: str) -> float:
+            return REGISTRY.get_sample_value(
+                'cache_errors_total', {'backend': broken_backend.NAME, 'operation': operation}
+            ) or 0
+
+        operations = ('get_many', 'set', 'delete', 'clear', 'size_bytes')
+        before = {operation: errors(operation) for operation in operations}
+
+        await broken_backend.set('a', b'1', ttl=60)
+        assert await broken_backend.get_many(['a']) == {}
+        await broken_backend.delete('a')
+        await broken_backend.clear('a')
+        assert await broken_backend.size_bytes() == 0
+
+        assert {operation: errors(operation) - before[operation] for operation in operations} \
+            == dict.fromkeys(operations, 1)
+
+
+class TestMemoryCacheBackend:
+
+    async def test_lru_eviction(self) -> None:
+        backend = MemoryCacheBackend(max_bytes=30)
+        await backend.set('a', b'a' * 10, ttl=60)
+        await backend.set('b', b'b' * 10, ttl=60)
+        await backend.set('c', b'c' * 10, ttl=60)
+        # `a` becomes the most recently used entry
+        await backend.get('a')
+
+        await backend.set('d', b'd' * 10, ttl=60)
+        assert set(await backend.get_many(['a', 'b', 'c', 'd'])) == {'a', 'c', 'd'}
+        assert await backend.size_bytes() == 30
+
+    async def test_value_over_budget(self) -> None:
+        backend = MemoryCacheBackend(max_bytes=10)
+        await backend.set('a', b'a' * 11, ttl=60)
+        assert await backend.get('a') is None
+        assert await backend.size_bytes() == 0
+
+
+class TestSQLiteCacheBackend:
+
+    async def test_lru_eviction(self, tmp_path) -> None:
+        backend = SQLiteCacheBackend(path=str(tmp_path / 'cache.db'), max_bytes=30)
+        # Enforce the budget on each write, and record each access
+        backend.EVICT_EVERY = 1
+        backend.ACCESS_RESOLUTION_SECONDS = 0
+        await backend.set('a', b'a' * 10, ttl=60)
+        await backend.set('b', b'b' * 10, ttl=60)
+        await backend.set('c', b'c' * 10, ttl=60)
+        # `a` becomes the most recently used entry
+        await backend.get('a')
+
+        await backend.set('d', b'd' * 10, ttl=60)
+        assert set(await backend.get_many(['a', 'b', 'c', 'd'])) == {'a', 'c', 'd'}
+        assert await backend.size_bytes() == 30
+        await backend.close()
+
+    async def test_recent_hits_are_read_only(self, tmp_path) -> None:
+        backend = SQLiteCacheBackend(path=str(tmp_path / 'cache.db'), max_bytes=1000)
+        await backend.set('a', b'1', ttl=60)
+        [(accessed_at,)] = backend._run('SELECT accessed_at FROM entries')
+
+        assert await backend.get('a') == b'1'
+        assert backend._run('SELECT accessed_at FROM entries') == [(accessed_at,)]
+        await backend.close()
+
+    async def test_shared_file(self, tmp_path) -> None:
+        path = str(tmp_path / 'cache.db')
+        (first, second) = (
+            SQLiteCacheBackend(path=path, max_bytes=1000),
+            SQLiteCacheBackend(path=path, max_bytes=1000),
+        )
+        await first.set('a', b'1', ttl=60)
+        assert await second.get('a') == b'1'
+
+        await second.set('a', b'2', ttl=60)
+        await second.clear('a')
+        assert await first.get('a') is None
+        assert await first.size_bytes() == await second.size_bytes() == 0
+        await first.close()
+        await second.close()
+
+
+class TestCache:
+
+    async def test_namespaces(self, backend: CacheBackend) -> None:
+        tmdb_cache = Cache(backend, namespace='tmdb', ttl=60)
+        users_cache = Cache(backend, namespace='users', ttl=60)
+        await tmdb_cache.set(1, {'title': 'Heat'})
+        await users_cache.set(1, None)
+
+        assert await tmdb_cache.get(1) == {'title': 'Heat'}
+        # A cached None is told apart from a miss
+        assert await users_cache.get_many([1, 2]) == {1: None}
+
+        await tmdb_cache.clear()
+        assert await tmdb_cache.get(1) is None
+        assert await users_cache.get_many([1]) == {1: None}
+
+    async def test_hits_and_misses(self, backend: CacheBackend) -> None:
+        cache = Cache(backend, namespace='tmdb', ttl=60)
+        await cache.set('a', [1, 2])
+        await cache.get_many(['a', 'b', 'c'])
+
+        assert (cache.hits, cache.misses) == (1, 2)
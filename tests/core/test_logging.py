@@ -0,0 +1,59 @@
+import json
+import logging
+import queue
+
+from app.core.logging import (
+    APP_LOGGER,
+    JsonFormatter,
+    LogPipeline,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+)
+
+
+def make_record(name: str, level: int, msg: str, *args, **extra) -> logging.LogRecord:
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestLogging:
+
+    def test_json_formatter(self) -> None:
+        record = make_record('app.crud.ratings', logging.INFO, 'rating %s', 42, movie_id=949)
+        log = json.loads(JsonFormatter().format(record))
+
+        assert log['level'] == 'INFO'
+        assert log['logger'] == 'app.crud.ratings'
+        assert log['message'] == 'rating 42'
+        assert log['movie_id'] == 949
+
+    def test_sampling_by_longest_prefix(self) -> None:
+        sampling = SamplingFilter({'app.crud': 0.0, 'app.crud.users': 1.0})
+
+        assert not sampling.filter(make_record('app.crud.ratings', logging.DEBUG, 'x'))
+        assert sampling.filter(make_record('app.crud.users', logging.DEBUG, 'x'))
+        assert sampling.filter(make_record('app.crud.ratings', logging.WARNING, 'x'))
+        assert sampling.filter(make_record('app.api', logging.DEBUG, 'x'))
+
+    def test_queue_handler_never_blocks(self) -> None:
+        handler = NonBlockingQueueHandler(queue.Queue(1))
+        handler.handle(make_record('app', logging.INFO, 'first %s', [1, 2]))
+        handler.handle(make_record('app', logging.INFO, 'second'))
+
+        record = handler.queue.get_nowait()
+        assert (record.msg, record.args) == ('first [1, 2]', None)
+        assert handler.dropped == 1
+
+    def test_pipeline_restarts_after_a_stop(self) -> None:
+        ''' Like the startup and shutdown handlers of successive lifespans '''
+        logger = logging.getLogger(APP_LOGGER)
+        pipeline = LogPipeline()
+        for _ in range(2):
+            pipeline.start()
+            assert pipeline.handler in logger.handlers
+            assert not logger.propagate
+
+            pipeline.stop()
+            assert pipeline.handler not in logger.handlers
+            assert logger.propagate
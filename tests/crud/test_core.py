@@ -0,0 +1,86 @@
+from datetime import date
+import pytest
+
+from app.core.config import settings
+from app.crud.core import to_positional
+from app.crud.movies import GET_MOVIES_BY_IDS_QUERY, MovieCrud
+from app.db.deps import RequestConnection
+
+MOVIE_RECORDS = [
+    {
+        'id': 1, 'title': 'Title', 'original_title': 'Titre',
+        'poster_path': '/poster.jpg', 'release_date': date(2000, 1, 1)
+    },
+    {
+        'id': 2, 'title': 'Other', 'original_title': 'Other',
+        'poster_path': None, 'release_date': None
+    },
+]
+
+
+class FakeConnection(RequestConnection):
+    """
+    Request connection answering every query with the same records
+    """
+
+    def __init__(self, records: list[dict]) -> None:
+        super().__init__(session=None)
+        self.records = records
+        self.calls: list[tuple] = []
+
+    async def fetch_all(self, query: str, values: dict = None) -> list[dict]:
+        self.calls.append(('fetch_all', query, values))
+        return self.records
+
+    async def fetch_prepared(self, query: str, *args) -> list[dict]:
+        self.calls.append(('fetch_prepared', query, args))
+        return self.records
+
+
+class TestToPositional:
+
+    def test_params_are_numbered_in_order(self) -> None:
+        assert to_positional('SELECT * FROM t WHERE a = :a AND b = :b') \
+            == ('SELECT * FROM t WHERE a = $1 AND b = $2', ('a', 'b'))
+
+    def test_repeated_params(self) -> None:
+        assert to_positional('SELECT :a, :b WHERE x = :a OR y = :b OR z = :a') \
+            == ('SELECT $1, $2 WHERE x = $1 OR y = $2 OR z = $1', ('a', 'b'))
+
+    def test_casts_are_not_params(self) -> None:
+        assert to_positional('SELECT CAST(:ids AS INTEGER[]), :day::DATE, created_at::date') \
+            == ('SELECT CAST($1 AS INTEGER[]), $2::DATE, created_at::date', ('ids', 'day'))
+
+    def test_no_params(self) -> None:
+        assert to_positional('SELECT 1') == ('SELECT 1', ())
+
+
+class TestPreparedQueries:
+
+    @pytest.mark.parametrize('prepared', [True, False])
+    async def test_prepared_and_validated_results_match(self, monkeypatch, prepared) -> None:
+        monkeypatch.setattr(settings, 'DB_PREPARED_STATEMENTS', prepared)
+        connection = FakeConnection(MOVIE_RECORDS)
+
+        movies = await MovieCrud(connection).get_movie_summaries_per_ids(movie_ids=[1, 2])
+
+        [(method, query, values)] = connection.calls
+        if prepared:
+            assert (method, query) == ('fetch_prepared', to_positional(GET_MOVIES_BY_IDS_QUERY)[0])
+            assert values == ([1, 2],)
+        else:
+            assert (method, query, values) \
+                == ('fetch_all', GET_MOVIES_BY_IDS_QUERY, {'ids': [1, 2]})
+        assert {movie_id: movie.dict() for (movie_id, movie) in movies.items()} \
+            == {record['id']: record for record in MOVIE_RECORDS}
+
+    async def test_constructed_models_equal_the_validated_ones(self, monkeypatch) -> None:
+        results = {}
+        for prepared in (True, False):
+            monkeypatch.setattr(settings, 'DB_PREPARED_STATEMENTS', prepared)
+            results[prepared] = await MovieCrud(FakeConnection(MOVIE_RECORDS)) \
+                .get_movie_summaries_per_ids(movie_ids=[1, 2])
+
+        assert results[True] == results[False]
+        assert [type(movie) for movie in results[True].values()] \
+            == [type(movie) for movie in results[False].values()]
@@ -0,0 +1,192 @@
+from datetime import date, timedelta
+from typing import Any, Iterator
+import asyncio
+import importlib
+import json
+import pkgutil
+import re
+import asyncpg
+import numpy as np
+import pytest
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+import app.crud
+from app.crud.core import QUERY_NAMES, to_positional
+from app.db.deps import DBSession
+from app.services.dataset import DEFAULT_UNTIL, DatasetSpec, load_dataset
+
+# Every CRUD module, so that new queries are held to the same bar without listing them here
+CRUD_MODULES = [
+    importlib.import_module(f'{app.crud.__name__}.{module.name}')
+    for module in pkgutil.iter_modules(app.crud.__path__)
+]
+
+QUERIES = {name: query for (query, name) in QUERY_NAMES.items()}
+SQL_STATEMENT_REGEX = re.compile(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+
+DATASET_USERS = 50_000
+DATASET_RATINGS_PER_USER = 20
+DATASET_MOVIES = 20_000
+
+# Tables too large to be read entirely by a request
+INDEXED_TABLES = {'ratings', 'users'}
+# Planner cost units, see `EXPLAIN`
+DEFAULT_COST_BUDGET = 5_000
+COST_BUDGETS = {
+    # A page of movies, each with hundreds of ratings
+    'GET_RATING_SUMMARIES_BY_MOVIES_QUERY': 50_000,
+}
+# Reading every row is their purpose
+FULL_SCAN_QUERIES = {
+    'COUNT_RATINGS_QUERY',
+    'COUNT_USERS_QUERY',
+    'GET_RATING_GRADES_QUERY',
+}
+
+# An active user and popular movies, but not the extreme ones of the dataset
+ACTIVE_USER_QUERY = '''
+    SELECT user_id
+    FROM ratings
+    GROUP BY user_id
+    ORDER BY COUNT(*) DESC, user_id
+    OFFSET 99 LIMIT 1
+'''
+POPULAR_MOVIES_QUERY = '''
+    SELECT movie_id
+    FROM ratings
+    GROUP BY movie_id
+    ORDER BY COUNT(*) DESC, movie_id
+    OFFSET 100 LIMIT 20
+'''
+
+
+@pytest.fixture(scope='module')
+def event_loop() -> Iterator[asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope='module')
+async def seeded_db() -> asyncpg.Connection:
+    ''' Connection to the test database loaded with a large dataset, rolled back afterwards '''
+    connection = await asyncpg.connect(DBSession().DB_URL)
+    transaction = connection.transaction()
+    await transaction.start()
+    spec = DatasetSpec(
+        users=DATASET_USERS,
+        ratings_per_user=DATASET_RATINGS_PER_USER,
+        movie_ids=np.arange(1, DATASET_MOVIES + 1)
+    )
+    head = ScriptDirectory.from_config(Config('alembic.ini')).get_current_head()
+    await load_dataset(connection, spec, schema_version=head)
+
+    yield connection
+
+    await transaction.rollback()
+    await connection.close()
+
+
+@pytest.fixture(scope='module')
+async def plan_values(seeded_db: asyncpg.Connection) -> dict[str, Any]:
+    ''' A representative value of each query parameter, by name '''
+    user_id = await seeded_db.fetchval(ACTIVE_USER_QUERY)
+    user = await seeded_db.fetchrow('SELECT username, email FROM users WHERE id = $1', user_id)
+    movie_ids = [row['movie_id'] for row in await seeded_db.fetch(POPULAR_MOVIES_QUERY)]
+    # The ratings of the last day, like an incremental export
+    since = DEFAULT_UNTIL - timedelta(days=1)
+
+    return {
+        'id': user_id,
+        'user_id': user_id,
+        'username': user['username'],
+        'email': user['email'],
+        'password': 'password',
+        'salt': 'salt',
+        'is_superuser': False,
+        'movie_id': movie_ids[0],
+        'movie_ids': movie_ids,
+        'grade': 7,
+        'limit': 20,
+        'offset': 0,
+        'since': since,
+        'days': 7,
+        'max_age_seconds': 24 * 3600,
+        'name': 'movie_similarities',
+        'built_at': since,
+        'similar_movie_ids': movie_ids[::-1],
+        'similarities': [0.5] * len(movie_ids),
+        'ids': movie_ids,
+        'titles': ['Title'] * len(movie_ids),
+        'original_titles': ['Title'] * len(movie_ids),
+        'poster_paths': [None] * len(movie_ids),
+        'release_dates': [date(2000, 1, 1)] * len(movie_ids),
+    }
+
+
+def is_full_scan(node: dict) -> bool:
+    return node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in INDEXED_TABLES
+
+
+def iter_nodes(node: dict, depth: int = 0) -> Iterator[tuple[dict, int]]:
+    yield (node, depth)
+    for child in node.get('Plans', []):
+        yield from iter_nodes(child, depth + 1)
+
+
+def format_plan(plan: dict) -> str:
+    ''' The plan tree, with `-` before the nodes over the bar and `+` before the others '''
+    lines = []
+    for (node, depth) in iter_nodes(plan):
+        relation = f' on {node["Relation Name"]}' if 'Relation Name' in node else ''
+        index = f' using {node["Index Name"]}' if 'Index Name' in node else ''
+        filters = ' '.join(
+            f'{key}: {node[key]}' for key in ('Index Cond', 'Filter', 'Sort Key') if key in node
+        )
+        lines.append(
+            f'{"-" if is_full_scan(node) else "+"} {"  " * depth}{node["Node Type"]}'
+            f'{relation}{index} (cost={node["Startup Cost"]}..{node["Total Cost"]} '
+            f'rows={node["Plan Rows"]}) {filters}'.rstrip()
+        )
+    return '\n'.join(lines)
+
+
+class TestQueryPlans:
+
+    def test_every_query_is_checked(self) -> None:
+        ''' A SQL constant not named `*_QUERY` would escape the plans below '''
+        constants = {
+            f'{module.__name__}.{name}': value
+            for module in CRUD_MODULES
+            for (name, value) in vars(module).items()
+            if name.isupper() and isinstance(value, str) and SQL_STATEMENT_REGEX.match(value)
+        }
+        unchecked = sorted(name for (name, value) in constants.items() if value not in QUERY_NAMES)
+        assert not unchecked, f'{unchecked} are not in QUERIES, rename them `*_QUERY`'
+
+    @pytest.mark.parametrize('name', sorted(QUERIES))
+    async def test_query_is_index_backed(
+        self, seeded_db: asyncpg.Connection, plan_values: dict[str, Any], name: str
+    ) -> None:
+        (positional_query, params) = to_positional(QUERIES[name])
+        missing = [param for param in params if param not in plan_values]
+        assert not missing, f'No representative value of {missing} in plan_values for {name}'
+
+        # Not ANALYZE: the writes are planned, never run
+        result = await seeded_db.fetchval(
+            f'EXPLAIN (FORMAT JSON) {positional_query}',
+            *(plan_values[param] for param in params)
+        )
+        plan = json.loads(result)[0]['Plan']
+        if name in FULL_SCAN_QUERIES:
+            return None
+
+        full_scans = [node for (node, _) in iter_nodes(plan) if is_full_scan(node)]
+        assert not full_scans, \
+            f'{name} reads all of {sorted({node["Relation Name"] for node in full_scans})}:' \
+            f'\n{format_plan(plan)}'
+
+        budget = COST_BUDGETS.get(name, DEFAULT_COST_BUDGET)
+        assert plan['Total Cost'] <= budget, \
+            f'{name} costs {plan["Total Cost"]}, over its budget of {budget}:\n{format_plan(plan)}'
@@ -0,0 +1,57 @@
+from typing import AsyncIterator, Mapping
+import asyncio
+
+from app.db.deps import RequestConnection
+
+
+class FakeConnection:
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    async def fetch_all(self, query: str, values: dict = None) -> list[Mapping]:
+        return [{'connection': self.name}]
+
+    async def iterate(self, query: str, values: dict = None) -> AsyncIterator[Mapping]:
+        for index in range(3):
+            yield {'connection': self.name, 'index': index}
+
+
+class FakeSession:
+    """
+    Hands out numbered connections, and tracks the ones checked out
+    """
+
+    def __init__(self) -> None:
+        self.acquired = 0
+        self.in_use: set[str] = set()
+
+    async def acquire(self) -> FakeConnection:
+        self.acquired += 1
+        connection = FakeConnection(f'connection {self.acquired}')
+        self.in_use.add(connection.name)
+        return connection
+
+    async def release(self, connection: FakeConnection) -> None:
+        self.in_use.remove(connection.name)
+
+
+class TestRequestConnection:
+
+    async def test_queries_run_while_a_stream_is_consumed(self) -> None:
+        session = FakeSession()
+        request_connection = RequestConnection(session)
+
+        stream = request_connection.iterate('SELECT stream')
+        first = await stream.__anext__()
+        # Would wait forever if the stream held the request connection
+        [record] = await asyncio.wait_for(request_connection.fetch_all('SELECT 1'), timeout=1)
+        rest = [record async for record in stream]
+
+        assert first['connection'] != record['connection']
+        assert [row['index'] for row in (first, *rest)] == [0, 1, 2]
+        # The stream's connection is released once exhausted, not the request's
+        assert session.in_use == {record['connection']}
+
+        await request_connection.release()
+        assert session.in_use == set()
@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+import asyncio
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.proxy import tmdb_api
+from app.schemas.movie import MovieSummary
+from app.services.composition import Source, attach_movie_summaries, gather_with_deadlines
+
+
+async def value_after(delay: float, value: object, events: list[str], name: str) -> object:
+    try:
+        await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        events.append(f'{name} cancelled')
+        raise
+    events.append(f'{name} done')
+    return value
+
+
+async def fail_after(delay: float, error: Exception = None) -> None:
+    await asyncio.sleep(delay)
+    raise error or ValueError('source failed')
+
+
+def movie_summary(movie_id: int) -> MovieSummary:
+    return MovieSummary(
+        id=movie_id, title=f'Title {movie_id}', original_title=f'Title {movie_id}',
+        poster_path=None, release_date=None
+    )
+
+
+class FakeMovieCrud:
+
+    def __init__(self, movies: dict[int, MovieSummary]) -> None:
+        self.movies = movies
+        self.upserted: list[MovieSummary] = []
+
+    async def get_movie_summaries_per_ids(self, *, movie_ids: list[int]) -> dict:
+        return {
+            movie_id: self.movies[movie_id] for movie_id in movie_ids if movie_id in self.movies
+        }
+
+    async def upsert_movie_summaries(self, *, movies: list[MovieSummary]) -> None:
+        self.upserted.extend(movies)
+
+
+class TestGatherWithDeadlines:
+
+    async def test_late_sources_are_cancelled_and_unavailable(self) -> None:
+        events = []
+        start = asyncio.get_running_loop().time()
+        sources = await gather_with_deadlines(
+            fast=Source(value_after(0.01, 'fast', events, 'fast'), deadline=0.2),
+            slow=Source(value_after(1.0, 'slow', events, 'slow'), deadline=0.05),
+        )
+
+        assert (sources['fast'].available, sources['fast'].value) == (True, 'fast')
+        assert (sources['slow'].available, sources['slow'].value) == (False, None)
+        assert events == ['fast done', 'slow cancelled']
+        # The slow source didn't hold the others past its deadline
+        assert asyncio.get_running_loop().time() - start < 0.5
+
+    async def test_required_errors_are_raised_once_all_sources_are_done(self) -> None:
+        events = []
+        with pytest.raises(ValueError, match='source failed'):
+            await gather_with_deadlines(
+                failing=Source(fail_after(0.01), deadline=0.2, required=True),
+                other=Source(value_after(0.05, 'other', events, 'other'), deadline=0.2),
+            )
+        assert events == ['other done']
+
+    async def test_optional_errors_are_unavailable(self) -> None:
+        events = []
+        sources = await gather_with_deadlines(
+            required=Source(
+                value_after(0.01, 'value', events, 'required'), deadline=0.2, required=True
+            ),
+            failing=Source(fail_after(0.01), deadline=0.2),
+            # Like an exhausted DB pool
+            busy=Source(fail_after(0.01, HTTPException(503, 'busy')), deadline=0.2),
+        )
+
+        assert (sources['required'].available, sources['required'].value) == (True, 'value')
+        assert (sources['failing'].available, sources['failing'].value) == (False, None)
+        assert (sources['busy'].available, sources['busy'].value) == (False, None)
+
+
+class TestAttachMovieSummaries:
+
+    async def test_missing_movies_are_fetched_within_the_deadline(self, monkeypatch) -> None:
+        events = []
+
+        async def fetch_tmdb_api(endpoint: str, client_session: object) -> tuple[int, dict]:
+            movie_id = int(endpoint.rsplit('/', 1)[1])
+            if movie_id == 3:
+                await value_after(1.0, None, events, 'movie 3')
+            if movie_id == 4:
+                return (404, {'status_message': 'Not found'})
+            if movie_id == 5:
+                return (200, {'id': 5, 'adult': True})
+            return (200, movie_summary(movie_id).dict())
+
+        monkeypatch.setattr(tmdb_api, 'fetch_tmdb_api', fetch_tmdb_api)
+        monkeypatch.setattr(settings, 'TMDB_API_DEADLINE_SECONDS', 0.05)
+        movie_crud = FakeMovieCrud({1: movie_summary(1)})
+        ratings = [
+            SimpleNamespace(movie_id=movie_id, movie=None) for movie_id in (1, 2, 3, 4, 5, 2)
+        ]
+
+        await attach_movie_summaries(ratings, movie_crud=movie_crud, client_session=None)
+
+        # Late, missing and invalid movies are left out
+        assert [rating.movie for rating in ratings] == [
+            movie_summary(1), movie_summary(2), None, None, None, movie_summary(2)
+        ]
+        # Only the movie found in time is added to the catalog
+        assert movie_crud.upserted == [movie_summary(2)]
+        assert events == ['movie 3 cancelled']
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from app.services.dataset import DatasetSpec, generate_chunks
+
+
+@pytest.fixture
+def spec() -> DatasetSpec:
+    return DatasetSpec(users=12_000, ratings_per_user=10, movie_ids=np.arange(1, 2001), seed=7)
+
+
+class TestDatasetGenerator:
+
+    def test_same_seed_same_rows(self, spec: DatasetSpec) -> None:
+        first = list(generate_chunks(spec, first_id=1, salt='salt', password='password'))
+        second = list(generate_chunks(spec, first_id=1, salt='salt', password='password'))
+        assert first == second
+
+        spec.seed = 8
+        third = list(generate_chunks(spec, first_id=1, salt='salt', password='password'))
+        assert third[0][1] != first[0][1]
+
+    def test_rows_fit_the_schema(self, spec: DatasetSpec) -> None:
+        chunks = list(generate_chunks(spec, first_id=101, salt='salt', password='password'))
+        users = [user for (user_rows, _) in chunks for user in user_rows]
+        ratings = [rating for (_, rating_rows) in chunks for rating in rating_rows]
+
+        assert [user[0] for user in users] == list(range(101, 12_101))
+        assert len({user[1] for user in users}) == len({user[2] for user in users}) == 12_000
+        # One rating per user and movie, of a known user and movie, after the user signed up
+        assert len({(rating[0], rating[1]) for rating in ratings}) == len(ratings)
+        signups = {user[0]: user[8] for user in users}
+        assert all(
+            rating[1] in signups and rating[3] >= signups[rating[1]] for rating in ratings
+        )
+        assert all(1 <= rating[0] <= 2000 and 0 <= rating[2] <= 10 for rating in ratings)
+
+    def test_popularity_is_skewed(self, spec: DatasetSpec) -> None:
+        ratings = [
+            rating
+            for (_, rating_rows) in generate_chunks(spec, first_id=1, salt='s', password='p')
+            for rating in rating_rows
+        ]
+        per_movie = np.sort(np.bincount([rating[0] for rating in ratings]))[::-1]
+        per_user = np.sort(np.bincount([rating[1] for rating in ratings]))[::-1]
+
+        # The most popular movie and the most active user weigh far above the median
+        assert per_movie[0] > 20 * np.median(per_movie[per_movie > 0])
+        assert per_user[0] > 20 * np.median(per_user[per_user > 0])
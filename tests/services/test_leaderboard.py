@@ -0,0 +1,23 @@
+from app.schemas.leaderboard import LeaderboardSort, LeaderboardWindow, MovieRatingStats
+from app.services.leaderboard import Leaderboard, rank_movies
+
+
+class TestLeaderboard:
+
+    def test_min_votes_keeps_movies_ranked_low_by_average(self) -> None:
+        # 1000 movies graded 10 once, ranked above 5 movies graded 6 a hundred times
+        stats = [
+            MovieRatingStats(movie_id=movie_id, rating_count=1, grade_sum=10)
+            for movie_id in range(1, 1001)
+        ] + [
+            MovieRatingStats(movie_id=movie_id, rating_count=100, grade_sum=600)
+            for movie_id in range(1001, 1006)
+        ]
+        leaderboard = Leaderboard()
+        leaderboard._rankings[LeaderboardWindow.ALL] = rank_movies(stats, prior_votes=10)
+
+        for sort in LeaderboardSort:
+            top = leaderboard.get_top(
+                window=LeaderboardWindow.ALL, sort=sort, min_votes=50, limit=20
+            )
+            assert [entry.movie_id for entry in top] == list(range(1001, 1006))
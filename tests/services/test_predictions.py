@@ -0,0 +1,150 @@
+from datetime import datetime
+import tracemalloc
+import numpy as np
+import pytest
+
+from app.services import predictions
+from app.services.predictions import (
+    FactorModel,
+    _indptr,
+    _solve_least_squares,
+    load_factor_model,
+    save_factor_model,
+    train_factor_model,
+)
+
+
+@pytest.fixture
+def grades() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ''' 40 users having rated 3/4 of 30 movies, from rank 2 tastes '''
+    rng = np.random.default_rng(0)
+    (user_factors, movie_factors) = (rng.normal(0, 1, (40, 2)), rng.normal(0, 1, (30, 2)))
+    (users, movies) = np.nonzero(rng.random((40, 30)) < 0.75)
+    values = np.clip(
+        np.rint(5 + np.einsum('ij,ij->i', user_factors[users], movie_factors[movies])), 0, 10
+    )
+
+    return (users + 100, movies + 1000, values)
+
+
+def make_model(global_mean: float = 5.0) -> FactorModel:
+    return FactorModel(
+        global_mean=global_mean,
+        user_ids=np.array([1, 2]),
+        user_factors=np.array([[1.0, 0.0, 1.0], [-1.0, 0.0, 1.0]], dtype=np.float32),
+        movie_ids=np.array([10, 20]),
+        movie_factors=np.array([[10.0, 1.0, 0.0], [0.5, 1.0, 0.0]], dtype=np.float32),
+    )
+
+
+class TestFactorModel:
+
+    def test_train_fits_the_grades(self, grades) -> None:
+        (user_ids, movie_ids, values) = grades
+        model = train_factor_model(
+            user_ids, movie_ids, values, factors=2, iterations=10, regularization=0.01
+        )
+        assert model.user_ids.tolist() == sorted(set(user_ids.tolist()))
+        assert model.movie_ids.tolist() == sorted(set(movie_ids.tolist()))
+        assert model.user_factors.shape == (len(model.user_ids), 4)
+        assert model.movie_factors.shape == (len(model.movie_ids), 4)
+
+        errors = [
+            model.predict(user_id, [movie_id])[movie_id] - value
+            for (user_id, movie_id, value) in zip(
+                user_ids.tolist(), movie_ids.tolist(), values.tolist()
+            )
+        ]
+        # The biases alone leave an error of about 1.3
+        assert np.sqrt(np.mean(np.square(errors))) < 0.5
+
+    def test_least_squares_with_a_popular_row(self) -> None:
+        # Row 1 has far more ratings than a chunk, the others a few each
+        rng = np.random.default_rng(0)
+        rows = np.sort(np.concatenate([np.full(5000, 1), rng.integers(0, 50, 500)]))
+        columns = rng.integers(0, 200, len(rows))
+        values = rng.normal(0, 1, len(rows))
+        fixed = rng.normal(0, 1, (200, 4))
+        indptr = _indptr(rows, 50)
+
+        solved = _solve_least_squares(indptr, columns, values, fixed, 0.1, chunk_size=64)
+
+        for row in range(50):
+            row_fixed = fixed[columns[indptr[row]:indptr[row + 1]]]
+            count = len(row_fixed)
+            if not count:
+                assert not solved[row].any()
+                continue
+            expected = np.linalg.solve(
+                row_fixed.T @ row_fixed + 0.1 * count * np.eye(4),
+                row_fixed.T @ values[indptr[row]:indptr[row + 1]]
+            )
+            assert np.allclose(solved[row], expected)
+
+    def test_least_squares_memory_is_bounded_by_the_chunk(self) -> None:
+        # A single row of a million ratings: its k x k outer products would take 128 MB
+        (n_ratings, k) = (1_000_000, 4)
+        rng = np.random.default_rng(0)
+        columns = rng.integers(0, 1000, n_ratings)
+        values = rng.normal(0, 1, n_ratings)
+        fixed = rng.normal(0, 1, (1000, k))
+        indptr = np.array([0, n_ratings])
+
+        tracemalloc.start()
+        try:
+            _solve_least_squares(indptr, columns, values, fixed, 0.1, chunk_size=10_000)
+            (_, peak) = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < 10_000 * k * 8 * 4
+
+    def test_predict(self) -> None:
+        model = make_model()
+        assert model.predict(1, [20]) == {20: 5.5}
+        assert model.predict(2, [20]) == {20: 4.5}
+
+    def test_predict_unknown_user_or_movie(self) -> None:
+        model = make_model()
+        assert model.predict(3, [10, 20]) == {}
+        assert model.predict(0, [10, 20]) == {}
+        # Unknown movies are left out, whether before, between or after the known ones
+        assert model.predict(1, [5, 20, 15, 30]) == {20: 5.5}
+
+    def test_predict_clips_the_grades(self) -> None:
+        model = make_model()
+        assert model.predict(1, [10]) == {10: 10.0}
+        assert model.predict(2, [10]) == {10: 0.0}
+
+
+class TestModelFiles:
+
+    def test_no_model(self, tmp_path) -> None:
+        assert load_factor_model(str(tmp_path)) is None
+
+    def test_round_trip(self, tmp_path, monkeypatch) -> None:
+        times = iter([datetime(2022, 7, 1, 12, 0, 0), datetime(2022, 7, 1, 12, 0, 1)])
+
+        class FakeDatetime:
+            @staticmethod
+            def now(tz) -> datetime:
+                return next(times).replace(tzinfo=tz)
+
+        monkeypatch.setattr(predictions, 'datetime', FakeDatetime)
+        first_version = save_factor_model(make_model(global_mean=5.0), str(tmp_path))
+        second_version = save_factor_model(make_model(global_mean=6.0), str(tmp_path))
+        assert (first_version, second_version) == ('20220701T120000', '20220701T120001')
+
+        # The last saved version is the current one
+        (version, model) = load_factor_model(str(tmp_path))
+        assert version == second_version
+        assert model.global_mean == 6.0
+        assert isinstance(model.user_factors, np.memmap)
+        for name in ('user_ids', 'user_factors', 'movie_ids', 'movie_factors'):
+            assert np.array_equal(getattr(model, name), getattr(make_model(), name))
+        assert model.predict(1, [20]) == {20: 6.5}
+
+        # Until CURRENT points to another one
+        (tmp_path / predictions.MODEL_NAME / predictions.CURRENT_VERSION_FILE) \
+            .write_text(first_version)
+        (version, model) = load_factor_model(str(tmp_path))
+        assert (version, model.global_mean) == (first_version, 5.0)
@@ -0,0 +1,139 @@
+from datetime import datetime, timezone
+from typing import AsyncIterator
+import math
+import numpy as np
+import pytest
+
+from app.services.similarities import (
+    build_rating_matrix,
+    rebuild_similar_movies,
+    top_similar_movies,
+)
+
+# (user_id, movie_id, grade), each user's grades averaging 6, but user 4's at 5.
+# Around those means, movie 10 is rated (+2, +2, -1, +1), 20 (+1, +2, -2),
+# 30 (+1, +1, +1), 40 (-4, +2), 50 (-5, -2) and 60 (+1) by users 1 to 4.
+RATINGS = [
+    (1, 10, 8), (1, 20, 7), (1, 30, 7), (1, 40, 2),
+    (2, 10, 8), (2, 20, 8), (2, 30, 7), (2, 50, 1),
+    (3, 10, 5), (3, 20, 4), (3, 30, 7), (3, 40, 8),
+    (4, 10, 6), (4, 60, 6), (4, 50, 3),
+]
+# Cosines of the residuals of movie 10 with those of 20, 30 and 60. 40 and 50
+# are disliked by the users who liked 10.
+SIMILARITIES_OF_10 = {20: 8 / math.sqrt(10 * 9), 30: 3 / math.sqrt(10 * 3), 60: 1 / math.sqrt(10)}
+
+
+def rating_arrays() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    (user_ids, movie_ids, grades) = zip(*RATINGS)
+    return (np.array(user_ids), np.array(movie_ids), np.array(grades))
+
+
+class FakeRatingCrud:
+
+    async def iterate_rating_grades(self) -> AsyncIterator[dict]:
+        for (user_id, movie_id, grade) in RATINGS:
+            yield {'user_id': user_id, 'movie_id': movie_id, 'grade': grade}
+
+
+class FakeSimilarityCrud:
+
+    def __init__(self, *, built_at: datetime | None, rated_since: list[int]) -> None:
+        self.built_at = built_at
+        self.rated_since = rated_since
+        self.kept_movie_ids: list[int] | None = None
+        self.replaced: dict[int, list[tuple[int, float]]] = {}
+
+    async def get_built_at(self) -> datetime | None:
+        return self.built_at
+
+    async def set_built_at(self, *, built_at: datetime) -> None:
+        self.built_at = built_at
+
+    async def get_movie_ids_rated_since(self, *, since: datetime) -> list[int]:
+        return self.rated_since
+
+    async def delete_similarities_except(self, *, movie_ids: list[int]) -> None:
+        self.kept_movie_ids = movie_ids
+
+    async def replace_similarities(self, *, movie_ids: list[int], similarities: list) -> None:
+        for movie_id in movie_ids:
+            self.replaced[movie_id] = [
+                (neighbor_id, score) for (source_id, neighbor_id, score) in similarities
+                if source_id == movie_id
+            ]
+
+
+class TestSimilarMovies:
+
+    def test_rating_matrix(self) -> None:
+        matrix = build_rating_matrix(*rating_arrays())
+        assert matrix.movie_ids.tolist() == [10, 20, 30, 40, 50, 60]
+        assert (matrix.movie_norms ** 2).tolist() == pytest.approx([10, 9, 3, 20, 29, 1])
+        assert matrix.movie_index(30) == 2
+        assert matrix.movie_index(35) is None
+        assert matrix.movie_index(70) is None
+
+    def test_neighbors_by_decreasing_similarity(self) -> None:
+        matrix = build_rating_matrix(*rating_arrays())
+        (neighbors, scores) = top_similar_movies(
+            matrix, matrix.movie_index(10), top_k=10, min_overlap=1
+        )
+        assert matrix.movie_ids[neighbors].tolist() == [20, 30, 60]
+        assert scores.tolist() == pytest.approx(list(SIMILARITIES_OF_10.values()))
+
+        (neighbors, _) = top_similar_movies(
+            matrix, matrix.movie_index(10), top_k=1, min_overlap=1
+        )
+        assert matrix.movie_ids[neighbors].tolist() == [20]
+
+    def test_min_overlap(self) -> None:
+        matrix = build_rating_matrix(*rating_arrays())
+        # 60 was only rated by one of the raters of 10
+        (neighbors, _) = top_similar_movies(
+            matrix, matrix.movie_index(10), top_k=10, min_overlap=2
+        )
+        assert matrix.movie_ids[neighbors].tolist() == [20, 30]
+
+    async def test_full_rebuild(self) -> None:
+        similarity_crud = FakeSimilarityCrud(built_at=None, rated_since=[])
+
+        rebuilt = await rebuild_similar_movies(
+            similarity_crud, FakeRatingCrud(), top_k=10, min_overlap=2, batch_size=4
+        )
+
+        assert rebuilt == 6
+        assert similarity_crud.kept_movie_ids == [10, 20, 30, 40, 50, 60]
+        assert set(similarity_crud.replaced) == {10, 20, 30, 40, 50, 60}
+        assert [neighbor_id for (neighbor_id, _) in similarity_crud.replaced[10]] == [20, 30]
+        assert similarity_crud.built_at is not None
+
+    async def test_incremental_rebuild(self) -> None:
+        last_build = datetime(2022, 7, 1, tzinfo=timezone.utc)
+        # 70 was rated since, then its rating deleted
+        similarity_crud = FakeSimilarityCrud(built_at=last_build, rated_since=[10, 70])
+
+        rebuilt = await rebuild_similar_movies(
+            similarity_crud, FakeRatingCrud(), incremental=True, top_k=10, min_overlap=1
+        )
+
+        assert rebuilt == 2
+        # Only the movies rated since the last build are touched
+        assert similarity_crud.kept_movie_ids is None
+        assert similarity_crud.replaced == {
+            10: [(20, pytest.approx(SIMILARITIES_OF_10[20])),
+                 (30, pytest.approx(SIMILARITIES_OF_10[30])),
+                 (60, pytest.approx(SIMILARITIES_OF_10[60]))],
+            70: [],
+        }
+        assert similarity_crud.built_at > last_build
+
+    async def test_incremental_rebuild_without_a_previous_build(self) -> None:
+        similarity_crud = FakeSimilarityCrud(built_at=None, rated_since=[10])
+
+        rebuilt = await rebuild_similar_movies(
+            similarity_crud, FakeRatingCrud(), incremental=True, top_k=10, min_overlap=1
+        )
+
+        assert rebuilt == 6
+        assert similarity_crud.kept_movie_ids == [10, 20, 30, 40, 50, 60]